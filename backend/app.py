@@ -3,6 +3,11 @@ from flask_cors import CORS
 import pandas as pd
 import os
 import sys
+import copy
+import hmac
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from dotenv import load_dotenv
 
@@ -11,7 +16,15 @@ load_dotenv()
 
 # Add utils to path
 sys.path.append(os.path.dirname(__file__))
-from utils.data_preprocessing import get_dataset_info, load_dataset, add_performance_label
+from utils.data_preprocessing import (get_dataset_info, get_dataset_page, get_dataset_cache_stats, get_feature_ranges,
+                                      get_dataset_memory_report, get_cached_dataset, get_dataset_stats_status,
+                                      categorize_performance, StudentPreprocessor, PREPROCESSOR_FILE,
+                                      DATASET_STATS_FILE)
+from utils.prediction_cache import PredictionCache
+from utils.memory_stats import get_process_memory
+from utils.sensitivity import build_sweep, response_curves
+from utils.ingestion import (INGESTED_FILE, parse_records, append_records, update_models,
+                             mark_stale, load_stale_models)
 from models.linear_regression import LinearRegressionModel
 from models.naive_bayes import NaiveBayesModel
 from models.knn import KNNModel
@@ -29,75 +42,338 @@ CORS(app, origins=[origin.strip() for origin in allowed_origins])
 DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models')
 DATASET_FILE = 'student-mat.csv'
+DATASET_STATS_PATH = os.path.join(MODEL_PATH, DATASET_STATS_FILE)
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 5000))
 
-# Load all models at startup
+# Per-model prediction cache (size 0 disables it, TTL 0 means no expiry)
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 1024))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', 0))
+
+# Threads used by /api/predict/all to run models concurrently
+ENSEMBLE_WORKERS = int(os.getenv('ENSEMBLE_WORKERS', 4))
+
+# Model loading: 'eager' loads everything at import, 'background' loads in a
+# thread after the worker starts, 'lazy' loads each model on first use
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'eager').lower()
+
+# Set to 'r' to memory-map model arrays read-only so workers share them
+MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE') or None
+
+# Set to 'float32' to run the ANN forward pass with single-precision weights
+ANN_INFERENCE_DTYPE = os.getenv('ANN_INFERENCE_DTYPE', 'float64')
+
+# Rows per SVM kernel evaluation in batch requests (bounds rows x support vectors memory)
+SVM_KERNEL_BLOCK_SIZE = int(os.getenv('SVM_KERNEL_BLOCK_SIZE', 1024))
+
+# /api/ingest is disabled unless a token is configured; requests must send it as
+# 'Authorization: Bearer <token>'. Updates apply only to the worker that serves the request
+INGEST_TOKEN = os.getenv('INGEST_TOKEN') or None
+
+# Model name -> (artifact file, display name, wrapper factory)
+MODEL_SPECS = {
+    'linear_regression': ('linear_regression.pkl', 'Linear Regression', LinearRegressionModel),
+    'naive_bayes': ('naive_bayes.pkl', 'Naive Bayes', NaiveBayesModel),
+    'knn': ('knn.pkl', 'KNN', KNNModel),
+    'svm': ('svm.pkl', 'SVM', lambda: SVMModel(kernel_block_size=SVM_KERNEL_BLOCK_SIZE)),
+    'decision_tree': ('decision_tree.pkl', 'Decision Tree', DecisionTreeModel),
+    'ann_regression': ('ann_regression.pkl', 'ANN Regression',
+                       lambda: ANNModel(task='regression', inference_dtype=ANN_INFERENCE_DTYPE)),
+    'ann_classification': ('ann_classification.pkl', 'ANN Classification',
+                           lambda: ANNModel(task='classification', inference_dtype=ANN_INFERENCE_DTYPE))
+}
+
+# Loaded models and per-model load state
 MODELS = {}
+MODEL_STATUS = {
+    name: {'state': 'pending', 'load_time': None, 'warmup_time': None, 'error': None}
+    for name in MODEL_SPECS
+}
+_model_locks = {name: threading.Lock() for name in MODEL_SPECS}
+
+# Serializes ingests in this worker; predictions never wait on it
+_ingest_lock = threading.Lock()
+
+def load_preprocessor():
+    """Load the preprocessing pipeline saved with the models (an unfitted one if none was saved)"""
+    filepath = os.path.join(MODEL_PATH, PREPROCESSOR_FILE)
+    if os.path.exists(filepath):
+        return StudentPreprocessor.load(filepath)
+    return StudentPreprocessor()
+
+# Shared by every model for request encoding
+PREPROCESSOR = load_preprocessor()
+
+def warm_up_model(model):
+    """Run a dummy prediction so the first real request does not pay for lazy initialization"""
+    X = model.schema.encode({})
+    model.predict(X)
+
+def attach_prediction_cache(model):
+    """Give a model its own empty prediction cache (none if caching is disabled)"""
+    model.cache = PredictionCache(
+        max_size=PREDICTION_CACHE_SIZE,
+        ttl=PREDICTION_CACHE_TTL or None
+    ) if PREDICTION_CACHE_SIZE > 0 else None
+
+def load_model(name):
+    """
+    Load a single model once, attach its prediction cache and warm it up
+    Returns the model, or None if the artifact is missing or failed to load
+    """
+    if name in MODELS:
+        return MODELS[name]
+    
+    with _model_locks[name]:
+        # Another thread may have finished loading while we waited
+        if name in MODELS:
+            return MODELS[name]
+        
+        status = MODEL_STATUS[name]
+        if status['state'] == 'error':
+            return None
+        
+        filename, display_name, factory = MODEL_SPECS[name]
+        filepath = os.path.join(MODEL_PATH, filename)
+        
+        if not os.path.exists(filepath):
+            status['state'] = 'missing'
+            return None
+        
+        try:
+            status['state'] = 'loading'
+            
+            start = time.perf_counter()
+            model = factory()
+            model.load_model(filepath, mmap_mode=MODEL_MMAP_MODE)
+            status['load_time'] = time.perf_counter() - start
+            
+            # Encode requests with the pipeline's schema when the feature order matches
+            if model.feature_names == PREPROCESSOR.feature_names:
+                model.schema = PREPROCESSOR.schema
+            
+            attach_prediction_cache(model)
+            
+            start = time.perf_counter()
+            warm_up_model(model)
+            status['warmup_time'] = time.perf_counter() - start
+            
+            MODELS[name] = model
+            status['state'] = 'loaded'
+            print(f"✓ {display_name} loaded")
+            
+            return model
+            
+        except Exception as e:
+            status['state'] = 'error'
+            status['error'] = str(e)
+            print(f"Error loading {display_name}: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+def get_model(name):
+    """Get a loaded model, loading it on first use"""
+    model = MODELS.get(name)
+    if model is None:
+        model = load_model(name)
+    return model
 
 def load_all_models():
     """Load all trained models"""
-    global MODELS
+    print("Loading models...")
+    
+    for name in MODEL_SPECS:
+        load_model(name)
+    
+    print(f"Successfully loaded {len(MODELS)} models")
+
+def warm_dataset_cache():
+    """Load the dataset into the process-wide cache once per worker"""
+    csv_path = os.path.join(DATA_PATH, DATASET_FILE)
     
     try:
-        print("Loading models...")
-        
-        # Linear Regression
-        if os.path.exists(os.path.join(MODEL_PATH, 'linear_regression.pkl')):
-            lr = LinearRegressionModel()
-            lr.load_model(os.path.join(MODEL_PATH, 'linear_regression.pkl'))
-            MODELS['linear_regression'] = lr
-            print("✓ Linear Regression loaded")
-        
-        # Naive Bayes
-        if os.path.exists(os.path.join(MODEL_PATH, 'naive_bayes.pkl')):
-            nb = NaiveBayesModel()
-            nb.load_model(os.path.join(MODEL_PATH, 'naive_bayes.pkl'))
-            MODELS['naive_bayes'] = nb
-            print("✓ Naive Bayes loaded")
-        
-        # KNN
-        if os.path.exists(os.path.join(MODEL_PATH, 'knn.pkl')):
-            knn = KNNModel()
-            knn.load_model(os.path.join(MODEL_PATH, 'knn.pkl'))
-            MODELS['knn'] = knn
-            print("✓ KNN loaded")
-        
-        # SVM
-        if os.path.exists(os.path.join(MODEL_PATH, 'svm.pkl')):
-            svm = SVMModel()
-            svm.load_model(os.path.join(MODEL_PATH, 'svm.pkl'))
-            MODELS['svm'] = svm
-            print("✓ SVM loaded")
-        
-        # Decision Tree
-        if os.path.exists(os.path.join(MODEL_PATH, 'decision_tree.pkl')):
-            dt = DecisionTreeModel()
-            dt.load_model(os.path.join(MODEL_PATH, 'decision_tree.pkl'))
-            MODELS['decision_tree'] = dt
-            print("✓ Decision Tree loaded")
-        
-        # ANN Regression
-        if os.path.exists(os.path.join(MODEL_PATH, 'ann_regression.pkl')):
-            ann_reg = ANNModel(task='regression')
-            ann_reg.load_model(os.path.join(MODEL_PATH, 'ann_regression.pkl'))
-            MODELS['ann_regression'] = ann_reg
-            print("✓ ANN Regression loaded")
-        
-        # ANN Classification
-        if os.path.exists(os.path.join(MODEL_PATH, 'ann_classification.pkl')):
-            ann_clf = ANNModel(task='classification')
-            ann_clf.load_model(os.path.join(MODEL_PATH, 'ann_classification.pkl'))
-            MODELS['ann_classification'] = ann_clf
-            print("✓ ANN Classification loaded")
-        
-        print(f"Successfully loaded {len(MODELS)} models")
-        
+        if os.path.exists(csv_path):
+            get_cached_dataset(csv_path)
+            print("✓ Dataset cached")
+            
+            status = get_dataset_stats_status(csv_path, DATASET_STATS_PATH)
+            if status == 'current':
+                print("✓ Dataset statistics loaded")
+            else:
+                print(f"Dataset statistics {status}; computing them from the dataset")
+                get_dataset_info(csv_path)
     except Exception as e:
-        print(f"Error loading models: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error caching dataset: {str(e)}")
+
+def warm_up():
+    """Load models and dataset ahead of the first request"""
+    load_all_models()
+    warm_dataset_cache()
+
+# Load models and dataset on startup
+if MODEL_LOAD_MODE == 'background':
+    threading.Thread(target=warm_up, name='model-warmup', daemon=True).start()
+elif MODEL_LOAD_MODE == 'eager':
+    warm_up()
+
+# LabelEncoder encodes alphabetically: At-Risk=0, Average=1, Good=2
+PERFORMANCE_LABELS = {'0': 'At-Risk', '1': 'Average', '2': 'Good'}
+
+# Model name -> function producing the same result as that model's single endpoint,
+# plus a function extracting (performance label, confidence) for the consensus vote
+ENSEMBLE_RUNNERS = {
+    'linear_regression': (
+        lambda model, X, data: {'predicted_grade': model.predict_single(X)},
+        lambda result: (categorize_performance(result['predicted_grade']), None)
+    ),
+    'naive_bayes': (
+        lambda model, X, data: model.get_risk_assessment(X),
+        lambda result: (result['predicted_performance'], result['confidence'])
+    ),
+    'knn': (
+        lambda model, X, data: model.find_nearest_neighbors(X, k=data.get('k', 5)),
+        lambda result: (result['predicted_label'], result['confidence'])
+    ),
+    'svm': (
+        lambda model, X, data: model.get_classification_details(X),
+        lambda result: (result['predicted_label'], result['confidence'])
+    ),
+    'decision_tree': (
+        lambda model, X, data: model.get_decision_path(X),
+        lambda result: (PERFORMANCE_LABELS.get(result['predicted_class'], result['predicted_class']), result['confidence'])
+    ),
+    'ann_regression': (
+        lambda model, X, data: model.get_time_series_forecast(X, periods=data.get('periods', 4)),
+        lambda result: (categorize_performance(result['current_grade']), None)
+    ),
+    'ann_classification': (
+        lambda model, X, data: model.predict_single(X),
+        lambda result: (PERFORMANCE_LABELS.get(result['predicted_class'], result['predicted_class']), result['confidence'])
+    )
+}
+
+_ensemble_executor = None
+_ensemble_executor_lock = threading.Lock()
 
-# Load models on startup
-load_all_models()
+def get_ensemble_executor():
+    """Create the ensemble thread pool on first use (after any gunicorn fork)"""
+    global _ensemble_executor
+    
+    with _ensemble_executor_lock:
+        if _ensemble_executor is None:
+            _ensemble_executor = ThreadPoolExecutor(
+                max_workers=ENSEMBLE_WORKERS,
+                thread_name_prefix='ensemble'
+            )
+        return _ensemble_executor
+
+def run_ensemble_model(name, X, data):
+    """Run one model for the ensemble endpoint, returning (result, elapsed seconds)"""
+    start = time.perf_counter()
+    
+    model = get_model(name)
+    if model is None:
+        result = {'error': 'Model not loaded. Please train the models first.'}
+    else:
+        try:
+            result = ENSEMBLE_RUNNERS[name][0](model, X, data)
+        except Exception as e:
+            result = {'error': str(e)}
+    
+    return result, time.perf_counter() - start
+
+def build_consensus(results):
+    """Majority vote over the performance label predicted by each model"""
+    votes = {}
+    confidence = {}
+    
+    for name, result in results.items():
+        if 'error' in result:
+            continue
+        
+        label, model_confidence = ENSEMBLE_RUNNERS[name][1](result)
+        votes[label] = votes.get(label, 0) + 1
+        if model_confidence is not None:
+            confidence.setdefault(label, []).append(model_confidence)
+    
+    if not votes:
+        return None
+    
+    # Ties are broken by the mean confidence of the models voting for each label
+    def score(label):
+        scores = confidence.get(label, [])
+        return votes[label], sum(scores) / len(scores) if scores else 0.0
+    
+    label = max(votes, key=score)
+    
+    return {
+        'label': label,
+        'votes': votes,
+        'agreement': votes[label] / sum(votes.values())
+    }
+
+def grade_response(model, X):
+    """Predicted grade per row, clipped to the valid range as the single endpoints do"""
+    return np.clip(model.predict(X), 0, 20)
+
+def at_risk_response(model, X):
+    """Probability of the At-Risk class per row"""
+    at_risk = [str(cls) for cls in model.classes].index('0')
+    return model.predict_proba(X)[:, at_risk]
+
+# Model name -> (response name, function scoring a whole sweep matrix in one batch)
+SENSITIVITY_SCORERS = {
+    'linear_regression': ('predicted_grade', grade_response),
+    'naive_bayes': ('at_risk_probability', at_risk_response),
+    'knn': ('at_risk_probability', at_risk_response),
+    'svm': ('at_risk_probability', at_risk_response),
+    'decision_tree': ('at_risk_probability', at_risk_response),
+    'ann_regression': ('predicted_grade', grade_response),
+    'ann_classification': ('at_risk_probability', at_risk_response)
+}
+
+# Maximum number of values tried per feature in a sensitivity sweep
+MAX_SWEEP_POINTS = 50
+
+def run_sensitivity_model(name, X, segments):
+    """Score one model's sweep, returning (response curves, elapsed seconds)"""
+    start = time.perf_counter()
+    
+    model = get_model(name)
+    if model is None:
+        result = {'error': 'Model not loaded. Please train the models first.'}
+    else:
+        try:
+            response_name, scorer = SENSITIVITY_SCORERS[name]
+            result = {'response': response_name, **response_curves(segments, scorer(model, X))}
+        except Exception as e:
+            result = {'error': str(e)}
+    
+    return result, time.perf_counter() - start
+
+def encode_batch_features(schema, data):
+    """
+    Encode a batch request body into one feature matrix
+    Accepts either row-oriented {"instances": [{...}, ...]}
+    or column-oriented {"features": {"age": [...], "G1": [...], ...}}
+    """
+    if 'instances' in data:
+        instances = data['instances']
+        if not isinstance(instances, list):
+            raise ValueError("'instances' must be a list of feature objects")
+        X = schema.encode(instances)
+    else:
+        columns = data.get('features', {})
+        if not isinstance(columns, dict) or not all(isinstance(col, list) for col in columns.values()):
+            raise ValueError("'features' must map each feature name to a list of values")
+        X = schema.encode_columns(columns)
+    
+    if len(X) == 0:
+        raise ValueError('Batch request contains no instances')
+    if len(X) > MAX_BATCH_SIZE:
+        raise ValueError(f'Batch size {len(X)} exceeds the limit of {MAX_BATCH_SIZE}')
+    
+    return X
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -107,6 +383,25 @@ def health_check():
         'message': 'EduInsight Analytics API is running'
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint reporting per-model load state and timings"""
+    pending = [
+        name for name, status in MODEL_STATUS.items()
+        if status['state'] in ('pending', 'loading')
+    ]
+    
+    # In lazy mode models load on demand, so the server is ready immediately
+    ready = MODEL_LOAD_MODE == 'lazy' or not pending
+    
+    return jsonify({
+        'ready': ready,
+        'load_mode': MODEL_LOAD_MODE,
+        'loaded_models': len(MODELS),
+        'models': {name: dict(status) for name, status in MODEL_STATUS.items()},
+        'stale_models': load_stale_models(MODEL_PATH)
+    }), 200 if ready else 503
+
 @app.route('/api/dataset', methods=['GET'])
 def get_dataset():
     """Get dataset overview"""
@@ -116,27 +411,61 @@ def get_dataset():
         if not os.path.exists(csv_path):
             return jsonify({'error': 'Dataset not found'}), 404
         
-        info = get_dataset_info(csv_path)
+        # Precomputed statistics are served while they match the dataset's content
+        info = get_dataset_info(csv_path, stats_path=DATASET_STATS_PATH)
         
         return jsonify(info)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/cache', methods=['GET'])
+def get_cache_stats():
+    """Get hit/miss statistics for the in-memory caches"""
+    return jsonify({
+        'dataset': get_dataset_cache_stats(),
+        'predictions': {
+            name: model.cache.stats()
+            for name, model in MODELS.items()
+            if model.cache is not None
+        }
+    })
+
+@app.route('/api/stats/memory', methods=['GET'])
+def get_memory_stats():
+    """Get memory usage of the worker serving this request"""
+    stats = {
+        **get_process_memory(),
+        'mmap_mode': MODEL_MMAP_MODE,
+        'loaded_models': len(MODELS)
+    }
+    
+    # Footprint of the cached dataset with and without the compact schema
+    csv_path = os.path.join(DATA_PATH, DATASET_FILE)
+    if os.path.exists(csv_path):
+        stats['dataset'] = get_dataset_memory_report(csv_path)
+    
+    return jsonify(stats)
+
 @app.route('/api/dataset/sample', methods=['GET'])
 def get_dataset_sample():
-    """Get sample data from dataset"""
+    """Get a page of sample data from dataset"""
     try:
         csv_path = os.path.join(DATA_PATH, DATASET_FILE)
-        df = load_dataset(csv_path)
-        df = add_performance_label(df)
+        if not os.path.exists(csv_path):
+            return jsonify({'error': 'Dataset not found'}), 404
         
         # Get query parameters
+        offset = request.args.get('offset', 0, type=int)
         limit = request.args.get('limit', 20, type=int)
+        columns = request.args.get('columns')
+        if columns:
+            columns = [col.strip() for col in columns.split(',') if col.strip()]
         
-        return jsonify({
-            'total_records': len(df),
-            'sample': df.head(limit).to_dict('records')
-        })
+        page = get_dataset_page(csv_path, offset=offset, limit=limit, columns=columns or None)
+        
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -147,10 +476,10 @@ def predict_linear_regression():
     try:
         data = request.json
         
-        if 'linear_regression' not in MODELS:
+        model = get_model('linear_regression')
+        if model is None:
             return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
         
-        model = MODELS['linear_regression']
         
         # Extract features from request
         features = data.get('features', {})
@@ -170,6 +499,8 @@ def predict_linear_regression():
             'metrics': model.metrics
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -179,10 +510,10 @@ def predict_naive_bayes():
     try:
         data = request.json
         
-        if 'naive_bayes' not in MODELS:
+        model = get_model('naive_bayes')
+        if model is None:
             return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
         
-        model = MODELS['naive_bayes']
         
         # Extract features from request
         features = data.get('features', {})
@@ -192,6 +523,8 @@ def predict_naive_bayes():
         
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -201,10 +534,10 @@ def predict_knn():
     try:
         data = request.json
         
-        if 'knn' not in MODELS:
+        model = get_model('knn')
+        if model is None:
             return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
         
-        model = MODELS['knn']
         
         # Extract features from request
         features = data.get('features', {})
@@ -215,6 +548,8 @@ def predict_knn():
         
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -224,10 +559,10 @@ def predict_svm():
     try:
         data = request.json
         
-        if 'svm' not in MODELS:
+        model = get_model('svm')
+        if model is None:
             return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
         
-        model = MODELS['svm']
         
         # Extract features from request
         features = data.get('features', {})
@@ -237,6 +572,8 @@ def predict_svm():
         
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -246,10 +583,10 @@ def predict_decision_tree():
     try:
         data = request.json
         
-        if 'decision_tree' not in MODELS:
+        model = get_model('decision_tree')
+        if model is None:
             return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
         
-        model = MODELS['decision_tree']
         
         # Extract features from request
         features = data.get('features', {})
@@ -265,6 +602,8 @@ def predict_decision_tree():
             'feature_importance': importance['top_features'][:5]
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -274,10 +613,10 @@ def predict_ann():
     try:
         data = request.json
         
-        if 'ann_regression' not in MODELS:
+        model = get_model('ann_regression')
+        if model is None:
             return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
         
-        model = MODELS['ann_regression']
         
         # Extract features from request
         features = data.get('features', {})
@@ -297,6 +636,374 @@ def predict_ann():
             }
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/ann/scenarios', methods=['POST'])
+def predict_ann_scenarios():
+    """ANN what-if scenario endpoint: a grid of multipliers/overrides scored in one pass"""
+    try:
+        data = request.json
+        
+        model = get_model('ann_regression')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        features = data.get('features', {})
+        grid = data.get('grid')
+        
+        if grid is None:
+            # Named scenarios of multipliers (or the default set)
+            return jsonify(model.forecast_trends(features, data.get('scenarios'), max_scenarios=MAX_BATCH_SIZE))
+        
+        if not isinstance(grid, dict):
+            raise ValueError("'grid' must be an object with 'multipliers' and/or 'overrides'")
+        
+        result = model.evaluate_scenario_grid(
+            features,
+            multipliers=grid.get('multipliers'),
+            overrides=grid.get('overrides'),
+            max_rows=MAX_BATCH_SIZE
+        )
+        
+        return jsonify(result)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/all', methods=['POST'])
+def predict_all():
+    """Run several models for one student concurrently and combine the results"""
+    try:
+        data = request.json
+        
+        names = data.get('models') or list(ENSEMBLE_RUNNERS.keys())
+        unknown = [name for name in names if name not in ENSEMBLE_RUNNERS]
+        if unknown:
+            return jsonify({'error': f"Unknown models: {', '.join(unknown)}"}), 400
+        
+        # Encode the features once and share the matrix between models
+        schema_model = None
+        for name in names:
+            schema_model = get_model(name)
+            if schema_model is not None:
+                break
+        if schema_model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = schema_model.schema.encode(data.get('features', {}))
+        
+        start = time.perf_counter()
+        executor = get_ensemble_executor()
+        futures = {name: executor.submit(run_ensemble_model, name, X, data) for name in names}
+        
+        results = {}
+        timings = {}
+        for name, future in futures.items():
+            results[name], elapsed = future.result()
+            timings[name] = elapsed * 1000
+        
+        return jsonify({
+            'results': results,
+            'consensus': build_consensus(results),
+            'timings_ms': timings,
+            'total_ms': (time.perf_counter() - start) * 1000
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/sensitivity', methods=['POST'])
+def predict_sensitivity():
+    """Vary each feature across its observed range for one student and score every model"""
+    try:
+        data = request.json
+        
+        names = data.get('models') or list(SENSITIVITY_SCORERS.keys())
+        unknown = [name for name in names if name not in SENSITIVITY_SCORERS]
+        if unknown:
+            return jsonify({'error': f"Unknown models: {', '.join(unknown)}"}), 400
+        
+        points = data.get('points', 11)
+        if not isinstance(points, int) or not 2 <= points <= MAX_SWEEP_POINTS:
+            raise ValueError(f"'points' must be an integer between 2 and {MAX_SWEEP_POINTS}")
+        
+        sweep = data.get('sweep')
+        if sweep is not None and (not isinstance(sweep, list) or not all(isinstance(name, str) for name in sweep)):
+            raise ValueError("'sweep' must be a list of feature names")
+        
+        schema_model = None
+        for name in names:
+            schema_model = get_model(name)
+            if schema_model is not None:
+                break
+        if schema_model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        csv_path = os.path.join(DATA_PATH, DATASET_FILE)
+        if not os.path.exists(csv_path):
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        # Build the perturbation matrix once and share it between models
+        schema = schema_model.schema
+        x = schema.encode(data.get('features', {}))
+        ranges = get_feature_ranges(csv_path, schema.feature_names)
+        X, segments = build_sweep(x, schema.feature_names, ranges, points=points, features=sweep)
+        
+        start = time.perf_counter()
+        executor = get_ensemble_executor()
+        futures = {name: executor.submit(run_sensitivity_model, name, X, segments) for name in names}
+        
+        results = {}
+        timings = {}
+        for name, future in futures.items():
+            results[name], elapsed = future.result()
+            timings[name] = elapsed * 1000
+        
+        return jsonify({
+            'sweep': {name: values.tolist() for name, (values, _) in segments.items()},
+            'n_rows': len(X),
+            'results': results,
+            'timings_ms': timings,
+            'total_ms': (time.perf_counter() - start) * 1000
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/linear-regression/batch', methods=['POST'])
+def predict_linear_regression_batch():
+    """Linear Regression batch prediction endpoint"""
+    try:
+        data = request.json
+        
+        model = get_model('linear_regression')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = encode_batch_features(model.schema, data)
+        
+        # One model call for the whole batch
+        results = model.predict_batch(X)
+        
+        # Get coefficients for transparency
+        coefficients = model.get_coefficients()
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': [{'predicted_grade': grade} for grade in results],
+            'model_info': {
+                'intercept': coefficients['intercept'],
+                'top_features': dict(list(coefficients['coefficients'].items())[:5])
+            },
+            'metrics': model.metrics
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/naive-bayes/batch', methods=['POST'])
+def predict_naive_bayes_batch():
+    """Naive Bayes batch classification endpoint"""
+    try:
+        data = request.json
+        
+        model = get_model('naive_bayes')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = encode_batch_features(model.schema, data)
+        
+        results = model.get_risk_assessment_batch(X)
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': results
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/knn/batch', methods=['POST'])
+def predict_knn_batch():
+    """KNN batch prediction endpoint"""
+    try:
+        data = request.json
+        
+        model = get_model('knn')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = encode_batch_features(model.schema, data)
+        k = data.get('k', 5)
+        
+        results = model.find_nearest_neighbors_batch(X, k=k)
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': results
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/svm/batch', methods=['POST'])
+def predict_svm_batch():
+    """SVM batch classification endpoint"""
+    try:
+        data = request.json
+        
+        model = get_model('svm')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = encode_batch_features(model.schema, data)
+        
+        results = model.get_classification_details_batch(X)
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': results
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/decision-tree/batch', methods=['POST'])
+def predict_decision_tree_batch():
+    """Decision Tree batch analysis endpoint"""
+    try:
+        data = request.json
+        
+        model = get_model('decision_tree')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = encode_batch_features(model.schema, data)
+        
+        results = model.get_decision_path_batch(X)
+        
+        # Get feature importance
+        importance = model.get_feature_importance()
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': results,
+            'feature_importance': importance['top_features'][:5]
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/ann/batch', methods=['POST'])
+def predict_ann_batch():
+    """ANN batch forecast endpoint"""
+    try:
+        data = request.json
+        
+        model = get_model('ann_regression')
+        if model is None:
+            return jsonify({'error': 'Model not loaded. Please train the models first.'}), 503
+        
+        X = encode_batch_features(model.schema, data)
+        periods = data.get('periods', 4)
+        
+        results = model.get_time_series_forecast_batch(X, periods=periods)
+        
+        # Get network info
+        network_info = model.get_network_info()
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': results,
+            'network_info': {
+                'layers': network_info['n_layers'],
+                'iterations': network_info['n_iterations']
+            }
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest_records():
+    """Append newly labeled records, update the models incrementally and save their artifacts"""
+    if INGEST_TOKEN is None:
+        return jsonify({'error': 'Ingestion is disabled. Set INGEST_TOKEN to enable it.'}), 403
+    
+    auth = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(auth.encode(), f'Bearer {INGEST_TOKEN}'.encode()):
+        return jsonify({'error': 'Missing or invalid ingest token'}), 401
+    
+    try:
+        data = request.json
+        
+        X, grades = parse_records(data.get('records'))
+        if len(X) > MAX_BATCH_SIZE:
+            raise ValueError(f'Ingest size {len(X)} exceeds the limit of {MAX_BATCH_SIZE}')
+
+        models = {name: get_model(name) for name in MODEL_SPECS}
+        missing = [name for name, model in models.items() if model is None]
+        if missing:
+            return jsonify({'error': f"Models not loaded: {', '.join(missing)}"}), 503
+        
+        results = {}
+        with _ingest_lock:
+            for name, model in models.items():
+                if not hasattr(model, 'partial_update'):
+                    results.update(update_models({name: model}, X, grades))
+                    continue
+                
+                # Update a private copy (sharing the read-only schema, not the cache) and
+                # publish it with one assignment: predictions see the old model or the new one
+                candidate = copy.deepcopy(model, {id(model.cache): None, id(model.schema): model.schema})
+                results.update(update_models({name: candidate}, X, grades))
+                
+                if results[name]['status'] == 'updated':
+                    # Saved before it is served, so restarted and other workers load the same
+                    # model; one that cannot be saved stays on the old version and is marked stale
+                    try:
+                        candidate.save_model(os.path.join(MODEL_PATH, MODEL_SPECS[name][0]))
+                    except Exception as e:
+                        results[name] = {'status': 'stale', 'reason': f'could not save the update: {e}'}
+                        continue
+                    attach_prediction_cache(candidate)
+                    MODELS[name] = candidate
+            
+            stale = [name for name, result in results.items() if result['status'] == 'stale']
+            if stale:
+                mark_stale(MODEL_PATH, stale, len(X))
+            
+            append_records(os.path.join(DATA_PATH, INGESTED_FILE), X, grades)
+        
+        return jsonify({
+            'rows': len(X),
+            'models': results,
+            'stale_models': load_stale_models(MODEL_PATH)
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
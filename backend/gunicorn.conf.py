@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration
+Picked up automatically when gunicorn is started from the backend directory
+
+Set GUNICORN_PRELOAD=1 to load the app (and all models) once in the master
+process before forking, so workers share model memory copy-on-write instead
+of each holding a private copy. Combine with MODEL_MMAP_MODE=r to also share
+the model arrays through the page cache.
+"""
+
+import gc
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+
+if preload_app:
+    # Background loading threads do not survive fork, so load before forking
+    os.environ['MODEL_LOAD_MODE'] = 'eager'
+
+
+def when_ready(server):
+    """Runs in the master once the app is loaded"""
+    if preload_app:
+        # Move preloaded objects out of the collector's reach so its
+        # bookkeeping does not write to (and un-share) their pages
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Log each worker's memory so sharing can be confirmed"""
+    try:
+        from utils.memory_stats import get_process_memory
+        memory = get_process_memory()
+        worker.log.info(
+            "Worker %s memory: rss=%.1f MB, shared=%.1f MB, private=%.1f MB",
+            memory['pid'],
+            memory.get('rss_bytes', 0) / 1e6,
+            memory.get('shared_bytes', 0) / 1e6,
+            memory.get('private_bytes', 0) / 1e6
+        )
+    except Exception as e:
+        worker.log.warning("Could not read worker memory: %s", e)
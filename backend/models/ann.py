@@ -3,6 +3,8 @@ Artificial Neural Network Model for Student Performance Forecasting
 Multi-layer perceptron for grade prediction and trend forecasting
 """
 
+import math
+
 import pandas as pd
 import numpy as np
 from sklearn.neural_network import MLPRegressor, MLPClassifier
@@ -10,16 +12,46 @@ from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
+from utils.prediction_cache import cached_prediction
+
+
+def _relu(a):
+    np.maximum(a, 0, out=a)
+
+
+def _tanh(a):
+    np.tanh(a, out=a)
+
+
+def _logistic(a):
+    np.negative(a, out=a)
+    np.exp(a, out=a)
+    a += 1
+    np.reciprocal(a, out=a)
+
+
+# In-place hidden layer activations, keyed by MLP `activation`
+_ACTIVATIONS = {
+    'relu': _relu,
+    'tanh': _tanh,
+    'logistic': _logistic,
+    'identity': lambda a: None
+}
+
 
 class ANNModel:
-    def __init__(self, task='regression', hidden_layers=(100, 50, 25)):
+    def __init__(self, task='regression', hidden_layers=(100, 50, 25), inference_dtype='float64'):
         """
         Initialize ANN model
         Args:
             task: 'regression' for grade prediction or 'classification' for category prediction
             hidden_layers: tuple defining the number of neurons in each hidden layer
+            inference_dtype: 'float32' to run the forward pass with single-precision weights
         """
         self.task = task
+        self.inference_dtype = np.dtype(inference_dtype)
         
         if task == 'regression':
             self.model = MLPRegressor(
@@ -42,18 +74,27 @@ class ANNModel:
         
         self.is_trained = False
         self.feature_names = None
+        self.schema = None
+        self.cache = None
         self.classes = None
         self.metrics = None
         
+        # Weights for the fused NumPy forward pass
+        self.weights = None
+        self.biases = None
+        
     def train(self, X, y, feature_names=None):
         """Train the ANN model"""
         self.model.fit(X, y)
         self.is_trained = True
         self.feature_names = feature_names if feature_names else [f'feature_{i}' for i in range(X.shape[1])]
+        self.schema = FeatureSchema(self.feature_names)
         
         if self.task == 'classification':
             self.classes = self.model.classes_
         
+        self._compile()
+        
         # Calculate training metrics
         if self.task == 'regression':
             train_predictions = self.model.predict(X)
@@ -68,17 +109,95 @@ class ANNModel:
                 'train_accuracy': accuracy_score(y, train_predictions)
             }
         
+    def _compile(self):
+        """Copy the fitted layers into contiguous arrays for the fused forward pass"""
+        self.weights = [np.ascontiguousarray(W, dtype=self.inference_dtype) for W in self.model.coefs_]
+        self.biases = [np.ascontiguousarray(b, dtype=self.inference_dtype) for b in self.model.intercepts_]
+    
+    def partial_update(self, X, y):
+        """
+        Run one optimizer pass over newly labeled rows (MLP partial_fit)
+        Cost depends on the number of new rows, not on the training history
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        
+        X = self.schema.check_array(X)
+        
+        # The optimizer updates the weights in place; memory-mapped artifacts are read-only
+        self.model.coefs_ = [np.array(W) for W in self.model.coefs_]
+        self.model.intercepts_ = [np.array(b) for b in self.model.intercepts_]
+        
+        # Early stopping needs a validation split of the full data and only applies to fit();
+        # models trained with it track validation scores instead of best_loss_
+        early_stopping, best_loss = self.model.early_stopping, self.model.best_loss_
+        # partial_fit restarts n_iter_ at each call; keep counting from the training epochs
+        n_iter = self.model.n_iter_
+        self.model.early_stopping = False
+        if best_loss is None:
+            self.model.best_loss_ = np.inf
+        try:
+            self.model.partial_fit(X, y)
+            self.model.n_iter_ = n_iter + self.model.n_iter_
+        finally:
+            self.model.early_stopping = early_stopping
+            if best_loss is None:
+                self.model.best_loss_ = None
+        
+        self._compile()
+    
+    def _forward(self, X):
+        """
+        Run one forward pass through the network
+        Returns the output layer (grades for regression, class probabilities for classification)
+        """
+        X = self.schema.check_array(X)
+        activation = _ACTIVATIONS[self.model.activation]
+        
+        a = X.astype(self.inference_dtype, copy=False)
+        n_layers = len(self.weights)
+        
+        for i, (W, b) in enumerate(zip(self.weights, self.biases)):
+            a = a @ W
+            a += b
+            if i < n_layers - 1:
+                activation(a)
+        
+        out_activation = self.model.out_activation_
+        if out_activation == 'softmax':
+            a -= a.max(axis=1, keepdims=True)
+            np.exp(a, out=a)
+            a /= a.sum(axis=1, keepdims=True)
+        elif out_activation == 'logistic':
+            # Binary classifier: expand the single output into two class columns
+            p = 1.0 / (1.0 + np.exp(-a[:, 0]))
+            a = np.column_stack([1.0 - p, p])
+        
+        return a.astype(np.float64, copy=False)
+    
     def predict(self, X):
         """Make predictions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        
+        output = self._forward(X)
+        
+        if self.task == 'regression':
+            return output[:, 0] if output.shape[1] == 1 else output
+        return self.classes[output.argmax(axis=1)]
+    
+    def predict_proba(self, X):
+        """Get probability distributions"""
+        if not self.is_trained or self.task != 'classification':
+            raise Exception("Model not trained for classification")
+        return self._forward(X)
     
+    @cached_prediction
     def predict_single(self, features_dict):
         """
         Make prediction for a single instance
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             prediction value or dict with class and probabilities
         """
@@ -86,41 +205,74 @@ class ANNModel:
             raise Exception("Model not trained yet")
         
         # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
+        X = self.schema.encode(features_dict)
         
+        return self._predict_rows(X)[0]
+    
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many instances with a single forward pass
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of prediction dicts (same shape as predict_single)
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
+        
+        return self._predict_rows(X)
+    
+    def _predict_rows(self, X):
+        """Format predictions for every row of X from a single forward pass"""
+        output = self._forward(X)
+        
+        if self.task == 'regression':
+            return [self._format_prediction(prediction) for prediction in output[:, 0]]
+        
+        predictions = self.classes[output.argmax(axis=1)]
+        return [
+            self._format_prediction(prediction, probs)
+            for prediction, probs in zip(predictions, output)
+        ]
+    
+    def _format_prediction(self, prediction, probabilities=None):
+        """Build the prediction dict for one row of model output"""
         if self.task == 'regression':
-            prediction = self.model.predict(X)[0]
             # Clip prediction to valid grade range (0-20)
             return {
                 'predicted_grade': float(np.clip(prediction, 0, 20))
             }
-        else:
-            prediction = self.model.predict(X)[0]
-            probabilities = self.model.predict_proba(X)[0]
-            
-            prob_dict = {
-                str(cls): float(prob) 
-                for cls, prob in zip(self.classes, probabilities)
-            }
-            
-            return {
-                'predicted_class': str(prediction),
-                'probabilities': prob_dict,
-                'confidence': float(max(probabilities))
-            }
+        
+        prob_dict = {
+            str(cls): float(prob) 
+            for cls, prob in zip(self.classes, probabilities)
+        }
+        
+        return {
+            'predicted_class': str(prediction),
+            'probabilities': prob_dict,
+            'confidence': float(max(probabilities))
+        }
     
-    def forecast_trends(self, features_dict, scenarios=None):
+    def forecast_trends(self, features_dict, scenarios=None, max_scenarios=None):
         """
         Generate performance forecasts under different scenarios
         Args:
             features_dict: current student features
-            scenarios: dict with scenario modifications (optional)
+            scenarios: dict mapping scenario name to {feature: multiplier} (optional)
+            max_scenarios: maximum number of scenarios allowed (optional)
         Returns:
             dict with trend forecasts
         """
         if not self.is_trained or self.task != 'regression':
             raise Exception("Model not trained for regression or task is classification")
         
+        if scenarios is not None:
+            self._check_scenarios(scenarios, max_scenarios)
+        
         # Default scenarios
         if scenarios is None:
             scenarios = {
@@ -142,28 +294,129 @@ class ANNModel:
                 }
             }
         
-        forecasts = {}
+        # Baseline in row 0, one row per scenario, all scored in one forward pass
+        base = self.schema.encode(features_dict)
+        X = np.repeat(base, len(scenarios) + 1, axis=0)
         
-        for scenario_name, multipliers in scenarios.items():
-            # Create modified features
-            modified_features = features_dict.copy()
-            
+        for row, multipliers in enumerate(scenarios.values(), start=1):
             for feature, multiplier in multipliers.items():
-                if feature in modified_features:
-                    modified_features[feature] *= multiplier
-            
-            # Get prediction
-            result = self.predict_single(modified_features)
-            forecasts[scenario_name] = result['predicted_grade']
+                if feature in features_dict:
+                    X[row, self.schema.columns[feature]] *= multiplier
+        
+        grades = self._predict_grades(X)
+        forecasts = dict(zip(scenarios.keys(), grades[1:].tolist()))
         
         return {
-            'current_prediction': self.predict_single(features_dict)['predicted_grade'],
+            'current_prediction': float(grades[0]),
             'scenarios': forecasts,
             'best_case': max(forecasts.values()),
             'worst_case': min(forecasts.values()),
             'range': max(forecasts.values()) - min(forecasts.values())
         }
     
+    def _check_scenarios(self, scenarios, max_scenarios=None):
+        """Raise ValueError unless scenarios maps names to {known feature: finite multiplier}"""
+        if not isinstance(scenarios, dict) or not scenarios:
+            raise ValueError("'scenarios' must be a non-empty object mapping scenario names to multipliers")
+        if max_scenarios is not None and len(scenarios) > max_scenarios:
+            raise ValueError(f"{len(scenarios)} scenarios exceed the limit of {max_scenarios}")
+        
+        for name, multipliers in scenarios.items():
+            if not isinstance(multipliers, dict):
+                raise ValueError(f"Scenario '{name}' must map feature names to multipliers")
+            for feature, multiplier in multipliers.items():
+                if feature not in self.schema.columns:
+                    raise ValueError(f"Unknown feature '{feature}' in scenario '{name}'")
+                if isinstance(multiplier, bool) or not isinstance(multiplier, (int, float)) \
+                        or not np.isfinite(multiplier):
+                    raise ValueError(f"Multiplier for '{feature}' in scenario '{name}' must be a finite number")
+    
+    def evaluate_scenario_grid(self, features_dict, multipliers=None, overrides=None, max_rows=None):
+        """
+        Evaluate every combination of a what-if grid in a single forward pass
+        Args:
+            features_dict: current student features
+            multipliers: dict mapping feature name to a list of factors applied to its current value
+            overrides: dict mapping feature name to a list of absolute values
+            max_rows: maximum number of combinations allowed (optional)
+        Returns:
+            dict with the current prediction and a compact table of one row per
+            combination: the grid values followed by the predicted grade
+        """
+        if not self.is_trained or self.task != 'regression':
+            raise Exception("Model not trained for regression or task is classification")
+        
+        multipliers = multipliers or {}
+        overrides = overrides or {}
+        
+        # Each grid axis is (feature, mode, values)
+        axes = []
+        for mode, spec in (('multiplier', multipliers), ('override', overrides)):
+            if not isinstance(spec, dict):
+                raise ValueError(f"Scenario {mode}s must map feature names to lists of values")
+            for feature, values in spec.items():
+                if feature not in self.schema.columns:
+                    raise ValueError(f"Unknown feature '{feature}' in scenario grid")
+                if not isinstance(values, list) or not values:
+                    raise ValueError(f"Scenario values for '{feature}' must be a non-empty list")
+                if any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in values):
+                    raise ValueError(f"Scenario values for '{feature}' must be numeric")
+                values = np.asarray(values, dtype=np.float64)
+                if not np.isfinite(values).all():
+                    raise ValueError(f"Scenario values for '{feature}' must be finite")
+                axes.append((feature, mode, values))
+        
+        features = [feature for feature, _, _ in axes]
+        if len(set(features)) != len(features):
+            raise ValueError("A feature can have either multipliers or overrides, not both")
+        if not axes:
+            raise ValueError("Scenario grid must contain at least one multiplier or override")
+        
+        shape = tuple(len(values) for _, _, values in axes)
+        # Python ints: np.prod wraps around int64 on large grids and would slip past max_rows
+        n_rows = math.prod(shape)
+        if max_rows is not None and n_rows > max_rows:
+            raise ValueError(f"Scenario grid has {n_rows} combinations, exceeding the limit of {max_rows}")
+        
+        # Expand the grid into one matrix after the baseline row:
+        # scenario r takes value index grid_index[a, r] on axis a
+        base = self.schema.encode(features_dict)
+        grid_index = np.indices(shape).reshape(len(axes), -1)
+        X = np.repeat(base, n_rows + 1, axis=0)
+        table = np.empty((n_rows, len(axes) + 1))
+        
+        for a, (feature, mode, values) in enumerate(axes):
+            col = self.schema.columns[feature]
+            table[:, a] = values[grid_index[a]]
+            if mode == 'multiplier':
+                X[1:, col] *= table[:, a]
+            else:
+                X[1:, col] = table[:, a]
+        
+        grades = self._predict_grades(X)
+        current = float(grades[0])
+        table[:, -1] = grades[1:]
+        best, worst = table[:, -1].argmax(), table[:, -1].argmin()
+        
+        return {
+            'current_prediction': current,
+            'axes': [
+                {'feature': feature, 'mode': mode, 'values': values.tolist()}
+                for feature, mode, values in axes
+            ],
+            'columns': features + ['predicted_grade'],
+            'rows': table.tolist(),
+            'n_scenarios': n_rows,
+            'best_case': {'row': int(best), 'predicted_grade': float(table[best, -1])},
+            'worst_case': {'row': int(worst), 'predicted_grade': float(table[worst, -1])},
+            'range': float(table[best, -1] - table[worst, -1])
+        }
+    
+    def _predict_grades(self, X):
+        """Grades for every row of X from a single forward pass, clipped to 0-20"""
+        return np.clip(self._forward(X)[:, 0], 0, 20)
+    
+    @cached_prediction
     def get_time_series_forecast(self, features_dict, periods=4):
         """
         Generate time-series forecast
@@ -173,7 +426,22 @@ class ANNModel:
             raise Exception("Model not trained for regression")
         
         current_pred = self.predict_single(features_dict)['predicted_grade']
+        return self._build_time_series(current_pred, periods)
+    
+    def get_time_series_forecast_batch(self, features_list, periods=4):
+        """
+        Generate time-series forecasts for many students with a single forward pass
+        """
+        if not self.is_trained or self.task != 'regression':
+            raise Exception("Model not trained for regression")
         
+        return [
+            self._build_time_series(result['predicted_grade'], periods)
+            for result in self.predict_batch(features_list)
+        ]
+    
+    def _build_time_series(self, current_pred, periods):
+        """Simulate improvement scenarios from a current grade prediction"""
         forecasts = [current_pred]
         
         # Simulate improvement scenarios
@@ -253,14 +521,20 @@ class ANNModel:
             'classes': self.classes,
             'metrics': self.metrics
         }
-        joblib.dump(model_data, filepath)
+        dump_atomic(model_data, filepath)
         
-    def load_model(self, filepath):
-        """Load trained model"""
-        model_data = joblib.load(filepath)
+    def load_model(self, filepath, mmap_mode=None):
+        """
+        Load trained model
+        Args:
+            mmap_mode: 'r' to memory-map the model arrays read-only so processes share them
+        """
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.task = model_data.get('task', 'regression')
         self.feature_names = model_data.get('feature_names')
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = model_data.get('classes')
         self.metrics = model_data.get('metrics')
         self.is_trained = True
+        self._compile()
@@ -9,6 +9,10 @@ from sklearn.tree import DecisionTreeClassifier, export_text
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
+from utils.prediction_cache import cached_prediction
+
 
 class DecisionTreeModel:
     def __init__(self, max_depth=5, min_samples_split=20):
@@ -19,15 +23,28 @@ class DecisionTreeModel:
         )
         self.is_trained = False
         self.feature_names = None
+        self.schema = None
+        self.cache = None
         self.classes = None
         self.metrics = None
         
+        # Flattened tree for single-pass traversal
+        self.children_left = None
+        self.children_right = None
+        self.node_feature = None
+        self.node_threshold = None
+        self.node_proba = None
+        self.node_rules = None
+        self.feature_importance = None
+        
     def train(self, X, y, feature_names=None):
         """Train the Decision Tree model"""
         self.model.fit(X, y)
         self.is_trained = True
         self.feature_names = feature_names if feature_names else [f'feature_{i}' for i in range(X.shape[1])]
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = self.model.classes_
+        self._compile()
         
         # Calculate training metrics
         train_predictions = self.model.predict(X)
@@ -35,36 +52,107 @@ class DecisionTreeModel:
             'train_accuracy': accuracy_score(y, train_predictions)
         }
         
+    def _compile(self):
+        """Flatten the fitted tree into arrays and precompute feature importance"""
+        tree = self.model.tree_
+        
+        self.children_left = np.asarray(tree.children_left)
+        self.children_right = np.asarray(tree.children_right)
+        self.node_feature = np.asarray(tree.feature)
+        self.node_threshold = np.asarray(tree.threshold)
+        
+        # Class probabilities at every node (only leaves are used for predictions)
+        values = tree.value[:, 0, :]
+        self.node_proba = values / values.sum(axis=1, keepdims=True)
+        
+        # Rule text for both branches of every split node, built once
+        self.node_rules = [
+            None if self.children_left[node_id] == -1 else (
+                self.feature_names[self.node_feature[node_id]],
+                int(self.node_feature[node_id]),
+                float(self.node_threshold[node_id]),
+                f"{self.feature_names[self.node_feature[node_id]]} <= {self.node_threshold[node_id]:.2f}",
+                f"{self.feature_names[self.node_feature[node_id]]} > {self.node_threshold[node_id]:.2f}"
+            )
+            for node_id in range(tree.node_count)
+        ]
+        
+        self.feature_importance = self._compute_feature_importance()
+    
+    def _traverse(self, X, record_path=False):
+        """
+        Walk every row of X from the root to its leaf in one pass
+        Returns:
+            leaf node id per row, and (if record_path) a matrix of visited
+            node ids per row padded with -1
+        """
+        # The tree compares float32 features against its thresholds
+        Xf = X.astype(np.float32)
+        n_rows = len(Xf)
+        
+        node = np.zeros(n_rows, dtype=np.intp)
+        active = np.ones(n_rows, dtype=bool)
+        path = np.full((n_rows, self.model.tree_.max_depth + 1), -1, dtype=np.intp) if record_path else None
+        
+        for depth in range(self.model.tree_.max_depth + 1):
+            if record_path:
+                path[active, depth] = node[active]
+            
+            # Rows sitting on a leaf are done (children_left is -1 for leaves)
+            active &= self.children_left[node] != -1
+            rows = np.nonzero(active)[0]
+            if len(rows) == 0:
+                break
+            
+            current = node[rows]
+            go_left = Xf[rows, self.node_feature[current]] <= self.node_threshold[current]
+            node[rows] = np.where(go_left, self.children_left[current], self.children_right[current])
+        
+        return node, path
+    
     def predict(self, X):
         """Make predictions"""
-        if not self.is_trained:
-            raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
     
     def predict_proba(self, X):
         """Get probability distributions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict_proba(X)
+        
+        X = self.schema.check_array(X)
+        leaves, _ = self._traverse(X)
+        return self.node_proba[leaves]
     
+    @cached_prediction
     def predict_single(self, features_dict):
         """
         Make prediction for a single instance
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             dict with predicted class and probabilities
         """
+        return self.predict_batch(features_dict)[0]
+    
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many instances with a single tree traversal
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of dicts with predicted class and probabilities
+        """
         if not self.is_trained:
             raise Exception("Model not trained yet")
         
-        # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
-        
-        # Get prediction and probabilities
-        prediction = self.model.predict(X)[0]
-        probabilities = self.model.predict_proba(X)[0]
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
+        leaves, _ = self._traverse(X)
         
+        return [self._format_prediction(self.node_proba[leaf]) for leaf in leaves]
+    
+    def _format_prediction(self, probabilities):
+        """Build the prediction dict from a leaf's class probabilities"""
         # Create probability dict
         prob_dict = {
             str(cls): float(prob) 
@@ -72,61 +160,65 @@ class DecisionTreeModel:
         }
         
         return {
-            'predicted_class': str(prediction),
+            'predicted_class': str(self.classes[probabilities.argmax()]),
             'probabilities': prob_dict,
             'confidence': float(max(probabilities))
         }
     
+    @cached_prediction
     def get_decision_path(self, features_dict):
         """
         Get the decision path for a prediction
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             dict with decision path information
         """
+        return self.get_decision_path_batch(features_dict)[0]
+    
+    def get_decision_path_batch(self, features_list):
+        """
+        Get decision paths for many students with a single tree traversal
+        The leaf reached by the walk gives both the path and the prediction
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of dicts with decision path information
+        """
         if not self.is_trained:
             raise Exception("Model not trained yet")
         
-        # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
-        
-        # Get decision path
-        node_indicator = self.model.decision_path(X)
-        leaf_id = self.model.apply(X)
-        
-        # Get prediction
-        prediction = self.predict_single(features_dict)
-        
-        # Extract path
-        node_index = node_indicator.indices[node_indicator.indptr[0]:node_indicator.indptr[1]]
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
+        leaves, paths = self._traverse(X, record_path=True)
         
+        return [
+            self._build_decision_path(X[row], paths[row], self._format_prediction(self.node_proba[leaf]))
+            for row, leaf in enumerate(leaves)
+        ]
+    
+    def _build_decision_path(self, x, path, prediction):
+        """Build the decision path response for one row from its visited nodes"""
         path_rules = []
-        for node_id in node_index:
-            # Check if not a leaf node
-            if leaf_id[0] == node_id:
-                continue
+        for depth in range(len(path) - 1):
+            node_id = path[depth]
+            next_node = path[depth + 1]
+            
+            # The next entry is -1 once the leaf has been reached
+            if next_node == -1:
+                break
             
-            # Get feature and threshold
-            feature_idx = self.model.tree_.feature[node_id]
-            threshold = self.model.tree_.threshold[node_id]
+            feature_name, feature_idx, threshold, condition_left, condition_right = self.node_rules[node_id]
             
-            if feature_idx != -2:  # -2 indicates leaf node
-                feature_name = self.feature_names[feature_idx]
-                feature_value = features_dict.get(feature_name, 0)
-                
-                # Determine direction
-                if feature_value <= threshold:
-                    direction = '<='
-                else:
-                    direction = '>'
-                
-                path_rules.append({
-                    'feature': feature_name,
-                    'threshold': float(threshold),
-                    'value': float(feature_value),
-                    'condition': f"{feature_name} {direction} {threshold:.2f}"
-                })
+            # Direction is the branch the walk actually took
+            went_left = next_node == self.children_left[node_id]
+            
+            path_rules.append({
+                'feature': feature_name,
+                'threshold': threshold,
+                'value': float(x[feature_idx]),
+                'condition': condition_left if went_left else condition_right
+            })
         
         return {
             'predicted_class': prediction['predicted_class'],
@@ -137,10 +229,14 @@ class DecisionTreeModel:
         }
     
     def get_feature_importance(self):
-        """Get feature importance scores"""
+        """Get feature importance scores (computed once when the model is trained or loaded)"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
         
+        return self.feature_importance
+    
+    def _compute_feature_importance(self):
+        """Sort the fitted feature importances"""
         importances = self.model.feature_importances_
         
         feature_importance = {
@@ -201,13 +297,19 @@ class DecisionTreeModel:
             'classes': self.classes,
             'metrics': self.metrics
         }
-        joblib.dump(model_data, filepath)
+        dump_atomic(model_data, filepath)
         
-    def load_model(self, filepath):
-        """Load trained model"""
-        model_data = joblib.load(filepath)
+    def load_model(self, filepath, mmap_mode=None):
+        """
+        Load trained model
+        Args:
+            mmap_mode: 'r' to memory-map the model arrays read-only so processes share them
+        """
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.feature_names = model_data.get('feature_names')
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = model_data.get('classes')
         self.metrics = model_data.get('metrics')
         self.is_trained = True
+        self._compile()
@@ -3,68 +3,306 @@ K-Nearest Neighbors Model for Student Similarity Analysis
 Finds similar students and predicts performance based on K nearest neighbors
 """
 
+import copy
+
 import pandas as pd
 import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score, classification_report, pairwise_distances
 import joblib
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
+from utils.prediction_cache import cached_prediction
+from models.neighbor_index import RandomProjectionForest
+
+
+# Map numeric class labels to performance labels
+# LabelEncoder encodes alphabetically: At-Risk=0, Average=1, Good=2
+LABEL_MAPPING = {
+    '0': 'At-Risk',
+    '1': 'Average',
+    '2': 'Good'
+}
+
+# Neighbor sets up to this many rows get each row's label text and feature dict
+# prebuilt (about 1 KB per row); larger ones, such as those behind an approximate
+# index, build them for the returned neighbors only
+PREBUILT_NEIGHBOR_ROWS = 10000
+
+# Training accuracy is measured on at most this many training rows; each scored
+# row is a neighbor search over the whole training set
+TRAIN_METRIC_ROWS = 10000
+
 
 class KNNModel:
-    def __init__(self, n_neighbors=5):
-        self.model = KNeighborsClassifier(n_neighbors=n_neighbors)
+    def __init__(self, n_neighbors=5, algorithm='auto', index_params=None, rebuild_ratio=0.25):
+        """
+        Initialize KNN model
+        Args:
+            n_neighbors: number of neighbors that vote on a prediction
+            algorithm: neighbor search index - 'auto', 'brute', 'kd_tree' or 'ball_tree'
+                       for exact search, or 'rp_forest' for an approximate
+                       random-projection forest suited to very large populations
+            index_params: options for the approximate index
+                          (n_trees, leaf_size, search_trees, random_state)
+            rebuild_ratio: rows added by partial_update are searched exactly until they
+                           exceed this fraction of the indexed rows, then the index is rebuilt
+        """
+        if algorithm == 'rp_forest':
+            # The classifier only stores the data; searches go through the forest
+            self.model = KNeighborsClassifier(n_neighbors=n_neighbors, algorithm='brute')
+            self.ann_index = RandomProjectionForest(**(index_params or {}))
+        else:
+            self.model = KNeighborsClassifier(n_neighbors=n_neighbors, algorithm=algorithm)
+            self.ann_index = None
+        
         self.is_trained = False
         self.feature_names = None
+        self.schema = None
+        self.cache = None
         self.classes = None
         self.metrics = None
         self.X_train = None
         self.y_train = None
         
+        # Rows added since the index was built, searched brute-force and merged into
+        # the results; their neighbor indices continue after the indexed rows
+        self.rebuild_ratio = rebuild_ratio
+        self.appended_X = None
+        self.appended_y = None
+        
+        # Class index of every neighbor row, used by the vote, and the prebuilt
+        # per-row pieces of neighbor responses (None above PREBUILT_NEIGHBOR_ROWS)
+        self.train_class_index = None
+        self.class_labels = None
+        self.train_labels = None
+        self.train_features = None
+        
     def train(self, X, y, feature_names=None):
         """Train the KNN model"""
+        # One float64 matrix referenced by X_train, the classifier and the index
+        X = np.ascontiguousarray(X, dtype=np.float64)
         self.model.fit(X, y)
         self.is_trained = True
         self.feature_names = feature_names if feature_names else [f'feature_{i}' for i in range(X.shape[1])]
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = np.unique(y)
         self.X_train = X
         self.y_train = y
+        self.appended_X = self.appended_y = None
+        if self.ann_index is not None:
+            self.ann_index.fit(X)
+        self._compile()
         
-        # Calculate training metrics
-        train_predictions = self.model.predict(X)
+        # Calculate training metrics through the configured search, on a sample of large sets
+        sample = np.arange(len(X))
+        if len(X) > TRAIN_METRIC_ROWS:
+            sample = np.random.RandomState(42).choice(len(X), TRAIN_METRIC_ROWS, replace=False)
+        train_predictions = self.predict(X[sample])
         self.metrics = {
-            'train_accuracy': accuracy_score(y, train_predictions)
+            'train_accuracy': accuracy_score(np.asarray(y)[sample], train_predictions)
         }
         
-    def predict(self, X):
-        """Make predictions"""
+    def _compile(self):
+        """Map every neighbor row to its class and prebuild the per-row response pieces"""
+        y = self.y_train
+        if self.appended_y is not None:
+            y = np.concatenate([y, self.appended_y])
+        
+        self.train_class_index = np.searchsorted(self.classes, y)
+        self.class_labels = [LABEL_MAPPING.get(str(label), str(label)) for label in self.classes]
+        
+        if len(y) <= PREBUILT_NEIGHBOR_ROWS:
+            self.train_labels, self.train_features = self._neighbor_fragments(
+                self.train_class_index, self._neighbor_rows(np.arange(len(y)))
+            )
+        else:
+            self.train_labels = self.train_features = None
+    
+    def _neighbor_fragments(self, class_index, rows):
+        """Label texts and feature dicts of neighbor rows, as returned in neighbor responses"""
+        labels = [self.class_labels[c] for c in class_index.tolist()]
+        features = [dict(zip(self.feature_names, row)) for row in np.asarray(rows, dtype=np.float64).tolist()]
+        return labels, features
+    
+    def _neighbor_rows(self, indices):
+        """Feature rows for neighbor indices, which continue into the appended rows"""
+        rows = np.empty((len(indices), len(self.feature_names)))
+        indexed = indices < len(self.X_train)
+        rows[indexed] = self.X_train[indices[indexed]]
+        if not indexed.all():
+            rows[~indexed] = self.appended_X[indices[~indexed] - len(self.X_train)]
+        return rows
+    
+    def partial_update(self, X, y):
+        """
+        Append newly labeled rows to the neighbor set
+        New rows are searched exactly alongside the index until they exceed
+        `rebuild_ratio` of the indexed rows, so most updates cost only the new rows
+        Updates several attributes in turn, so it must not run on a model that is
+        serving predictions; the API updates a copy and swaps it in
+        """
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        
+        X = self.schema.check_array(X)
+        y = np.asarray(y)
+        
+        unknown = np.setdiff1d(y, self.classes)
+        if len(unknown):
+            raise ValueError(f"Cannot add unseen classes incrementally: {unknown.tolist()}")
+        
+        appended_X = X if self.appended_X is None else np.vstack([self.appended_X, X])
+        appended_y = y if self.appended_y is None else np.concatenate([self.appended_y, y])
+        
+        class_index = np.searchsorted(self.classes, y)
+        train_labels = train_features = None
+        if self.train_features is not None and len(self.train_class_index) + len(y) <= PREBUILT_NEIGHBOR_ROWS:
+            labels, features = self._neighbor_fragments(class_index, X)
+            train_labels, train_features = self.train_labels + labels, self.train_features + features
+        
+        # Extend the vote classes and response pieces before publishing the new rows to searches
+        self.train_class_index = np.concatenate([self.train_class_index, class_index])
+        self.train_labels, self.train_features = train_labels, train_features
+        self.appended_X, self.appended_y = appended_X, appended_y
+        
+        if len(appended_X) > self.rebuild_ratio * len(self.X_train):
+            self._rebuild_index()
+    
+    def _rebuild_index(self):
+        """Merge the appended rows into the training set and rebuild the search index"""
+        X = np.vstack([self.X_train, self.appended_X])
+        y = np.concatenate([self.y_train, self.appended_y])
+        
+        # Row order is unchanged, so the vote classes stay valid
+        self.model.fit(X, y)
+        if self.ann_index is not None:
+            self.ann_index.fit(X)
+        
+        self.X_train, self.y_train = X, y
+        self.appended_X = self.appended_y = None
+    
+    def _query(self, X, k):
+        """
+        Run the neighbor searches for a request and derive the vote
+        The vote always comes from a search of the model's own n_neighbors, so the
+        prediction does not depend on k (neighbors at equal distance may be ordered
+        differently by searches of different sizes); the k reported neighbors
+        need a second search only when k differs from n_neighbors
+        Returns:
+            distances and indices of the k nearest neighbors, and class probabilities
+        """
+        n_vote = self.model.n_neighbors
+        vote_distances, vote_indices = self._search(X, n_vote)
+        
+        if k == n_vote:
+            distances, indices = vote_distances, vote_indices
+        else:
+            distances, indices = self._search(X, k)
+        
+        vote_classes = self.train_class_index[vote_indices]
+        weights = self._vote_weights(vote_distances)
+        
+        probabilities = np.zeros((len(X), len(self.classes)))
+        for class_idx in range(len(self.classes)):
+            probabilities[:, class_idx] = (weights * (vote_classes == class_idx)).sum(axis=1)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        
+        return distances, indices, probabilities
+    
+    def _search(self, X, n_neighbors):
+        """
+        Neighbor search through the approximate index if one is configured,
+        merged with an exact search over rows appended since the index was built
+        """
+        appended_X = self.appended_X
+        n_indexed = len(self.X_train)
+        n_index_query = min(n_neighbors, n_indexed) if appended_X is not None else n_neighbors
+        
+        if self.ann_index is not None:
+            distances, indices = self.ann_index.kneighbors(X, n_neighbors=n_index_query)
+        else:
+            distances, indices = self.model.kneighbors(X, n_neighbors=n_index_query)
+        
+        if appended_X is None:
+            return distances, indices
+        
+        appended_distances = pairwise_distances(
+            X, appended_X, metric=self.model.effective_metric_,
+            **(self.model.effective_metric_params_ or {})
+        )
+        appended_indices = np.broadcast_to(np.arange(n_indexed, n_indexed + len(appended_X)),
+                                           appended_distances.shape)
+        
+        # Only the nearest n_neighbors appended rows can make the final list
+        if len(appended_X) > n_neighbors:
+            nearest = np.argpartition(appended_distances, n_neighbors - 1, axis=1)[:, :n_neighbors]
+            appended_distances = np.take_along_axis(appended_distances, nearest, axis=1)
+            appended_indices = np.take_along_axis(appended_indices, nearest, axis=1)
+        
+        # Stable sort keeps indexed rows ahead of appended rows at equal distance
+        distances = np.hstack([distances, appended_distances])
+        indices = np.hstack([indices, appended_indices])
+        order = np.argsort(distances, axis=1, kind='stable')[:, :n_neighbors]
+        
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+    
+    def _vote_weights(self, distances):
+        """Neighbor vote weights matching the model's `weights` setting"""
+        if self.model.weights == 'distance':
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            # Exact matches take the whole vote
+            inf_mask = np.isinf(weights)
+            inf_rows = inf_mask.any(axis=1)
+            weights[inf_rows] = inf_mask[inf_rows]
+            return weights
+        
+        if callable(self.model.weights):
+            return self.model.weights(distances)
+        
+        return np.ones_like(distances)
+    
+    def predict(self, X):
+        """Make predictions"""
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
     
     def predict_proba(self, X):
         """Get probability distributions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict_proba(X)
+        
+        X = self.schema.check_array(X)
+        _, _, probabilities = self._query(X, self.model.n_neighbors)
+        return probabilities
     
+    @cached_prediction
     def predict_single(self, features_dict):
         """
         Make prediction for a single instance
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             dict with predicted class and probabilities
         """
-        if not self.is_trained:
-            raise Exception("Model not trained yet")
-        
-        # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
-        
-        # Get prediction and probabilities
-        prediction = self.model.predict(X)[0]
-        probabilities = self.model.predict_proba(X)[0]
+        return self.predict_batch(features_dict)[0]
+    
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many instances with a single neighbor search
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of dicts with predicted class and probabilities
+        """
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
         
+        return [self._format_prediction(probs) for probs in self.predict_proba(X)]
+    
+    def _format_prediction(self, probabilities):
+        """Build the prediction dict for one row of class probabilities"""
         # Create probability dict
         prob_dict = {
             str(cls): float(prob) 
@@ -72,7 +310,7 @@ class KNNModel:
         }
         
         return {
-            'predicted_class': str(prediction),
+            'predicted_class': str(self.classes[probabilities.argmax()]),
             'probabilities': prob_dict,
             'confidence': float(max(probabilities))
         }
@@ -81,68 +319,98 @@ class KNNModel:
         """
         Find K nearest neighbors for a given student
         Args:
-            features_dict: dict with feature names and values
-            k: number of neighbors (default: model's n_neighbors)
+            features_dict: dict with feature names and values, or an encoded feature row
+            k: number of neighbors, from 1 to the number of training rows
+               (default: model's n_neighbors)
         Returns:
             dict with neighbor information
         """
+        # Validate before the cache lookup, which would match k=True to a cached k=1
+        return self._find_nearest_neighbors(features_dict, self._check_k(k))
+    
+    @cached_prediction
+    def _find_nearest_neighbors(self, features_dict, k):
+        """Neighbor response for one student with a validated k"""
+        return self.find_nearest_neighbors_batch(features_dict, k=k)[0]
+    
+    def _check_k(self, k):
+        """Return k (default: n_neighbors) as an int, or raise ValueError if it is out of range"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
         
-        k = k or self.model.n_neighbors
+        if k is None:
+            return self.model.n_neighbors
         
-        # Map numeric class labels to performance labels
-        label_mapping = {
-            '0': 'At-Risk',
-            '1': 'Average',
-            '2': 'Good'
-        }
+        n_rows = len(self.train_class_index)
+        if isinstance(k, bool) or not isinstance(k, (int, np.integer)) or not 1 <= k <= n_rows:
+            raise ValueError(f"k must be an integer between 1 and {n_rows}")
+        
+        return int(k)
+    
+    def find_nearest_neighbors_batch(self, features_list, k=None):
+        """
+        Find K nearest neighbors for many students
+        With the default k one search provides the neighbors, the vote and the prediction
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+            k: number of neighbors, from 1 to the number of training rows
+               (default: model's n_neighbors)
+        Returns:
+            list of dicts with neighbor information
+        """
+        k = self._check_k(k)
+        
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
+        distances, indices, probabilities = self._query(X, k)
+        
+        return [
+            self._build_neighbor_result(row_distances, row_indices, self._format_prediction(probs), k)
+            for row_distances, row_indices, probs in zip(distances, indices, probabilities)
+        ]
+    
+    def _build_neighbor_result(self, distances, indices, prediction, k):
+        """Build the neighbor response for one query row from the prebuilt per-row pieces"""
+        distance_list = distances.tolist()
+        
+        if self.train_features is not None:
+            neighbor_labels_text = [self.train_labels[idx] for idx in indices.tolist()]
+            neighbor_features = [self.train_features[idx] for idx in indices.tolist()]
+        else:
+            # Too many rows to prebuild; convert only this row's neighbors
+            neighbor_labels_text, neighbor_features = self._neighbor_fragments(
+                self.train_class_index[indices], self._neighbor_rows(indices)
+            )
         
-        # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
-        
-        # Find nearest neighbors
-        distances, indices = self.model.kneighbors(X, n_neighbors=k)
-        
-        neighbors = []
-        neighbor_labels_text = []
-        for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-            neighbor_features = self.X_train[idx]
-            neighbor_label = self.y_train[idx]
-            neighbor_label_text = label_mapping.get(str(neighbor_label), str(neighbor_label))
-            neighbor_labels_text.append(neighbor_label_text)
-            
-            neighbors.append({
+        neighbors = [
+            {
                 'rank': i + 1,
-                'distance': float(dist),
-                'performance_label': neighbor_label_text,
-                'features': {
-                    name: float(val) 
-                    for name, val in zip(self.feature_names, neighbor_features)
-                }
-            })
+                'distance': dist,
+                'performance_label': label,
+                'features': features
+            }
+            for i, (dist, features, label) in enumerate(zip(distance_list, neighbor_features, neighbor_labels_text))
+        ]
         
         # Count labels in neighbors
         label_counts = {}
         for label in neighbor_labels_text:
             label_counts[label] = label_counts.get(label, 0) + 1
         
-        # Get prediction
-        prediction = self.predict_single(features_dict)
-        predicted_label = label_mapping.get(str(prediction['predicted_class']), str(prediction['predicted_class']))
+        predicted_label = LABEL_MAPPING.get(prediction['predicted_class'], prediction['predicted_class'])
         
         # Convert probabilities to labeled
-        labeled_probs = {}
-        for numeric_label, prob in prediction['probabilities'].items():
-            text_label = label_mapping.get(str(numeric_label), str(numeric_label))
-            labeled_probs[text_label] = prob
+        labeled_probs = {
+            LABEL_MAPPING.get(numeric_label, numeric_label): prob
+            for numeric_label, prob in prediction['probabilities'].items()
+        }
         
         return {
             'predicted_label': predicted_label,
             'confidence': prediction['confidence'],
             'probabilities': labeled_probs,
             'neighbors': neighbor_labels_text,
-            'distances': distances[0].tolist(),
+            'distances': distance_list,
             'neighbor_details': neighbors,
             'neighbor_distribution': label_counts,
             'k': k
@@ -163,23 +431,48 @@ class KNNModel:
     
     def save_model(self, filepath):
         """Save trained model"""
+        # The training matrix is stored once, as X_train; the classifier and the
+        # index get references to it back on load
+        model = copy.copy(self.model)
+        model._fit_X = None
+        ann_index = copy.copy(self.ann_index)
+        if ann_index is not None:
+            ann_index.X = None
+        
         model_data = {
-            'model': self.model,
+            'model': model,
             'feature_names': self.feature_names,
             'classes': self.classes,
             'metrics': self.metrics,
             'X_train': self.X_train,
-            'y_train': self.y_train
+            'y_train': self.y_train,
+            'ann_index': ann_index,
+            'appended_X': self.appended_X,
+            'appended_y': self.appended_y
         }
-        joblib.dump(model_data, filepath)
+        dump_atomic(model_data, filepath)
         
-    def load_model(self, filepath):
-        """Load trained model"""
-        model_data = joblib.load(filepath)
+    def load_model(self, filepath, mmap_mode=None):
+        """
+        Load trained model
+        Args:
+            mmap_mode: 'r' to memory-map the model arrays read-only so processes share them
+        """
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.feature_names = model_data.get('feature_names')
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = model_data.get('classes')
         self.metrics = model_data.get('metrics')
         self.X_train = model_data.get('X_train')
         self.y_train = model_data.get('y_train')
+        self.ann_index = model_data.get('ann_index')
+        self.appended_X = model_data.get('appended_X')
+        self.appended_y = model_data.get('appended_y')
+        # Artifacts saved before the matrix was shared still carry their own copies
+        if getattr(self.model, '_fit_X', None) is None:
+            self.model._fit_X = self.X_train
+        if self.ann_index is not None and self.ann_index.X is None:
+            self.ann_index.X = self.X_train
         self.is_trained = True
+        self._compile()
@@ -11,19 +11,35 @@ from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 import os
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
+from utils.prediction_cache import cached_prediction
+
 
 class LinearRegressionModel:
     def __init__(self):
         self.model = LinearRegression()
         self.is_trained = False
         self.feature_names = None
+        self.schema = None
+        self.cache = None
         self.metrics = None
         
+        # Fitted parameters for the NumPy fast path
+        self.coef = None
+        self.intercept = None
+        
+        # Sufficient statistics (Z'Z, Z'y and row count, Z = [1, X]) for incremental refits
+        self.sufficient_stats = None
+        
     def train(self, X, y, feature_names=None):
         """Train the linear regression model"""
         self.model.fit(X, y)
         self.is_trained = True
         self.feature_names = feature_names if feature_names else [f'feature_{i}' for i in range(X.shape[1])]
+        self.schema = FeatureSchema(self.feature_names)
+        self._compile()
+        self.sufficient_stats = self._sufficient_statistics(X, y)
         
         # Calculate training metrics
         train_predictions = self.model.predict(X)
@@ -33,17 +49,62 @@ class LinearRegressionModel:
             'train_mae': mean_absolute_error(y, train_predictions)
         }
         
+    def _compile(self):
+        """Extract coefficients so inference is a plain dot product"""
+        self.coef = np.ascontiguousarray(self.model.coef_, dtype=np.float64)
+        self.intercept = float(self.model.intercept_)
+    
+    def _sufficient_statistics(self, X, y):
+        """Z'Z, Z'y and row count for the design matrix Z = [1, X]"""
+        Z = np.column_stack([np.ones(len(X)), np.asarray(X, dtype=np.float64)])
+        y = np.asarray(y, dtype=np.float64)
+        return {'ztz': Z.T @ Z, 'zty': Z.T @ y, 'n_samples': len(X)}
+    
+    def partial_update(self, X, y):
+        """
+        Add newly labeled rows and refit from the updated sufficient statistics
+        Cost depends on the number of new rows and features, not on the training history
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        if self.sufficient_stats is None:
+            raise Exception("Model artifact has no sufficient statistics; retrain to enable updates")
+        
+        X = self.schema.check_array(X)
+        new = self._sufficient_statistics(X, y)
+        stats = {
+            'ztz': self.sufficient_stats['ztz'] + new['ztz'],
+            'zty': self.sufficient_stats['zty'] + new['zty'],
+            'n_samples': self.sufficient_stats['n_samples'] + new['n_samples']
+        }
+        
+        # Least-squares solve of the normal equations (robust to collinear features)
+        beta = np.linalg.lstsq(stats['ztz'], stats['zty'], rcond=None)[0]
+        self.model.coef_ = beta[1:]
+        self.model.intercept_ = float(beta[0])
+        self.sufficient_stats = stats
+        self._compile()
+    
     def predict(self, X):
-        """Make predictions"""
+        """
+        Make predictions
+        Computes X @ coef + intercept directly instead of going through
+        sklearn's input validation and dispatch on every call
+        """
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        
+        # check_array also rejects NaN and infinity
+        X = self.schema.check_array(X)
+        
+        return X @ self.coef + self.intercept
     
+    @cached_prediction
     def predict_single(self, features_dict):
         """
         Make prediction for a single instance
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             predicted grade (float)
         """
@@ -51,12 +112,29 @@ class LinearRegressionModel:
             raise Exception("Model not trained yet")
         
         # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
-        prediction = self.model.predict(X)[0]
+        X = self.schema.encode(features_dict)
+        prediction = self.predict(X)[0]
         
         # Clip prediction to valid grade range (0-20)
         return float(np.clip(prediction, 0, 20))
     
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many instances with a single model call
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of predicted grades (float)
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
+        predictions = np.clip(self.predict(X), 0, 20)
+        
+        return [float(p) for p in predictions]
+    
     def evaluate(self, X_test, y_test):
         """Evaluate model performance"""
         predictions = self.predict(X_test)
@@ -90,14 +168,22 @@ class LinearRegressionModel:
         model_data = {
             'model': self.model,
             'feature_names': self.feature_names,
-            'metrics': self.metrics
+            'metrics': self.metrics,
+            'sufficient_stats': self.sufficient_stats
         }
-        joblib.dump(model_data, filepath)
+        dump_atomic(model_data, filepath)
         
-    def load_model(self, filepath):
-        """Load trained model"""
-        model_data = joblib.load(filepath)
+    def load_model(self, filepath, mmap_mode=None):
+        """
+        Load trained model
+        Args:
+            mmap_mode: 'r' to memory-map the model arrays read-only so processes share them
+        """
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.feature_names = model_data.get('feature_names')
+        self.schema = FeatureSchema(self.feature_names)
+        self._compile()
         self.metrics = model_data.get('metrics')
+        self.sufficient_stats = model_data.get('sufficient_stats')
         self.is_trained = True
@@ -9,58 +9,192 @@ from sklearn.naive_bayes import GaussianNB
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
+from utils.prediction_cache import cached_prediction
+
+
+# Map numeric class labels to performance labels
+# LabelEncoder encodes alphabetically: At-Risk=0, Average=1, Good=2
+LABEL_MAPPING = {
+    '0': 'At-Risk',
+    '1': 'Average',
+    '2': 'Good'
+}
+
+# Map performance labels to risk levels
+RISK_MAPPING = {
+    'At-Risk': 'High',
+    'Average': 'Medium',
+    'Good': 'Low'
+}
+
 
 class NaiveBayesModel:
-    def __init__(self):
-        self.model = GaussianNB()
+    def __init__(self, var_smoothing=1e-9):
+        self.model = GaussianNB(var_smoothing=var_smoothing)
         self.is_trained = False
         self.feature_names = None
+        self.schema = None
+        self.cache = None
         self.classes = None
         self.metrics = None
         
+        # Log-space constants for closed-form scoring
+        self.quadratic = None
+        self.linear = None
+        self.constant = None
+        
     def train(self, X, y, feature_names=None):
         """Train the Naive Bayes model"""
         self.model.fit(X, y)
         self.is_trained = True
         self.feature_names = feature_names if feature_names else [f'feature_{i}' for i in range(X.shape[1])]
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = self.model.classes_
+        self._compile()
         
         # Calculate training metrics
-        train_predictions = self.model.predict(X)
+        train_predictions = self.predict(X)
         self.metrics = {
             'train_accuracy': accuracy_score(y, train_predictions)
         }
         
+    def _compile(self):
+        """
+        Precompute log-space constants from the fitted theta_, var_ and class_prior_
+        The Gaussian log-likelihood expands to a quadratic form in x:
+            log P(c) - 0.5 * sum(log(2 pi var)) - 0.5 * sum((x - theta)^2 / var)
+          = x^2 @ quadratic + x @ linear + constant
+        so a whole batch is scored with two matrix products
+        """
+        theta = np.asarray(self.model.theta_, dtype=np.float64)
+        var = np.asarray(self.model.var_, dtype=np.float64)
+        
+        self.quadratic = np.ascontiguousarray((-0.5 / var).T)
+        self.linear = np.ascontiguousarray((theta / var).T)
+        self.constant = (np.log(self.model.class_prior_)
+                         - 0.5 * np.sum(np.log(2.0 * np.pi * var), axis=1)
+                         - 0.5 * np.sum(theta ** 2 / var, axis=1))
+        
+        # Class index -> performance label -> risk level, in class order
+        self.performance_labels = np.array([LABEL_MAPPING.get(str(cls), 'Unknown') for cls in self.classes])
+        class_risks = [RISK_MAPPING.get(label, 'Unknown') for label in self.performance_labels]
+        self.risk_levels = np.array(list(dict.fromkeys(class_risks)))
+        
+        # One-hot class -> risk level matrix so risk probabilities are a single product
+        risk_columns = {risk: i for i, risk in enumerate(self.risk_levels)}
+        self.risk_matrix = np.zeros((len(self.classes), len(self.risk_levels)))
+        self.risk_matrix[np.arange(len(self.classes)), [risk_columns[r] for r in class_risks]] = 1.0
+    
+    def partial_update(self, X, y):
+        """
+        Fold newly labeled rows into the per-class means and variances (GaussianNB.partial_fit)
+        Cost depends on the number of new rows, not on the training history
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        
+        X = self.schema.check_array(X)
+        
+        # partial_fit updates the fitted arrays in place; memory-mapped artifacts are read-only
+        for attr in ('theta_', 'var_', 'class_count_', 'class_prior_'):
+            setattr(self.model, attr, np.array(getattr(self.model, attr)))
+        
+        self.model.partial_fit(X, y)
+        self._compile()
+    
+    def _joint_log_likelihood(self, X):
+        """Unnormalized log posterior of every class for each row"""
+        X = self.schema.check_array(X)
+        jll = (X * X) @ self.quadratic
+        jll += X @ self.linear
+        jll += self.constant
+        return jll
+    
+    def _score(self, X):
+        """Predicted class indices and class probabilities for each row"""
+        jll = self._joint_log_likelihood(X)
+        indices = jll.argmax(axis=1)
+        
+        # Normalize in log space (log-sum-exp) before exponentiating
+        jll -= jll.max(axis=1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=1, keepdims=True)
+        
+        return indices, jll
+    
     def predict(self, X):
         """Make predictions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        return self.classes[self._score(X)[0]]
     
     def predict_proba(self, X):
         """Get probability distributions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict_proba(X)
+        return self._score(X)[1]
     
+    def score_risk(self, X):
+        """
+        Score a whole batch of students in one call
+        Args:
+            X: encoded feature matrix of shape (n_students, n_features)
+        Returns:
+            dict of arrays: predicted class, performance label and risk level per student,
+            class probabilities (columns follow `classes`) and risk probabilities
+            (columns follow `risk_levels`)
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        
+        indices, probabilities = self._score(X)
+        risk_probabilities = probabilities @ self.risk_matrix
+        
+        return {
+            'predicted_class': self.classes[indices],
+            'predicted_performance': self.performance_labels[indices],
+            'probabilities': probabilities,
+            'risk_level': self.risk_levels[risk_probabilities.argmax(axis=1)],
+            'risk_probabilities': risk_probabilities
+        }
+    
+    @cached_prediction
     def predict_single(self, features_dict):
         """
         Make prediction for a single instance with probabilities
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             dict with predicted class and probabilities
         """
+        return self.predict_batch(features_dict)[0]
+    
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many instances with a single model call
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of dicts with predicted class and probabilities
+        """
         if not self.is_trained:
             raise Exception("Model not trained yet")
         
-        # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
         
-        # Get prediction and probabilities
-        prediction = self.model.predict(X)[0]
-        probabilities = self.model.predict_proba(X)[0]
+        indices, probabilities = self._score(X)
+        predictions = self.classes[indices]
         
+        return [
+            self._format_prediction(prediction, probs)
+            for prediction, probs in zip(predictions, probabilities)
+        ]
+    
+    def _format_prediction(self, prediction, probabilities):
+        """Build the prediction dict for one row of model output"""
         # Create probability dict
         prob_dict = {
             str(cls): float(prob) 
@@ -87,51 +221,43 @@ class NaiveBayesModel:
             'confusion_matrix': confusion_matrix(y_test, predictions).tolist()
         }
     
+    @cached_prediction
     def get_risk_assessment(self, features_dict):
         """
         Get risk assessment with detailed probabilities
         Maps performance labels to risk levels
         """
-        result = self.predict_single(features_dict)
-        
-        # Map numeric class labels to performance labels
-        # LabelEncoder encodes alphabetically: At-Risk=0, Average=1, Good=2
-        label_mapping = {
-            '0': 'At-Risk',
-            '1': 'Average',
-            '2': 'Good'
-        }
-        
-        # Map performance labels to risk levels
-        risk_mapping = {
-            'At-Risk': 'High',
-            'Average': 'Medium',
-            'Good': 'Low'
-        }
-        
-        # Convert numeric probabilities to labeled probabilities
-        labeled_probs = {}
-        risk_probs = {}
-        
-        for numeric_label, prob in result['probabilities'].items():
-            perf_label = label_mapping.get(str(numeric_label), 'Unknown')
-            labeled_probs[perf_label] = prob
-            
-            risk_level = risk_mapping.get(perf_label, 'Unknown')
-            risk_probs[risk_level] = risk_probs.get(risk_level, 0) + prob
-        
-        # Determine primary risk level
-        primary_risk = max(risk_probs.items(), key=lambda x: x[1])[0]
+        return self.get_risk_assessment_batch(features_dict)[0]
+    
+    def get_risk_assessment_batch(self, features_list):
+        """
+        Get risk assessments for many students with a single model call
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
         
-        # Convert predicted class to label
-        predicted_label = label_mapping.get(str(result['predicted_class']), 'Unknown')
+        scores = self.score_risk(self.schema.encode(features_list))
         
+        return [
+            self._format_risk_assessment(performance, risk, probs, risk_probs)
+            for performance, risk, probs, risk_probs in zip(
+                scores['predicted_performance'], scores['risk_level'],
+                scores['probabilities'], scores['risk_probabilities']
+            )
+        ]
+    
+    def _format_risk_assessment(self, performance, risk_level, probabilities, risk_probabilities):
+        """Build the risk assessment dict for one row of scores"""
         return {
-            'predicted_performance': predicted_label,
-            'risk_level': primary_risk,
-            'risk_probabilities': risk_probs,
-            'performance_probabilities': labeled_probs,
-            'confidence': result['confidence']
+            'predicted_performance': str(performance),
+            'risk_level': str(risk_level),
+            'risk_probabilities': {
+                str(level): float(prob) for level, prob in zip(self.risk_levels, risk_probabilities)
+            },
+            'performance_probabilities': {
+                str(label): float(prob) for label, prob in zip(self.performance_labels, probabilities)
+            },
+            'confidence': float(max(probabilities))
         }
     
     def save_model(self, filepath):
@@ -142,13 +268,19 @@ class NaiveBayesModel:
             'classes': self.classes,
             'metrics': self.metrics
         }
-        joblib.dump(model_data, filepath)
+        dump_atomic(model_data, filepath)
         
-    def load_model(self, filepath):
-        """Load trained model"""
-        model_data = joblib.load(filepath)
+    def load_model(self, filepath, mmap_mode=None):
+        """
+        Load trained model
+        Args:
+            mmap_mode: 'r' to memory-map the model arrays read-only so processes share them
+        """
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.feature_names = model_data.get('feature_names')
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = model_data.get('classes')
         self.metrics = model_data.get('metrics')
         self.is_trained = True
+        self._compile()
@@ -0,0 +1,198 @@
+"""
+Approximate Nearest-Neighbor Index for Large Student Populations
+Random-projection forest written in NumPy, used by KNNModel when an exact
+search over every student would be too slow
+"""
+
+import numpy as np
+
+
+# Candidate slots (queries x candidates per query) scored at a time by kneighbors;
+# bounds the gathered block of training rows to slots x features values
+CANDIDATE_BLOCK_SIZE = 1 << 17
+
+
+class RandomProjectionForest:
+    def __init__(self, n_trees=30, leaf_size=200, search_trees=None, random_state=42):
+        """
+        Initialize the forest
+        Args:
+            n_trees: number of trees to build (more trees -> higher recall, larger index)
+            leaf_size: maximum number of points in a leaf (larger -> higher recall, slower queries)
+            search_trees: trees consulted per query, up to n_trees (default: all);
+                          can be lowered after build to trade recall for latency
+            random_state: seed for the random split directions
+        """
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.search_trees = search_trees
+        self.random_state = random_state
+        self.trees = None
+        self.X = None
+        self.sq_norms = None
+
+    def fit(self, X):
+        """Build the forest over the rows of X"""
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        self.sq_norms = np.einsum('ij,ij->i', self.X, self.X)
+        rng = np.random.RandomState(self.random_state)
+        self.trees = [self._build_tree(rng) for _ in range(self.n_trees)]
+        return self
+
+    def _build_tree(self, rng):
+        """
+        Build one tree by recursive median splits along random directions
+        Stored as flat arrays: internal nodes hold a direction and split value,
+        leaf nodes point at a row of `leaf_members` (their members padded with -1),
+        so the leaves of many queries can be gathered with one indexing operation
+        """
+        n_features = self.X.shape[1]
+        directions, split_values = [], []
+        left, right = [], []
+        leaf_id = []
+        members = []
+
+        def new_node():
+            directions.append(None)
+            split_values.append(0.0)
+            left.append(-1)
+            right.append(-1)
+            leaf_id.append(-1)
+            return len(directions) - 1
+
+        root = new_node()
+        stack = [(root, np.arange(len(self.X)))]
+
+        while stack:
+            node, indices = stack.pop()
+
+            if len(indices) > self.leaf_size:
+                direction = rng.normal(size=n_features)
+                projections = self.X[indices] @ direction
+                split_value = np.median(projections)
+                goes_left = projections <= split_value
+
+                # Duplicate-heavy data can put every point on one side; stop splitting then
+                if 0 < goes_left.sum() < len(indices):
+                    directions[node] = direction
+                    split_values[node] = split_value
+                    left[node] = new_node()
+                    right[node] = new_node()
+                    stack.append((left[node], indices[goes_left]))
+                    stack.append((right[node], indices[~goes_left]))
+                    continue
+
+            leaf_id[node] = len(members)
+            members.append(indices)
+
+        leaf_members = np.full((len(members), max(len(m) for m in members)), -1, dtype=np.intp)
+        for row, indices in enumerate(members):
+            leaf_members[row, :len(indices)] = indices
+
+        return {
+            'directions': np.array([d if d is not None else np.zeros(n_features) for d in directions]),
+            'split_values': np.array(split_values),
+            'left': np.array(left, dtype=np.intp),
+            'right': np.array(right, dtype=np.intp),
+            'leaf_id': np.array(leaf_id, dtype=np.intp),
+            'leaf_members': leaf_members
+        }
+
+    def _leaves(self, tree, X):
+        """Descend every query row to its leaf in one tree"""
+        node = np.zeros(len(X), dtype=np.intp)
+        active = tree['left'][node] != -1
+
+        while active.any():
+            rows = np.nonzero(active)[0]
+            current = node[rows]
+            projections = np.einsum('ij,ij->i', X[rows], tree['directions'][current])
+            goes_left = projections <= tree['split_values'][current]
+            node[rows] = np.where(goes_left, tree['left'][current], tree['right'][current])
+            active = tree['left'][node] != -1
+
+        return node
+
+    def kneighbors(self, X, n_neighbors=5):
+        """
+        Approximate k nearest neighbors (Euclidean), same return shape as sklearn
+        Candidates are the union of the query's leaves across the searched trees;
+        exact distances are computed only for those candidates, for a block of
+        queries at a time. Neighbors at equal distance are ordered by index
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if n_neighbors > len(self.X):
+            raise ValueError(
+                f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {n_neighbors}, "
+                f"n_samples_fit = {len(self.X)}"
+            )
+
+        trees = self.trees[:min(self.search_trees or self.n_trees, self.n_trees)]
+
+        # Leaf member row of every query in every searched tree
+        leaf_rows = [tree['leaf_id'][self._leaves(tree, X)] for tree in trees]
+        # At least n_neighbors slots per query; rows that cannot fill them fall back to a full scan
+        n_candidates = max(sum(tree['leaf_members'].shape[1] for tree in trees), n_neighbors)
+        block_size = max(1, CANDIDATE_BLOCK_SIZE // n_candidates)
+
+        distances = np.empty((len(X), n_neighbors))
+        indices = np.empty((len(X), n_neighbors), dtype=np.intp)
+
+        # Gathered candidate rows, reused by every block
+        buffer = np.empty((min(block_size, len(X)), n_candidates, self.X.shape[1]))
+
+        for start in range(0, len(X), block_size):
+            stop = min(start + block_size, len(X))
+            distances[start:stop], indices[start:stop] = self._search_block(
+                X[start:stop],
+                [tree['leaf_members'][rows[start:stop]] for tree, rows in zip(trees, leaf_rows)],
+                n_neighbors,
+                buffer[:stop - start]
+            )
+
+        return distances, indices
+
+    def _search_block(self, X, leaf_members, n_neighbors, buffer):
+        """
+        k nearest candidates of a block of queries
+        Args:
+            X: query rows
+            leaf_members: per searched tree, the padded members of each query's leaf
+            buffer: array of shape (queries, candidates, features) for the gathered rows
+        """
+        candidates = np.full((len(X), buffer.shape[1]), -1, dtype=np.intp)
+        np.concatenate(leaf_members, axis=1, out=candidates[:, :sum(m.shape[1] for m in leaf_members)])
+
+        # Sorting puts the -1 padding first and repeated candidates next to each other
+        candidates.sort(axis=1)
+        skip = candidates < 0
+        skip[:, 1:] |= candidates[:, 1:] == candidates[:, :-1]
+
+        # |x - c|^2 = |c|^2 - 2 c.x + |x|^2 with one batched product for the c.x terms;
+        # only used to pick the nearest candidates, whose distances are recomputed exactly
+        rows = np.take(self.X, candidates, axis=0, out=buffer)
+        dots = np.matmul(rows, X[:, :, np.newaxis])[:, :, 0]
+        squared = self.sq_norms[candidates] - 2 * dots + np.einsum('ij,ij->i', X, X)[:, np.newaxis]
+        candidate_distances = np.sqrt(np.maximum(squared, 0))
+        candidate_distances[skip] = np.inf
+
+        nearest = np.argpartition(candidate_distances, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        found = np.isfinite(np.take_along_axis(candidate_distances, nearest, axis=1)).all(axis=1)
+
+        # Exact distances of the selected rows (an exact match must come out as 0),
+        # ordered by distance and then index
+        indices = np.sort(np.take_along_axis(candidates, nearest, axis=1), axis=1)
+        diff = self.X[indices] - X[:, np.newaxis, :]
+        distances = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+        order = np.argsort(distances, axis=1, kind='stable')
+        distances = np.take_along_axis(distances, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+
+        # Too few distinct candidates (tiny leaves or tiny dataset): full scan for those rows
+        for row in np.nonzero(~found)[0]:
+            diff = self.X - X[row]
+            all_distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+            nearest = np.argsort(all_distances, kind='stable')[:n_neighbors]
+            distances[row], indices[row] = all_distances[nearest], nearest
+
+        return distances, indices
@@ -9,67 +9,302 @@ from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
+from utils.prediction_cache import cached_prediction
+
+
+# Pairwise probability clipping used by libsvm
+_MIN_PROB = 1e-7
+
+
+def _couple_probabilities(pairwise):
+    """
+    Combine one-vs-one pairwise probabilities into class probabilities
+    Vectorized over rows; same fixed-point iteration as libsvm's
+    multiclass_probability (Wu, Lin & Weng 2004, method 2)
+    Args:
+        pairwise: array (n_rows, k, k) with r[i, j] = P(class i | class i or j)
+    Returns:
+        array (n_rows, k) of class probabilities
+    """
+    n_rows, k, _ = pairwise.shape
+    
+    # Q[t, t] = sum_{j != t} r[j, t]^2, Q[t, j] = -r[j, t] * r[t, j]
+    r_t = pairwise.transpose(0, 2, 1)
+    Q = -r_t * pairwise
+    diag = np.einsum('nji,nji->ni', pairwise, pairwise)
+    idx = np.arange(k)
+    Q[:, idx, idx] = diag
+    
+    p = np.full((n_rows, k), 1.0 / k)
+    eps = 0.005 / k
+    
+    # Rows still iterating; converged rows are written back and dropped
+    active = np.arange(n_rows)
+    Qa, pa = Q, p.copy()
+    
+    for _ in range(max(100, k)):
+        Qp = np.einsum('nij,nj->ni', Qa, pa)
+        pQp = np.einsum('ni,ni->n', pa, Qp)
+        
+        converged = np.abs(Qp - pQp[:, None]).max(axis=1) < eps
+        if converged.any():
+            p[active[converged]] = pa[converged]
+            keep = ~converged
+            active, Qa, pa, Qp, pQp = active[keep], Qa[keep], pa[keep], Qp[keep], pQp[keep]
+            if len(active) == 0:
+                return p
+        
+        for t in range(k):
+            Qtt = Qa[:, t, t]
+            diff = (pQp - Qp[:, t]) / Qtt
+            pa[:, t] += diff
+            scale = 1.0 + diff
+            pQp = (pQp + diff * (diff * Qtt + 2 * Qp[:, t])) / (scale * scale)
+            Qp += diff[:, None] * Qa[:, t, :]
+            Qp /= scale[:, None]
+            pa /= scale[:, None]
+    
+    # Iteration limit reached (libsvm warns and keeps the current estimate)
+    p[active] = pa
+    return p
+
 
 class SVMModel:
-    def __init__(self, kernel='rbf', C=1.0, gamma='scale'):
-        self.model = SVC(kernel=kernel, C=C, gamma=gamma, probability=True)
+    def __init__(self, kernel='rbf', C=1.0, gamma='scale', kernel_block_size=1024, random_state=42):
+        """
+        Initialize SVM model
+        Args:
+            kernel, C, gamma: SVC hyperparameters
+            random_state: seed for the cross-validation behind the Platt probabilities,
+                          so retraining gives the same artifact
+            kernel_block_size: rows scored per kernel evaluation; bounds the
+                               (rows x support vectors) kernel matrix in batch calls
+        """
+        self.model = SVC(kernel=kernel, C=C, gamma=gamma, probability=True, random_state=random_state)
+        self.kernel_block_size = kernel_block_size
         self.is_trained = False
         self.feature_names = None
+        self.schema = None
+        self.cache = None
         self.classes = None
         self.metrics = None
         
+        # Support vectors and one-vs-one coefficients for fused scoring
+        self.support_vectors = None
+        self.pair_coef = None
+        self.pair_intercept = None
+        
     def train(self, X, y, feature_names=None):
         """Train the SVM model"""
         self.model.fit(X, y)
         self.is_trained = True
         self.feature_names = feature_names if feature_names else [f'feature_{i}' for i in range(X.shape[1])]
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = self.model.classes_
+        self._compile()
         
         # Calculate training metrics
-        train_predictions = self.model.predict(X)
+        train_predictions = self.predict(X)
         self.metrics = {
             'train_accuracy': accuracy_score(y, train_predictions)
         }
         
+    def _compile(self):
+        """
+        Lay out the fitted SVC for fused scoring
+        Each one-vs-one pair (i, j) gets a column of `pair_coef` holding the dual
+        coefficients of the support vectors of classes i and j (zero elsewhere),
+        so all pairwise decision values come from one kernel matrix product
+        """
+        svc = self.model
+        n_classes = len(svc.classes_)
+        sv_class = np.repeat(np.arange(n_classes), svc.n_support_)
+        
+        # libsvm's unflipped coefficients: a positive decision value votes for class i
+        dual_coef = np.asarray(svc._dual_coef_)
+        intercept = np.asarray(svc._intercept_)
+        
+        pairs = [(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)]
+        pair_coef = np.zeros((len(sv_class), len(pairs)))
+        for p, (i, j) in enumerate(pairs):
+            in_i, in_j = sv_class == i, sv_class == j
+            pair_coef[in_i, p] = dual_coef[j - 1, in_i]
+            pair_coef[in_j, p] = dual_coef[i, in_j]
+        
+        self.support_vectors = np.ascontiguousarray(svc.support_vectors_, dtype=np.float64)
+        self.sv_sq_norms = np.einsum('ij,ij->i', self.support_vectors, self.support_vectors)
+        self.pair_coef = pair_coef
+        self.pair_intercept = intercept
+        self.pair_i = np.array([i for i, _ in pairs], dtype=np.intp)
+        self.pair_j = np.array([j for _, j in pairs], dtype=np.intp)
+        self.prob_a = np.asarray(svc.probA_)
+        self.prob_b = np.asarray(svc.probB_)
+    
+    def _kernel(self, X):
+        """Kernel matrix between rows of X and the support vectors"""
+        svc = self.model
+        K = X @ self.support_vectors.T
+        
+        if svc.kernel == 'rbf':
+            # ||x - sv||^2 = ||x||^2 - 2 x.sv + ||sv||^2, computed in place
+            K *= -2.0
+            K += np.einsum('ij,ij->i', X, X)[:, None]
+            K += self.sv_sq_norms
+            np.maximum(K, 0, out=K)
+            K *= -svc._gamma
+            np.exp(K, out=K)
+        elif svc.kernel == 'poly':
+            K *= svc._gamma
+            K += svc.coef0
+            K **= svc.degree
+        elif svc.kernel == 'sigmoid':
+            K *= svc._gamma
+            K += svc.coef0
+            np.tanh(K, out=K)
+        elif svc.kernel != 'linear':
+            raise ValueError(f"Unsupported kernel for fused scoring: {svc.kernel!r}")
+        
+        return K
+    
+    def _score(self, X, probability=True):
+        """
+        Evaluate the kernel once per row and derive every output from it
+        Returns:
+            labels, class probabilities (None if not requested)
+            and decision values shaped like SVC.decision_function
+        """
+        X = self.schema.check_array(X)
+        n_classes = len(self.classes)
+        block = self.kernel_block_size or max(len(X), 1)
+        
+        labels = np.empty(len(X), dtype=self.classes.dtype)
+        probabilities = np.empty((len(X), n_classes)) if probability else None
+        decisions = []
+        
+        for start in range(0, max(len(X), 1), block):
+            rows = slice(start, start + block)
+            dec = self._kernel(X[rows]) @ self.pair_coef
+            dec += self.pair_intercept
+            
+            # One-vs-one voting, ties go to the lowest class (as in libsvm)
+            votes = np.zeros((len(dec), n_classes), dtype=np.intp)
+            wins_i = dec > 0
+            np.add.at(votes, (slice(None), self.pair_i), wins_i)
+            np.add.at(votes, (slice(None), self.pair_j), ~wins_i)
+            labels[rows] = self.classes[votes.argmax(axis=1)]
+            
+            if probability:
+                probabilities[rows] = self._pairwise_to_proba(dec)
+            decisions.append(self._decision_values(dec))
+        
+        return labels, probabilities, np.concatenate(decisions)
+    
+    def _pairwise_to_proba(self, dec):
+        """Platt-scale the pairwise decision values and couple them into class probabilities"""
+        n_classes = len(self.classes)
+        
+        # Numerically stable sigmoid of -(A * dec + B), as in libsvm's sigmoid_predict
+        f = dec * self.prob_a + self.prob_b
+        e = np.exp(-np.abs(f))
+        r = np.where(f >= 0, e / (1 + e), 1 / (1 + e))
+        r = np.clip(r, _MIN_PROB, 1 - _MIN_PROB)
+        
+        pairwise = np.zeros((len(dec), n_classes, n_classes))
+        pairwise[:, self.pair_i, self.pair_j] = r
+        pairwise[:, self.pair_j, self.pair_i] = 1 - r
+        return _couple_probabilities(pairwise)
+    
+    def _decision_values(self, dec):
+        """Convert libsvm one-vs-one values to SVC.decision_function's output"""
+        n_classes = len(self.classes)
+        
+        if n_classes == 2:
+            return -dec[:, 0]
+        if self.model.decision_function_shape == 'ovo':
+            return dec
+        
+        # One-vs-rest: votes plus confidences squashed into (-1/3, 1/3)
+        votes = np.zeros((len(dec), n_classes))
+        confidences = np.zeros((len(dec), n_classes))
+        np.add.at(votes, (slice(None), self.pair_i), dec >= 0)
+        np.add.at(votes, (slice(None), self.pair_j), dec < 0)
+        np.add.at(confidences, (slice(None), self.pair_i), dec)
+        np.subtract.at(confidences, (slice(None), self.pair_j), dec)
+        return votes + confidences / (3 * (np.abs(confidences) + 1))
+    
     def predict(self, X):
         """Make predictions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict(X)
+        return self._score(X, probability=False)[0]
     
     def predict_proba(self, X):
         """Get probability distributions"""
         if not self.is_trained:
             raise Exception("Model not trained yet")
-        return self.model.predict_proba(X)
+        return self._score(X)[1]
+    
+    def predict_with_proba(self, X):
+        """
+        Predicted labels and class probabilities from one kernel evaluation per row
+        Labels come from the one-vs-one vote, as in predict, so they can differ from
+        the most probable class when the probabilities are close
+        Returns:
+            array of labels and array of class probabilities
+        """
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        labels, probabilities, _ = self._score(X)
+        return labels, probabilities
+    
+    def decision_function(self, X):
+        """Get decision function values (distance from decision boundary)"""
+        if not self.is_trained:
+            raise Exception("Model not trained yet")
+        return self._score(X, probability=False)[2]
     
+    @cached_prediction
     def predict_single(self, features_dict):
         """
         Make prediction for a single instance
         Args:
-            features_dict: dict with feature names and values
+            features_dict: dict with feature names and values, or an encoded feature row
         Returns:
             dict with predicted class and probabilities
         """
+        return self.predict_batch(features_dict)[0]
+    
+    def predict_batch(self, features_list):
+        """
+        Make predictions for many instances with a single kernel evaluation per row
+        Args:
+            features_list: list of feature dicts, or an encoded feature matrix
+        Returns:
+            list of dicts with predicted class, probabilities and decision scores
+        """
         if not self.is_trained:
             raise Exception("Model not trained yet")
         
-        # Convert to array in correct order
-        X = np.array([[features_dict.get(name, 0) for name in self.feature_names]])
+        # Encode to one 2-D matrix in correct feature order
+        X = self.schema.encode(features_list)
         
-        # Get prediction and probabilities
-        prediction = self.model.predict(X)[0]
-        probabilities = self.model.predict_proba(X)[0]
+        predictions, probabilities, decision_values = self._score(X)
         
+        return [
+            self._format_prediction(prediction, probs, decision)
+            for prediction, probs, decision in zip(predictions, probabilities, decision_values)
+        ]
+    
+    def _format_prediction(self, prediction, probabilities, decision_values):
+        """Build the prediction dict for one row of model output"""
         # Create probability dict
         prob_dict = {
             str(cls): float(prob) 
             for cls, prob in zip(self.classes, probabilities)
         }
         
-        # Get decision function values (distance from decision boundary)
-        decision_values = self.model.decision_function(X)[0]
-        
         return {
             'predicted_class': str(prediction),
             'probabilities': prob_dict,
@@ -77,12 +312,22 @@ class SVMModel:
             'decision_scores': decision_values.tolist() if hasattr(decision_values, 'tolist') else [float(decision_values)]
         }
     
+    @cached_prediction
     def get_classification_details(self, features_dict):
         """
         Get detailed classification information
         """
         result = self.predict_single(features_dict)
-        
+        return self._to_classification_details(result)
+    
+    def get_classification_details_batch(self, features_list):
+        """
+        Get detailed classification information for many students with a single model call
+        """
+        return [self._to_classification_details(result) for result in self.predict_batch(features_list)]
+    
+    def _to_classification_details(self, result):
+        """Convert a prediction dict into detailed classification information"""
         # Map numeric class labels to performance labels
         label_mapping = {
             '0': 'At-Risk',
@@ -167,13 +412,19 @@ class SVMModel:
             'classes': self.classes,
             'metrics': self.metrics
         }
-        joblib.dump(model_data, filepath)
+        dump_atomic(model_data, filepath)
         
-    def load_model(self, filepath):
-        """Load trained model"""
-        model_data = joblib.load(filepath)
+    def load_model(self, filepath, mmap_mode=None):
+        """
+        Load trained model
+        Args:
+            mmap_mode: 'r' to memory-map the model arrays read-only so processes share them
+        """
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.feature_names = model_data.get('feature_names')
+        self.schema = FeatureSchema(self.feature_names)
         self.classes = model_data.get('classes')
         self.metrics = model_data.get('metrics')
         self.is_trained = True
+        self._compile()
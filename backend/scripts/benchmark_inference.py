@@ -0,0 +1,250 @@
+"""
+Benchmark model inference paths against the sklearn estimators they replace
+Reports per-call latency for single rows and batches, and the largest
+difference between the two outputs
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from models.linear_regression import LinearRegressionModel
+from models.ann import ANNModel
+from models.naive_bayes import NaiveBayesModel
+from models.decision_tree import DecisionTreeModel
+from models.knn import KNNModel
+from models.svm import SVMModel
+from models.neighbor_index import RandomProjectionForest
+from utils.data_preprocessing import load_and_preprocess_data
+
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '../models')
+DATA_PATH = os.path.join(os.path.dirname(__file__), '../data/student-mat.csv')
+
+
+def time_per_call(func, repeat):
+    """Average wall time of func() in microseconds"""
+    func()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def report(name, baseline_us, fast_us, max_diff):
+    """Print one benchmark result line"""
+    print(f"  {name:<36} sklearn: {baseline_us:10.1f} µs   fast: {fast_us:10.1f} µs   "
+          f"speedup: {baseline_us / fast_us:6.1f}x   max diff: {max_diff:.2e}")
+
+
+def benchmark_linear_regression(X, args):
+    """NumPy dot-product path vs LinearRegression.predict"""
+    model = LinearRegressionModel()
+    model.load_model(os.path.join(MODELS_DIR, 'linear_regression.pkl'))
+
+    row = X[:1]
+    baseline = model.model.predict(X)
+    fast = model.predict(X)
+
+    report('single row',
+           time_per_call(lambda: model.model.predict(row), args.repeat),
+           time_per_call(lambda: model.predict(row), args.repeat),
+           float(np.abs(baseline - fast).max()))
+    report(f'batch of {len(X)}',
+           time_per_call(lambda: model.model.predict(X), args.repeat),
+           time_per_call(lambda: model.predict(X), args.repeat),
+           float(np.abs(baseline - fast).max()))
+
+
+def benchmark_naive_bayes(X, args):
+    """Closed-form log-space scoring with vectorized risk levels vs GaussianNB.predict + predict_proba"""
+    model = NaiveBayesModel()
+    model.load_model(os.path.join(MODELS_DIR, 'naive_bayes.pkl'))
+
+    def baseline(X):
+        return model.model.predict(X), model.model.predict_proba(X)
+
+    row = X[:1]
+    max_diff = float(np.abs(model.model.predict_proba(X) - model.predict_proba(X)).max())
+
+    report('risk scoring single',
+           time_per_call(lambda: baseline(row), args.repeat),
+           time_per_call(lambda: model.score_risk(row), args.repeat),
+           max_diff)
+    report(f'risk scoring batch of {len(X)}',
+           time_per_call(lambda: baseline(X), args.repeat),
+           time_per_call(lambda: model.score_risk(X), args.repeat),
+           max_diff)
+
+
+def benchmark_ann(X, args):
+    """Fused NumPy forward pass (float64 and float32) vs MLPRegressor/MLPClassifier"""
+    for task in ('regression', 'classification'):
+        for dtype in ('float64', 'float32'):
+            model = ANNModel(task=task, inference_dtype=dtype)
+            model.load_model(os.path.join(MODELS_DIR, f'ann_{task}.pkl'))
+
+            row = X[:1]
+            if task == 'regression':
+                baseline = lambda X: model.model.predict(X)
+                fast = lambda X: model.predict(X)
+            else:
+                # sklearn needs two passes for the class and its probabilities
+                baseline = lambda X: (model.model.predict(X), model.model.predict_proba(X))
+                fast = lambda X: model.predict_proba(X)
+
+            expected = model.model.predict(X) if task == 'regression' else model.model.predict_proba(X)
+            max_diff = float(np.abs(expected - fast(X)).max())
+
+            report(f'{task} {dtype} single',
+                   time_per_call(lambda: baseline(row), args.repeat),
+                   time_per_call(lambda: fast(row), args.repeat),
+                   max_diff)
+            report(f'{task} {dtype} batch of {len(X)}',
+                   time_per_call(lambda: baseline(X), args.repeat),
+                   time_per_call(lambda: fast(X), args.repeat),
+                   max_diff)
+
+
+def benchmark_decision_tree(X, args):
+    """Single compiled traversal vs decision_path + apply + predict + predict_proba"""
+    model = DecisionTreeModel()
+    model.load_model(os.path.join(MODELS_DIR, 'decision_tree.pkl'))
+
+    def baseline(X):
+        return (model.model.decision_path(X), model.model.apply(X),
+                model.model.predict(X), model.model.predict_proba(X))
+
+    row = X[:1]
+    max_diff = float(np.abs(model.model.predict_proba(X) - model.predict_proba(X)).max())
+
+    report('decision path single',
+           time_per_call(lambda: baseline(row), args.repeat),
+           time_per_call(lambda: model.get_decision_path(row), args.repeat),
+           max_diff)
+    report(f'traversal batch of {len(X)}',
+           time_per_call(lambda: baseline(X), args.repeat),
+           time_per_call(lambda: model._traverse(X, record_path=True), args.repeat),
+           max_diff)
+
+
+def benchmark_knn(X, args):
+    """One neighbor search for neighbors and vote vs kneighbors + predict + predict_proba"""
+    model = KNNModel()
+    model.load_model(os.path.join(MODELS_DIR, 'knn.pkl'))
+
+    def baseline(X):
+        return (model.model.kneighbors(X), model.model.predict(X), model.model.predict_proba(X))
+
+    row = X[:1]
+    max_diff = float(np.abs(model.model.predict_proba(X) - model.predict_proba(X)).max())
+
+    report('nearest neighbors single',
+           time_per_call(lambda: baseline(row), args.repeat),
+           time_per_call(lambda: model.find_nearest_neighbors(row), args.repeat),
+           max_diff)
+    report(f'neighbor query batch of {len(X)}',
+           time_per_call(lambda: baseline(X), args.repeat),
+           time_per_call(lambda: model._query(X, model.model.n_neighbors), args.repeat),
+           max_diff)
+
+
+def benchmark_svm(X, args):
+    """One kernel evaluation for label, probabilities and scores vs predict + predict_proba + decision_function"""
+    model = SVMModel()
+    model.load_model(os.path.join(MODELS_DIR, 'svm.pkl'))
+
+    def baseline(X):
+        return (model.model.predict(X), model.model.predict_proba(X), model.model.decision_function(X))
+
+    row = X[:1]
+    max_diff = float(np.abs(model.model.predict_proba(X) - model.predict_proba(X)).max())
+
+    report('classification single',
+           time_per_call(lambda: baseline(row), args.repeat),
+           time_per_call(lambda: model._score(row), args.repeat),
+           max_diff)
+    report(f'classification batch of {len(X)}',
+           time_per_call(lambda: baseline(X), args.repeat),
+           time_per_call(lambda: model._score(X), args.repeat),
+           max_diff)
+
+
+def benchmark_knn_index(X, args):
+    """Recall@k and query latency of the random-projection forest vs exact search"""
+    from sklearn.neighbors import NearestNeighbors
+
+    # Simulate a large district population by jittering real student rows
+    rng = np.random.RandomState(0)
+    sampled = X[rng.randint(0, len(X), args.population + args.queries)]
+    population = sampled + rng.normal(0, 1.0, sampled.shape)
+    data, queries = population[:args.population], population[args.population:]
+    k = args.k
+
+    def best_ms_per_query(search):
+        """Fastest of args.rounds timed runs of search(), per query in milliseconds"""
+        times = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            result = search()
+            times.append(time.perf_counter() - start)
+        return min(times) / len(queries) * 1e3, result
+
+    exact = NearestNeighbors(algorithm='auto').fit(data)
+    exact_ms, (_, exact_indices) = best_ms_per_query(lambda: exact.kneighbors(queries, n_neighbors=k))
+    print(f"  exact search over {len(data)} rows: {exact_ms:.3f} ms/query")
+
+    for n_trees, leaf_size in [(10, 50), (20, 100), (30, 100), (30, 200)]:
+        start = time.perf_counter()
+        forest = RandomProjectionForest(n_trees=n_trees, leaf_size=leaf_size).fit(data)
+        build_s = time.perf_counter() - start
+
+        approx_ms, (_, approx_indices) = best_ms_per_query(
+            lambda: forest.kneighbors(queries, n_neighbors=k))
+
+        recall = np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(exact_indices, approx_indices)
+        ])
+        print(f"  rp_forest trees={n_trees:<3} leaf={leaf_size:<4} build: {build_s:6.1f} s   "
+              f"query: {approx_ms:.3f} ms   speedup: {exact_ms / approx_ms:5.1f}x   recall@{k}: {recall:.3f}")
+
+
+BENCHMARKS = {
+    'linear_regression': benchmark_linear_regression,
+    'naive_bayes': benchmark_naive_bayes,
+    'ann': benchmark_ann,
+    'decision_tree': benchmark_decision_tree,
+    'knn': benchmark_knn,
+    'svm': benchmark_svm,
+    'knn_index': benchmark_knn_index,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark model inference paths')
+    parser.add_argument('--model', choices=list(BENCHMARKS.keys()), action='append',
+                        help='model to benchmark (repeatable, default: all)')
+    parser.add_argument('--repeat', type=int, default=1000,
+                        help='calls per timing measurement')
+    parser.add_argument('--population', type=int, default=100000,
+                        help='simulated population size for the knn_index benchmark')
+    parser.add_argument('--queries', type=int, default=500,
+                        help='queries for the knn_index benchmark')
+    parser.add_argument('--k', type=int, default=10,
+                        help='neighbors for recall@k in the knn_index benchmark')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='timed runs per search in the knn_index benchmark (fastest is reported)')
+    args = parser.parse_args()
+
+    # Score the whole dataset so batch timings use realistic rows
+    X_train, X_test, _, _, _, _ = load_and_preprocess_data(DATA_PATH)
+    X = np.ascontiguousarray(np.vstack([X_train, X_test]), dtype=np.float64)
+
+    for name in args.model or BENCHMARKS.keys():
+        print(f"{name}:")
+        BENCHMARKS[name](X, args)
@@ -0,0 +1,59 @@
+"""
+Precompute the dataset statistics served by /api/dataset
+The artifact is keyed by the dataset's content hash; the API serves it while the
+hash matches and recomputes the statistics itself once the dataset changes.
+train_models.py writes it too, so run this after replacing the dataset without retraining.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.data_preprocessing import (write_dataset_stats, get_dataset_stats_status,
+                                      DATASET_STATS_FILE)
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '../data/student-mat.csv')
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '../models')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute the dataset statistics served by the API')
+    parser.add_argument('input', nargs='?', default=DATA_PATH,
+                        help='CSV dataset (default: data/student-mat.csv)')
+    parser.add_argument('--sep', default=';', help='field separator of the CSV')
+    parser.add_argument('--models-dir', default=MODELS_DIR,
+                        help='directory the artifact is written to, next to the models')
+    parser.add_argument('--check', action='store_true',
+                        help="only report whether the existing artifact matches the CSV's content")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"Error: Dataset not found at {args.input}")
+        sys.exit(1)
+    
+    stats_path = os.path.join(args.models_dir, DATASET_STATS_FILE)
+    
+    if args.check:
+        status = get_dataset_stats_status(args.input, stats_path, sep=args.sep)
+        if status == 'missing':
+            print(f"No dataset statistics at {stats_path}")
+        elif status == 'stale':
+            print(f"✗ {stats_path} was computed from different data; rerun this script")
+        else:
+            print(f"✓ {stats_path} matches {args.input}")
+        sys.exit(0 if status == 'current' else 1)
+    
+    os.makedirs(args.models_dir, exist_ok=True)
+    
+    start = time.perf_counter()
+    stats = write_dataset_stats(args.input, stats_path, sep=args.sep)
+    rows, columns = stats['info']['shape']
+    
+    print(f"✓ Wrote {stats_path} in {time.perf_counter() - start:.2f} s "
+          f"({rows} rows, {columns} columns)")
+    print(f"  Content hash: {stats['content_hash']}")
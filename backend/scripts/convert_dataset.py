@@ -0,0 +1,93 @@
+"""
+Convert a student CSV to its typed binary cache
+load_dataset reads the cache instead of the CSV while the CSV's size and
+modification time match the ones recorded in it, so rerun this after replacing
+the dataset
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.data_preprocessing import (write_binary_dataset, load_binary_dataset, binary_cache_path,
+                                      read_binary_dataset_hash, dataset_content_hash)
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '../data/student-mat.csv')
+
+
+def best_time_ms(func, repeat):
+    """Fastest of `repeat` calls of func() in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def convert(filepath, sep=';', repeat=5):
+    """
+    Write the binary cache, check it loads back to the CSV's frame and
+    report file sizes and load times of both formats
+    """
+    start = time.perf_counter()
+    cache_path = write_binary_dataset(filepath, sep=sep)
+    print(f"Wrote {cache_path} in {time.perf_counter() - start:.2f} s")
+    
+    expected = pd.read_csv(filepath, sep=sep)
+    pd.testing.assert_frame_equal(load_binary_dataset(cache_path, sep=sep), expected)
+    print(f"✓ Loads back identical to the CSV ({len(expected)} rows, {len(expected.columns)} columns)")
+    print(f"  Content hash: {read_binary_dataset_hash(cache_path)}")
+    
+    csv_size = os.path.getsize(filepath)
+    cache_size = os.path.getsize(cache_path)
+    csv_ms = best_time_ms(lambda: pd.read_csv(filepath, sep=sep), repeat)
+    cache_ms = best_time_ms(lambda: load_binary_dataset(cache_path, sep=sep), repeat)
+    
+    print()
+    print(f"  {'':<8} {'size':>12} {'load':>12}")
+    print(f"  {'csv':<8} {csv_size / 1024:>9.1f} KB {csv_ms:>9.2f} ms")
+    print(f"  {'binary':<8} {cache_size / 1024:>9.1f} KB {cache_ms:>9.2f} ms")
+    print(f"  binary is {csv_size / cache_size:.1f}x smaller and loads {csv_ms / cache_ms:.1f}x faster")
+    
+    return cache_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a student CSV to its typed binary cache')
+    parser.add_argument('input', nargs='?', default=DATA_PATH,
+                        help='CSV dataset (default: data/student-mat.csv)')
+    parser.add_argument('--sep', default=';', help='field separator of the CSV')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='loads per timing measurement')
+    parser.add_argument('--check', action='store_true',
+                        help="only report whether the existing cache matches the CSV's content")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"Error: Dataset not found at {args.input}")
+        sys.exit(1)
+    
+    if args.check:
+        cache_path = binary_cache_path(args.input)
+        if not os.path.exists(cache_path):
+            print(f"No binary cache at {cache_path}")
+            sys.exit(1)
+        if read_binary_dataset_hash(cache_path) != dataset_content_hash(args.input):
+            print(f"✗ {cache_path} was written from different data; rerun the conversion")
+            sys.exit(1)
+        if load_binary_dataset(cache_path, sep=args.sep, source=args.input) is None:
+            print(f"✗ {args.input} has the same content but a different size, modification time "
+                  f"or separator; load_dataset ignores the cache until the conversion is rerun")
+            sys.exit(1)
+        print(f"✓ {cache_path} matches {args.input}")
+        sys.exit(0)
+    
+    convert(args.input, sep=args.sep, repeat=args.repeat)
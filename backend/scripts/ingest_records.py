@@ -0,0 +1,85 @@
+"""
+Ingest newly labeled student records and update the trained models incrementally
+Models without an incremental update are marked stale for the next full retrain
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from train_models import TRAINING_JOBS, MODELS_DIR
+from utils.data_preprocessing import FEATURE_COLUMNS
+from utils.ingestion import (INGESTED_FILE, parse_records, append_records,
+                             update_models, mark_stale)
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+
+def ingest_file(input_path, models_dir=MODELS_DIR, data_dir=DATA_DIR, sep=';'):
+    """
+    Append the records of a CSV (the 15 features plus G3) and update every model
+    Returns:
+        dict mapping model name to its update status
+    """
+    df = pd.read_csv(input_path, sep=sep)
+    missing = [name for name in FEATURE_COLUMNS + ['G3'] if name not in df.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+    
+    X, grades = parse_records(df[FEATURE_COLUMNS + ['G3']].to_dict('records'))
+    print(f"Ingesting {len(X)} records from {input_path}")
+    
+    models = {}
+    for name, (filename, _, factory, _) in TRAINING_JOBS.items():
+        filepath = os.path.join(models_dir, filename)
+        if os.path.exists(filepath):
+            models[name] = factory()
+            models[name].load_model(filepath)
+    
+    results = update_models(models, X, grades)
+    
+    for name, result in results.items():
+        if result['status'] == 'updated':
+            models[name].save_model(os.path.join(models_dir, TRAINING_JOBS[name][0]))
+            print(f"  ✓ {name:<20} updated in {result['seconds'] * 1000:8.2f} ms")
+        else:
+            print(f"  - {name:<20} stale ({result['reason']})")
+    
+    stale = [name for name, result in results.items() if result['status'] == 'stale']
+    if stale:
+        mark_stale(models_dir, stale, len(X))
+    
+    append_records(os.path.join(data_dir, INGESTED_FILE), X, grades)
+    
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest labeled student records')
+    parser.add_argument('input', help='CSV with the 15 model features and G3')
+    parser.add_argument('--sep', default=';', help='CSV separator (default: ;)')
+    parser.add_argument('--models-dir', default=MODELS_DIR,
+                        help='directory with the model artifacts to update')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='directory holding the ingested-records file')
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    try:
+        results = ingest_file(args.input, models_dir=args.models_dir,
+                              data_dir=args.data_dir, sep=args.sep)
+    except Exception as e:
+        print(f"\nError during ingestion: {str(e)}")
+        sys.exit(1)
+    
+    stale = [name for name, result in results.items() if result['status'] == 'stale']
+    print(f"\n✓ Ingestion finished in {time.perf_counter() - start:.2f} s")
+    if stale:
+        print(f"Stale models (run train_models.py to retrain): {', '.join(stale)}")
@@ -0,0 +1,213 @@
+"""
+Batch-score a student CSV with the trained models
+The input is streamed in chunks and predictions are appended to the output as each
+chunk finishes, so memory stays bounded by the chunk size however large the file is
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from train_models import TRAINING_JOBS, MODELS_DIR
+from utils.data_preprocessing import iter_dataset_chunks, StudentPreprocessor, PREPROCESSOR_FILE
+from utils.memory_stats import get_peak_rss_bytes
+
+
+# LabelEncoder encodes alphabetically: At-Risk=0, Average=1, Good=2
+PERFORMANCE_LABELS = np.array(['At-Risk', 'Average', 'Good'], dtype=object)
+
+
+def grade_columns(model, X):
+    """Predicted G3 grade, clipped to the valid 0-20 range"""
+    return {'grade': np.clip(model.predict(X), 0, 20)}
+
+
+def class_columns(model, X):
+    """Predicted performance label and the probability of the most likely class"""
+    probabilities = model.predict_proba(X)
+    return {
+        'label': PERFORMANCE_LABELS[model.classes[probabilities.argmax(axis=1)]],
+        'confidence': probabilities.max(axis=1)
+    }
+
+
+def naive_bayes_columns(model, X):
+    """Performance label, confidence and risk level from one closed-form pass"""
+    risk = model.score_risk(X)
+    return {
+        'label': risk['predicted_performance'],
+        'confidence': risk['probabilities'].max(axis=1),
+        'risk_level': risk['risk_level']
+    }
+
+
+def svm_columns(model, X):
+    """Voted performance label (as served by the API) and its probability estimate"""
+    labels, probabilities = model.predict_with_proba(X)
+    return {
+        'label': PERFORMANCE_LABELS[labels],
+        'confidence': probabilities.max(axis=1)
+    }
+
+
+# Model name -> function returning {column suffix: array} for a feature matrix
+SCORERS = {
+    'linear_regression': grade_columns,
+    'naive_bayes': naive_bayes_columns,
+    'knn': class_columns,
+    'svm': svm_columns,
+    'decision_tree': class_columns,
+    'ann_regression': grade_columns,
+    'ann_classification': class_columns
+}
+
+
+def load_models(names, models_dir=MODELS_DIR):
+    """Load the trained artifacts of the selected models"""
+    models = {}
+    
+    for name in names:
+        filename, _, factory, _ = TRAINING_JOBS[name]
+        filepath = os.path.join(models_dir, filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"No trained artifact for {name} at {filepath}")
+        
+        models[name] = factory()
+        models[name].load_model(filepath)
+    
+    return models
+
+
+def score_chunk(models, chunk, keep_columns=(), preprocessor=None):
+    """
+    Score one chunk with every model
+    Rows with a missing or non-numeric feature are kept with empty predictions
+    Args:
+        preprocessor: pipeline that encodes the features (default: model feature order)
+    Returns:
+        DataFrame of the kept columns followed by one column per model output,
+        and the number of rows that could not be scored
+    """
+    preprocessor = preprocessor or StudentPreprocessor()
+    
+    # Column by column into one matrix; rows with missing values are left out
+    X, valid = preprocessor.features(chunk, dtype=np.float64, coerce=True)
+    all_valid = valid.all()
+    
+    output = chunk[list(keep_columns)].reset_index(drop=True)
+    
+    for name, model in models.items():
+        # Score a placeholder row when nothing is valid so the output columns still exist
+        scored = SCORERS[name](model, X if len(X) else np.zeros((1, len(preprocessor.feature_names))))
+        
+        for suffix, values in scored.items():
+            if not all_valid:
+                # Scatter back into the chunk's rows, leaving unscored rows empty
+                if values.dtype.kind == 'f':
+                    column = np.full(len(valid), np.nan)
+                else:
+                    column = np.full(len(valid), None, dtype=object)
+                column[valid] = values[:valid.sum()]
+                values = column
+            output[f'{name}_{suffix}'] = values
+    
+    return output, int(len(valid) - valid.sum())
+
+
+def peak_memory():
+    """Peak resident memory of this process for progress lines, e.g. '123.4 MB' (n/a on Windows)"""
+    max_rss = get_peak_rss_bytes()
+    return 'n/a' if max_rss is None else f"{max_rss / 2**20:.1f} MB"
+
+
+def score_file(input_path, output_path, names, chunk_size=100000, keep_columns=(),
+               models_dir=MODELS_DIR, sep=';', float_format='%.4f', quiet=False):
+    """
+    Stream input_path through the selected models and write predictions to output_path
+    Args:
+        names: model names to run
+        chunk_size: rows parsed, scored and written at a time
+        keep_columns: input columns copied to the output (e.g. student identifiers)
+        float_format: format of grades and confidences in the output
+        quiet: suppress the per-chunk progress lines
+    Returns:
+        dict with the number of rows, unscored rows, wall time and rows per second
+    """
+    models = load_models(names, models_dir)
+    
+    preprocessor_path = os.path.join(models_dir, PREPROCESSOR_FILE)
+    preprocessor = StudentPreprocessor.load(preprocessor_path) if os.path.exists(preprocessor_path) \
+        else StudentPreprocessor()
+    columns = list(dict.fromkeys(list(keep_columns) + preprocessor.feature_names))
+    
+    start = time.perf_counter()
+    n_rows = n_invalid = 0
+    
+    with iter_dataset_chunks(input_path, chunk_size=chunk_size, columns=columns, sep=sep) as reader, \
+            open(output_path, 'w', newline='') as out:
+        for i, chunk in enumerate(reader):
+            chunk_start = time.perf_counter()
+            
+            output, invalid = score_chunk(models, chunk, keep_columns, preprocessor)
+            output.to_csv(out, sep=sep, index=False, header=(i == 0), float_format=float_format)
+            
+            n_rows += len(chunk)
+            n_invalid += invalid
+            
+            if not quiet:
+                now = time.perf_counter()
+                print(f"  {n_rows:>14,} rows   {n_rows / (now - start):>12,.0f} rows/s   "
+                      f"chunk {len(chunk) / (now - chunk_start):>12,.0f} rows/s   "
+                      f"peak memory {peak_memory():>10}", file=sys.stderr, flush=True)
+    
+    elapsed = time.perf_counter() - start
+    
+    return {
+        'rows': n_rows,
+        'unscored_rows': n_invalid,
+        'seconds': elapsed,
+        'rows_per_second': n_rows / elapsed if elapsed else 0.0
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stream a student CSV through the EduInsight models')
+    parser.add_argument('input', help='semicolon-separated CSV with the 15 model features')
+    parser.add_argument('output', help='CSV file to write predictions to')
+    parser.add_argument('--model', choices=list(SCORERS.keys()), action='append',
+                        help='model to run (repeatable, default: all)')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='rows read, scored and written at a time (default: 100000)')
+    parser.add_argument('--keep', action='append', default=[],
+                        help='input column to copy to the output, e.g. a student id (repeatable)')
+    parser.add_argument('--sep', default=';', help='field separator of the input and output')
+    parser.add_argument('--models-dir', default=MODELS_DIR,
+                        help='directory of the trained model artifacts')
+    parser.add_argument('--quiet', action='store_true', help='only print the final summary')
+    args = parser.parse_args()
+    
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+    
+    names = args.model or list(SCORERS.keys())
+    
+    try:
+        summary = score_file(args.input, args.output, names, chunk_size=args.chunk_size,
+                             keep_columns=args.keep, models_dir=args.models_dir, sep=args.sep,
+                             quiet=args.quiet)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    print(f"✓ Scored {summary['rows']:,} rows with {len(names)} models in {summary['seconds']:.2f} s "
+          f"({summary['rows_per_second']:,.0f} rows/s, peak memory {peak_memory()})")
+    if summary['unscored_rows']:
+        print(f"  {summary['unscored_rows']:,} rows had missing or non-numeric features and were left empty")
+    print(f"  Predictions written to {args.output}")
@@ -1,13 +1,16 @@
 """
 Train all ML models on the student performance dataset
+The data is loaded and split once; independent models train in a process pool
 """
 
 import os
 import sys
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from threadpoolctl import threadpool_limits
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -18,189 +21,249 @@ from models.knn import KNNModel
 from models.svm import SVMModel
 from models.decision_tree import DecisionTreeModel
 from models.ann import ANNModel
-from utils.data_preprocessing import load_and_preprocess_data
+from utils.data_preprocessing import (load_training_data, write_dataset_stats, PREPROCESSOR_FILE,
+                                      DATASET_STATS_FILE)
+from utils.ingestion import INGESTED_FILE, load_ingested_records, clear_stale_models
+
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '../models')
+
+# Tuned hyperparameters written by tune_models.py, applied on top of the defaults below
+HYPERPARAMETERS_FILE = 'hyperparameters.json'
+
+# Model name -> (artifact file, display name, factory, data split)
+# Factories take hyperparameter overrides as keyword arguments. KNN's include its
+# search index: algorithm ('rp_forest' for very large populations) and index_params
+TRAINING_JOBS = {
+    'linear_regression': ('linear_regression.pkl', 'Linear Regression',
+                          LinearRegressionModel, 'regression'),
+    'naive_bayes': ('naive_bayes.pkl', 'Naive Bayes', NaiveBayesModel, 'classification'),
+    'knn': ('knn.pkl', 'K-Nearest Neighbors',
+            lambda **params: KNNModel(**{'n_neighbors': 5, 'algorithm': 'auto', **params}),
+            'classification'),
+    'svm': ('svm.pkl', 'Support Vector Machine',
+            lambda **params: SVMModel(**{'kernel': 'rbf', 'C': 1.0, **params}), 'classification'),
+    'decision_tree': ('decision_tree.pkl', 'Decision Tree',
+                      lambda **params: DecisionTreeModel(**{'max_depth': 5, **params}), 'classification'),
+    'ann_regression': ('ann_regression.pkl', 'ANN (Regression)',
+                       lambda **params: ANNModel(**{'task': 'regression', 'hidden_layers': (100, 50, 25), **params}),
+                       'regression'),
+    'ann_classification': ('ann_classification.pkl', 'ANN (Classification)',
+                           lambda **params: ANNModel(**{'task': 'classification', 'hidden_layers': (100, 50, 25), **params}),
+                           'classification')
+}
+
+# Training data for pool workers, set once per process by init_worker
+_worker_data = None
 
 
-def train_all_models(data_path):
+def init_worker(data, threads_per_job):
+    """Give each pool worker the shared splits and its share of BLAS/OpenMP threads"""
+    global _worker_data
+    _worker_data = data
+    
+    if threads_per_job:
+        threadpool_limits(limits=threads_per_job)
+
+
+def load_hyperparameters(models_dir):
     """
-    Train all ML models and save them
+    Get the tuned hyperparameters saved in models_dir
+    Returns:
+        dict mapping model name to keyword arguments for its factory (empty if none were saved)
     """
-    print("Loading and preprocessing data...")
-    
-    # Load and preprocess data
-    X_train, X_test, y_train, y_test, feature_names, label_encoder = load_and_preprocess_data(data_path)
-    
-    print(f"Training data shape: {X_train.shape}")
-    print(f"Test data shape: {X_test.shape}")
-    print(f"Features: {feature_names}")
-    print()
-    
-    # Create models directory if it doesn't exist
-    models_dir = os.path.join(os.path.dirname(__file__), '../models')
-    os.makedirs(models_dir, exist_ok=True)
-    
-    # 1. Train Linear Regression (for grade prediction)
-    print("=" * 50)
-    print("Training Linear Regression Model...")
-    print("=" * 50)
-    
-    lr_model = LinearRegressionModel()
-    
-    # For regression, use actual G3 values
-    df = pd.read_csv(data_path, sep=';')
-    from utils.data_preprocessing import prepare_features
-    X_reg, y_reg = prepare_features(df)
-    X_train_reg, X_test_reg, y_train_reg, y_test_reg = train_test_split(
-        X_reg, y_reg, test_size=0.2, random_state=42
-    )
-    
-    lr_model.train(X_train_reg, y_train_reg, feature_names=feature_names)
-    lr_metrics = lr_model.evaluate(X_test_reg, y_test_reg)
-    
-    print(f"Linear Regression Metrics:")
-    print(f"  MSE: {lr_metrics['mse']:.4f}")
-    print(f"  RMSE: {lr_metrics['rmse']:.4f}")
-    print(f"  R²: {lr_metrics['r2_score']:.4f}")
-    print(f"  MAE: {lr_metrics['mae']:.4f}")
-    
-    lr_model.save_model(os.path.join(models_dir, 'linear_regression.pkl'))
-    print("✓ Linear Regression model saved")
-    print()
-    
-    # 2. Train Naive Bayes
-    print("=" * 50)
-    print("Training Naive Bayes Model...")
-    print("=" * 50)
-    
-    nb_model = NaiveBayesModel()
-    nb_model.train(X_train, y_train, feature_names=feature_names)
-    nb_metrics = nb_model.evaluate(X_test, y_test)
+    path = os.path.join(models_dir, HYPERPARAMETERS_FILE)
+    if not os.path.exists(path):
+        return {}
     
-    print(f"Naive Bayes Metrics:")
-    print(f"  Accuracy: {nb_metrics['accuracy']:.4f}")
+    with open(path) as f:
+        saved = json.load(f)
     
-    nb_model.save_model(os.path.join(models_dir, 'naive_bayes.pkl'))
-    print("✓ Naive Bayes model saved")
-    print()
-    
-    # 3. Train KNN
-    print("=" * 50)
-    print("Training K-Nearest Neighbors Model...")
-    print("=" * 50)
-    
-    knn_model = KNNModel(n_neighbors=5)
-    knn_model.train(X_train, y_train, feature_names=feature_names)
-    knn_metrics = knn_model.evaluate(X_test, y_test)
-    
-    print(f"KNN Metrics:")
-    print(f"  Accuracy: {knn_metrics['accuracy']:.4f}")
-    
-    knn_model.save_model(os.path.join(models_dir, 'knn.pkl'))
-    print("✓ KNN model saved")
-    print()
-    
-    # 4. Train SVM
-    print("=" * 50)
-    print("Training Support Vector Machine Model...")
-    print("=" * 50)
-    
-    svm_model = SVMModel(kernel='rbf', C=1.0)
-    svm_model.train(X_train, y_train, feature_names=feature_names)
-    svm_metrics = svm_model.evaluate(X_test, y_test)
-    
-    print(f"SVM Metrics:")
-    print(f"  Accuracy: {svm_metrics['accuracy']:.4f}")
-    
-    svm_model.save_model(os.path.join(models_dir, 'svm.pkl'))
-    print("✓ SVM model saved")
-    print()
+    # JSON has no tuples; layer sizes and other sequences come back as lists
+    return {
+        name: {key: tuple(value) if isinstance(value, list) else value for key, value in params.items()}
+        for name, params in saved.items()
+    }
+
+
+def train_model(name, data, models_dir, params=None):
+    """
+    Train, evaluate and save one model
+    Args:
+        params: hyperparameter overrides passed to the model factory
+    Returns:
+        (name, test metrics, report lines, wall time in seconds)
+    """
+    start = time.perf_counter()
+    
+    filename, display_name, factory, split = TRAINING_JOBS[name]
+    X_train, X_test, y_train, y_test = data[split]
+    
+    model = factory(**(params or {}))
+    model.train(X_train, y_train, feature_names=data['feature_names'])
+    metrics = model.evaluate(X_test, y_test)
+    model.save_model(os.path.join(models_dir, filename))
+    
+    if split == 'regression':
+        lines = [
+            f"  MSE: {metrics['mse']:.4f}",
+            f"  RMSE: {metrics['rmse']:.4f}",
+            f"  R²: {metrics['r2_score']:.4f}",
+            f"  MAE: {metrics['mae']:.4f}"
+        ]
+    else:
+        lines = [f"  Accuracy: {metrics['accuracy']:.4f}"]
+    
+    if name == 'decision_tree':
+        importance = model.get_feature_importance()
+        lines.append("  Top 3 Features:")
+        for feat in importance['top_features'][:3]:
+            lines.append(f"    - {feat['feature']}: {feat['importance']:.4f}")
+    
+    return name, metrics, lines, time.perf_counter() - start
+
+
+def train_worker_model(name, models_dir, params=None):
+    """Pool task: train one model on the worker's shared splits"""
+    return train_model(name, _worker_data, models_dir, params)
+
+
+def print_result(name, metrics, lines, elapsed):
+    """Print the metrics of one trained model"""
+    display_name = TRAINING_JOBS[name][1]
     
-    # 5. Train Decision Tree
     print("=" * 50)
-    print("Training Decision Tree Model...")
+    print(f"{display_name} ({elapsed:.2f} s)")
     print("=" * 50)
-    
-    dt_model = DecisionTreeModel(max_depth=5)
-    dt_model.train(X_train, y_train, feature_names=feature_names)
-    dt_metrics = dt_model.evaluate(X_test, y_test)
-    
-    print(f"Decision Tree Metrics:")
-    print(f"  Accuracy: {dt_metrics['accuracy']:.4f}")
-    
-    # Get feature importance
-    importance = dt_model.get_feature_importance()
-    print(f"  Top 3 Features:")
-    for feat in importance['top_features'][:3]:
-        print(f"    - {feat['feature']}: {feat['importance']:.4f}")
-    
-    dt_model.save_model(os.path.join(models_dir, 'decision_tree.pkl'))
-    print("✓ Decision Tree model saved")
+    print(f"{display_name} Metrics:")
+    for line in lines:
+        print(line)
+    print(f"✓ {display_name} model saved")
     print()
+
+
+def train_all_models(data_path, jobs=1, models_dir=MODELS_DIR, ingested_path=None, overrides=None):
+    """
+    Train all ML models and save them
+    Args:
+        data_path: path to the student CSV
+        jobs: number of worker processes (1 trains in this process, one model at a time)
+        models_dir: directory the artifacts are written to
+        ingested_path: CSV of records added through ingestion, appended to the training data
+        overrides: dict mapping model name to hyperparameters for this run only
+    
+    Hyperparameters saved in models_dir by tune_models.py replace the defaults
+    """
+    print("Loading and preprocessing data...")
     
-    # 6. Train ANN (Regression)
-    print("=" * 50)
-    print("Training Artificial Neural Network Model (Regression)...")
-    print("=" * 50)
-    
-    ann_reg_model = ANNModel(task='regression', hidden_layers=(100, 50, 25))
-    ann_reg_model.train(X_train_reg, y_train_reg, feature_names=feature_names)
-    ann_reg_metrics = ann_reg_model.evaluate(X_test_reg, y_test_reg)
+    extra_rows = load_ingested_records(ingested_path) if ingested_path else None
+    if extra_rows is not None and len(extra_rows[0]):
+        print(f"Including {len(extra_rows[0])} ingested records")
     
-    print(f"ANN (Regression) Metrics:")
-    print(f"  MSE: {ann_reg_metrics['mse']:.4f}")
-    print(f"  RMSE: {ann_reg_metrics['rmse']:.4f}")
-    print(f"  R²: {ann_reg_metrics['r2_score']:.4f}")
-    print(f"  MAE: {ann_reg_metrics['mae']:.4f}")
+    # Load the CSV once and make both the classification and regression splits
+    data = load_training_data(data_path, extra_rows=extra_rows)
+    X_train, X_test, _, _ = data['classification']
     
-    ann_reg_model.save_model(os.path.join(models_dir, 'ann_regression.pkl'))
-    print("✓ ANN (Regression) model saved")
+    print(f"Training data shape: {X_train.shape}")
+    print(f"Test data shape: {X_test.shape}")
+    print(f"Features: {data['feature_names']}")
+    
+    hyperparameters = load_hyperparameters(models_dir)
+    for name, params in (overrides or {}).items():
+        hyperparameters[name] = {**hyperparameters.get(name, {}), **params}
+    for name, params in hyperparameters.items():
+        if params:
+            print(f"Hyperparameters for {name}: {params}")
     print()
     
-    # 7. Train ANN (Classification)
-    print("=" * 50)
-    print("Training Artificial Neural Network Model (Classification)...")
-    print("=" * 50)
-    
-    ann_clf_model = ANNModel(task='classification', hidden_layers=(100, 50, 25))
-    ann_clf_model.train(X_train, y_train, feature_names=feature_names)
-    ann_clf_metrics = ann_clf_model.evaluate(X_test, y_test)
-    
-    print(f"ANN (Classification) Metrics:")
-    print(f"  Accuracy: {ann_clf_metrics['accuracy']:.4f}")
+    # Create models directory if it doesn't exist
+    os.makedirs(models_dir, exist_ok=True)
     
-    ann_clf_model.save_model(os.path.join(models_dir, 'ann_classification.pkl'))
-    print("✓ ANN (Classification) model saved")
-    print()
+    # The fitted preprocessing pipeline is served with the models
+    data['preprocessor'].save(os.path.join(models_dir, PREPROCESSOR_FILE))
+    
+    # So is the dataset overview, keyed by the CSV's content hash
+    write_dataset_stats(data_path, os.path.join(models_dir, DATASET_STATS_FILE))
+    
+    start = time.perf_counter()
+    results = {}
+    
+    if jobs == 1:
+        for name in TRAINING_JOBS:
+            results[name] = train_model(name, data, models_dir, hyperparameters.get(name))
+            print_result(*results[name])
+    else:
+        # Split the cores between workers so BLAS threads don't oversubscribe them
+        threads_per_job = max(1, (os.cpu_count() or 1) // jobs)
+        
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(data, threads_per_job)) as executor:
+            # Submit the slowest models first so they don't finish last
+            order = ['svm', 'ann_regression', 'ann_classification', 'knn',
+                     'decision_tree', 'linear_regression', 'naive_bayes']
+            futures = [executor.submit(train_worker_model, name, models_dir, hyperparameters.get(name))
+                       for name in order]
+            
+            for future in as_completed(futures):
+                name, metrics, lines, elapsed = future.result()
+                results[name] = (name, metrics, lines, elapsed)
+                print_result(name, metrics, lines, elapsed)
+    
+    total = time.perf_counter() - start
+    metrics = {name: results[name][1] for name in TRAINING_JOBS}
+    
+    # Every model has now seen all ingested records
+    if ingested_path:
+        clear_stale_models(models_dir)
     
     # Summary
     print("=" * 50)
     print("TRAINING SUMMARY")
     print("=" * 50)
     print("\nRegression Models (Grade Prediction):")
-    print(f"  Linear Regression - R²: {lr_metrics['r2_score']:.4f}, RMSE: {lr_metrics['rmse']:.4f}")
-    print(f"  ANN Regression    - R²: {ann_reg_metrics['r2_score']:.4f}, RMSE: {ann_reg_metrics['rmse']:.4f}")
+    print(f"  Linear Regression - R²: {metrics['linear_regression']['r2_score']:.4f}, RMSE: {metrics['linear_regression']['rmse']:.4f}")
+    print(f"  ANN Regression    - R²: {metrics['ann_regression']['r2_score']:.4f}, RMSE: {metrics['ann_regression']['rmse']:.4f}")
     
     print("\nClassification Models (Performance Category):")
-    print(f"  Naive Bayes      - Accuracy: {nb_metrics['accuracy']:.4f}")
-    print(f"  KNN              - Accuracy: {knn_metrics['accuracy']:.4f}")
-    print(f"  SVM              - Accuracy: {svm_metrics['accuracy']:.4f}")
-    print(f"  Decision Tree    - Accuracy: {dt_metrics['accuracy']:.4f}")
-    print(f"  ANN Classifier   - Accuracy: {ann_clf_metrics['accuracy']:.4f}")
+    print(f"  Naive Bayes      - Accuracy: {metrics['naive_bayes']['accuracy']:.4f}")
+    print(f"  KNN              - Accuracy: {metrics['knn']['accuracy']:.4f}")
+    print(f"  SVM              - Accuracy: {metrics['svm']['accuracy']:.4f}")
+    print(f"  Decision Tree    - Accuracy: {metrics['decision_tree']['accuracy']:.4f}")
+    print(f"  ANN Classifier   - Accuracy: {metrics['ann_classification']['accuracy']:.4f}")
+    
+    print("\nWall time per model:")
+    for name in TRAINING_JOBS:
+        print(f"  {name:<20} {results[name][3]:7.2f} s")
+    print(f"  {'total':<20} {total:7.2f} s  ({jobs} job{'s' if jobs != 1 else ''})")
     
     print("\n✓ All models trained and saved successfully!")
     
-    return {
-        'linear_regression': lr_metrics,
-        'naive_bayes': nb_metrics,
-        'knn': knn_metrics,
-        'svm': svm_metrics,
-        'decision_tree': dt_metrics,
-        'ann_regression': ann_reg_metrics,
-        'ann_classification': ann_clf_metrics
-    }
+    return metrics
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train all EduInsight models')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='worker processes for training models in parallel (default: 1)')
+    parser.add_argument('--models-dir', default=MODELS_DIR,
+                        help='directory to write the model artifacts to')
+    parser.add_argument('--no-ingested', action='store_true',
+                        help='ignore records added through ingestion')
+    parser.add_argument('--knn-index', choices=['auto', 'brute', 'kd_tree', 'ball_tree', 'rp_forest'],
+                        help='neighbor search index for KNN (default: saved hyperparameters, else auto)')
+    parser.add_argument('--knn-index-params', type=json.loads,
+                        help='rp_forest options as JSON, e.g. \'{"n_trees": 30, "leaf_size": 200}\'')
+    args = parser.parse_args()
+    
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    
+    overrides = {'knn': {}}
+    if args.knn_index:
+        overrides['knn']['algorithm'] = args.knn_index
+    if args.knn_index_params is not None:
+        overrides['knn']['index_params'] = args.knn_index_params
+    
     # Get data path
     data_dir = os.path.join(os.path.dirname(__file__), '../data')
     data_file = 'student-mat.csv'  # Math dataset
@@ -218,7 +281,9 @@ if __name__ == '__main__':
     print()
     
     try:
-        metrics = train_all_models(data_path)
+        ingested_path = None if args.no_ingested else os.path.join(data_dir, INGESTED_FILE)
+        metrics = train_all_models(data_path, jobs=args.jobs, models_dir=args.models_dir,
+                                   ingested_path=ingested_path, overrides=overrides)
     except Exception as e:
         print(f"\nError during training: {str(e)}")
         import traceback
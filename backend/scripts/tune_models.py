@@ -0,0 +1,365 @@
+"""
+Hyperparameter search for the model wrappers
+Every candidate in a declarative search space is scored by k-fold cross-validation
+on the training split. Folds of all candidates run in a process pool, and each
+finished fold is memoized on disk so an interrupted search resumes where it stopped.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.model_selection import KFold, StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from train_models import (TRAINING_JOBS, MODELS_DIR, HYPERPARAMETERS_FILE,
+                          train_model, print_result)
+from utils.data_preprocessing import load_training_data, PREPROCESSOR_FILE
+from utils.ingestion import INGESTED_FILE, load_ingested_records
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '../.search_cache')
+
+# Model name -> {hyperparameter: candidate values}; candidates are the full grid
+# An empty space scores the defaults only
+SEARCH_SPACES = {
+    'linear_regression': {},
+    'naive_bayes': {'var_smoothing': [1e-9, 1e-7, 1e-5, 1e-3, 1e-1]},
+    'knn': {'n_neighbors': [3, 5, 7, 9, 11, 15, 21]},
+    'svm': {'C': [0.1, 1.0, 10.0, 100.0], 'gamma': ['scale', 0.001, 0.01, 0.1]},
+    'decision_tree': {'max_depth': [3, 4, 5, 6, 8, None], 'min_samples_split': [2, 10, 20, 40]},
+    'ann_regression': {'hidden_layers': [(50,), (100, 50), (100, 50, 25)]},
+    'ann_classification': {'hidden_layers': [(50,), (100, 50), (100, 50, 25)]}
+}
+
+# Slowest models first so their folds don't finish last
+SEARCH_ORDER = ['svm', 'ann_regression', 'ann_classification', 'knn',
+                'decision_tree', 'naive_bayes', 'linear_regression']
+
+# Fold matrices for pool workers, set once per process by init_worker
+_worker_folds = None
+_worker_feature_names = None
+
+
+def expand_space(space):
+    """
+    Expand a search space into its candidate hyperparameter dicts
+    Args:
+        space: dict mapping hyperparameter name to a list of values
+    Returns:
+        list of dicts, one per combination (a single empty dict for an empty space)
+    """
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def params_key(params):
+    """Canonical JSON text of a candidate, used to memoize its folds"""
+    return json.dumps(params, sort_keys=True)
+
+
+def load_search_spaces(filepath):
+    """
+    Load search spaces from a JSON file of the same shape as SEARCH_SPACES
+    Sequence values inside a candidate list (e.g. layer sizes) become tuples
+    """
+    with open(filepath) as f:
+        spaces = json.load(f)
+    
+    unknown = [name for name in spaces if name not in TRAINING_JOBS]
+    if unknown:
+        raise ValueError(f"Unknown models in search space: {', '.join(unknown)}")
+    
+    return {
+        name: {key: [tuple(v) if isinstance(v, list) else v for v in values] for key, values in space.items()}
+        for name, space in spaces.items()
+    }
+
+
+def build_folds(data, n_folds=5, random_state=42):
+    """
+    Split the training side of each data split into cross-validation folds
+    The fold matrices are sliced once here and reused by every candidate
+    Returns:
+        dict mapping split name to a list of (X_train, X_val, y_train, y_val)
+    """
+    folds = {}
+    
+    for split, splitter in (('classification', StratifiedKFold), ('regression', KFold)):
+        X, _, y, _ = data[split]
+        cv = splitter(n_splits=n_folds, shuffle=True, random_state=random_state)
+        folds[split] = [
+            (np.ascontiguousarray(X[train]), np.ascontiguousarray(X[val]), y[train], y[val])
+            for train, val in cv.split(X, y)
+        ]
+    
+    return folds
+
+
+def search_fingerprint(data, n_folds, random_state):
+    """
+    Hash of everything a fold score depends on besides the candidate:
+    the training rows of both splits and the fold configuration
+    """
+    digest = hashlib.sha256(f"{n_folds}:{random_state}".encode())
+    for split in ('classification', 'regression'):
+        X, _, y, _ = data[split]
+        digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    
+    return digest.hexdigest()[:16]
+
+
+def load_memo(filepath):
+    """
+    Load memoized fold scores
+    Returns:
+        dict mapping (model name, params key, fold) to the saved record
+    """
+    memo = {}
+    if not os.path.exists(filepath):
+        return memo
+    
+    with open(filepath) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A write cut short by an interruption; that fold reruns
+                continue
+            memo[(record['model'], record['params'], record['fold'])] = record
+    
+    return memo
+
+
+def init_worker(folds, feature_names, threads_per_job):
+    """Give each pool worker the fold matrices and its share of BLAS/OpenMP threads"""
+    global _worker_folds, _worker_feature_names
+    _worker_folds = folds
+    _worker_feature_names = feature_names
+    
+    if threads_per_job:
+        threadpool_limits(limits=threads_per_job)
+
+
+def score_fold(name, params, fold, folds=None, feature_names=None):
+    """
+    Train one candidate on one fold and score it on the held-out part
+    Classifiers are scored by accuracy, regressors by R² (higher is better for both)
+    Returns:
+        memo record with the model, params key, fold, score and wall time
+    """
+    start = time.perf_counter()
+    
+    _, _, factory, split = TRAINING_JOBS[name]
+    X_train, X_val, y_train, y_val = (folds or _worker_folds)[split][fold]
+    
+    model = factory(**params)
+    model.train(X_train, y_train, feature_names=feature_names or _worker_feature_names)
+    metrics = model.evaluate(X_val, y_val)
+    
+    return {
+        'model': name,
+        'params': params_key(params),
+        'fold': fold,
+        'score': metrics['r2_score'] if split == 'regression' else metrics['accuracy'],
+        'seconds': time.perf_counter() - start
+    }
+
+
+def summarize(name, candidates, memo, n_folds):
+    """
+    Mean and spread of the fold scores of every fully scored candidate
+    Returns:
+        list of candidate results, best first
+    """
+    results = []
+    
+    for params in candidates:
+        key = params_key(params)
+        scores = [memo[(name, key, fold)]['score'] for fold in range(n_folds)
+                  if (name, key, fold) in memo]
+        if len(scores) < n_folds:
+            continue
+        
+        results.append({
+            'params': params,
+            'mean_score': float(np.mean(scores)),
+            'std_score': float(np.std(scores)),
+            'seconds': float(sum(memo[(name, key, fold)]['seconds'] for fold in range(n_folds)))
+        })
+    
+    # Stable sort keeps the earlier (usually simpler) candidate on ties
+    return sorted(results, key=lambda r: -r['mean_score'])
+
+
+def run_search(data, spaces, n_folds=5, jobs=1, cache_dir=CACHE_DIR, random_state=42):
+    """
+    Cross-validate every candidate of every search space
+    Args:
+        data: splits from load_training_data
+        spaces: dict mapping model name to its search space
+        n_folds: number of cross-validation folds
+        jobs: number of worker processes (1 runs in this process)
+        cache_dir: directory of the memoized fold scores
+    Returns:
+        dict mapping model name to its candidate results, best first
+    """
+    folds = build_folds(data, n_folds=n_folds, random_state=random_state)
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    memo_path = os.path.join(cache_dir, f"search-{search_fingerprint(data, n_folds, random_state)}.jsonl")
+    memo = load_memo(memo_path)
+    
+    candidates = {name: expand_space(spaces[name]) for name in spaces}
+    tasks = [
+        (name, params, fold)
+        for name in sorted(spaces, key=SEARCH_ORDER.index)
+        for params in candidates[name]
+        for fold in range(n_folds)
+        if (name, params_key(params), fold) not in memo
+    ]
+    
+    total = sum(len(c) for c in candidates.values()) * n_folds
+    print(f"{total} fold evaluations, {total - len(tasks)} memoized in {memo_path}")
+    
+    start = time.perf_counter()
+    done = 0
+    
+    with open(memo_path, 'a') as memo_file:
+        def record(result):
+            nonlocal done
+            memo[(result['model'], result['params'], result['fold'])] = result
+            memo_file.write(json.dumps(result) + '\n')
+            memo_file.flush()
+            done += 1
+            print(f"  [{done}/{len(tasks)}] {result['model']:<20} {result['params']:<48} "
+                  f"fold {result['fold']}: {result['score']:.4f} ({result['seconds']:.2f} s)")
+        
+        if jobs == 1:
+            for name, params, fold in tasks:
+                record(score_fold(name, params, fold, folds, data['feature_names']))
+        else:
+            # Split the cores between workers so BLAS threads don't oversubscribe them
+            threads_per_job = max(1, (os.cpu_count() or 1) // jobs)
+            
+            executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                           initargs=(folds, data['feature_names'], threads_per_job))
+            try:
+                futures = [executor.submit(score_fold, *task) for task in tasks]
+                for future in as_completed(futures):
+                    record(future.result())
+            finally:
+                # On an interruption drop the queued folds; finished ones are already saved
+                executor.shutdown(wait=True, cancel_futures=True)
+    
+    print(f"Search finished in {time.perf_counter() - start:.2f} s")
+    
+    return {name: summarize(name, candidates[name], memo, n_folds) for name in spaces}
+
+
+def save_best(results, data, models_dir=MODELS_DIR):
+    """
+    Retrain each model on its full training split with the best candidate,
+    save the artifact and record the hyperparameters for train_models.py
+    Returns:
+        dict mapping model name to its test metrics
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    data['preprocessor'].save(os.path.join(models_dir, PREPROCESSOR_FILE))
+    path = os.path.join(models_dir, HYPERPARAMETERS_FILE)
+    
+    saved = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+    
+    metrics = {}
+    for name, candidates in results.items():
+        if not candidates:
+            continue
+        
+        # Settings outside the search space (e.g. the KNN index) are kept
+        best = {**saved.get(name, {}), **candidates[0]['params']}
+        name, model_metrics, lines, elapsed = train_model(name, data, models_dir, best)
+        print_result(name, model_metrics, lines, elapsed)
+        
+        metrics[name] = model_metrics
+        saved[name] = best
+    
+    with open(path + '.tmp', 'w') as f:
+        json.dump(saved, f, indent=2)
+    os.replace(path + '.tmp', path)
+    
+    return metrics
+
+
+def print_results(results, top=5):
+    """Print the best candidates of each model"""
+    for name, candidates in results.items():
+        print("=" * 50)
+        print(f"{TRAINING_JOBS[name][1]} ({len(candidates)} candidates)")
+        print("=" * 50)
+        for result in candidates[:top]:
+            print(f"  {result['mean_score']:.4f} ± {result['std_score']:.4f}  "
+                  f"{result['seconds']:7.2f} s  {params_key(result['params'])}")
+        print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-validated hyperparameter search for the EduInsight models')
+    parser.add_argument('--model', choices=list(TRAINING_JOBS.keys()), action='append',
+                        help='model to tune (repeatable, default: all)')
+    parser.add_argument('--space', help='JSON file of search spaces replacing the built-in ones')
+    parser.add_argument('--folds', type=int, default=5,
+                        help='cross-validation folds (default: 5)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for fold evaluations (default: all cores)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help='directory of memoized fold scores')
+    parser.add_argument('--models-dir', default=MODELS_DIR,
+                        help='directory to write the best artifacts and hyperparameters to')
+    parser.add_argument('--no-save', action='store_true',
+                        help='only report the search results')
+    parser.add_argument('--no-ingested', action='store_true',
+                        help='ignore records added through ingestion')
+    args = parser.parse_args()
+    
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.folds < 2:
+        parser.error('--folds must be at least 2')
+    
+    data_path = os.path.join(DATA_DIR, 'student-mat.csv')
+    if not os.path.exists(data_path):
+        print(f"Error: Dataset not found at {data_path}")
+        sys.exit(1)
+    
+    spaces = load_search_spaces(args.space) if args.space else SEARCH_SPACES
+    if args.model:
+        spaces = {name: spaces.get(name, {}) for name in args.model}
+    
+    extra_rows = None if args.no_ingested else load_ingested_records(os.path.join(DATA_DIR, INGESTED_FILE))
+    data = load_training_data(data_path, extra_rows=extra_rows)
+    
+    try:
+        results = run_search(data, spaces, n_folds=args.folds, jobs=args.jobs, cache_dir=args.cache_dir)
+    except KeyboardInterrupt:
+        print("\nInterrupted; finished folds are saved, rerun the same command to resume")
+        sys.exit(130)
+    
+    print_results(results)
+    
+    if not args.no_save:
+        save_best(results, data, models_dir=args.models_dir)
+        print(f"✓ Best artifacts and {HYPERPARAMETERS_FILE} saved to {args.models_dir}")
@@ -0,0 +1,42 @@
+"""
+Shared fixtures: the shipped model artifacts and the encoded student dataset
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from utils.data_preprocessing import load_and_preprocess_data
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(BACKEND_DIR, 'models')
+DATA_PATH = os.path.join(BACKEND_DIR, 'data', 'student-mat.csv')
+
+
+@pytest.fixture(scope='session')
+def dataset():
+    """Every student row encoded in model column order, and the feature names"""
+    X_train, X_test, _, _, feature_names, _ = load_and_preprocess_data(DATA_PATH)
+    X = np.ascontiguousarray(np.vstack([X_train, X_test]), dtype=np.float64)
+    return X, feature_names
+
+
+@pytest.fixture(scope='session')
+def X(dataset):
+    return dataset[0]
+
+
+@pytest.fixture(scope='session')
+def load_artifact():
+    """Load a shipped model artifact: load_artifact(ModelClass, 'file.pkl', **init_kwargs)"""
+    def load(factory, filename, **kwargs):
+        filepath = os.path.join(MODELS_DIR, filename)
+        if not os.path.exists(filepath):
+            pytest.skip(f"No trained artifact at {filepath}; run scripts/train_models.py")
+        model = factory(**kwargs)
+        model.load_model(filepath)
+        return model
+
+    return load
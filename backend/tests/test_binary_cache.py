@@ -0,0 +1,107 @@
+"""
+Round trip of the typed binary dataset cache and when load_dataset trusts it
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.data_preprocessing as data_preprocessing
+from utils.data_preprocessing import (load_dataset, write_binary_dataset, load_binary_dataset,
+                                      binary_cache_path, apply_compact_schema)
+
+from conftest import DATA_PATH
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """Copy of the shipped dataset, keeping its modification time"""
+    path = str(tmp_path / 'student-mat.csv')
+    shutil.copy2(DATA_PATH, path)
+    return path
+
+
+def test_cache_loads_the_same_frame(csv_path):
+    cache_path = write_binary_dataset(csv_path)
+    expected = pd.read_csv(csv_path, sep=';')
+
+    pd.testing.assert_frame_equal(load_binary_dataset(cache_path, sep=';', source=csv_path), expected)
+    pd.testing.assert_frame_equal(load_dataset(csv_path), expected)
+    pd.testing.assert_frame_equal(load_dataset(csv_path, compact=True), apply_compact_schema(expected))
+
+
+def test_load_dataset_reads_a_fresh_cache(csv_path, monkeypatch):
+    write_binary_dataset(csv_path)
+
+    # Any CSV parse now fails, so the load must come from the cache
+    def read_csv(*args, **kwargs):
+        raise AssertionError("CSV was parsed instead of the binary cache")
+    monkeypatch.setattr(data_preprocessing.pd, 'read_csv', read_csv)
+
+    assert len(load_dataset(csv_path)) == 395
+
+
+def test_mixed_columns_with_missing_values(tmp_path):
+    path = str(tmp_path / 'mixed.csv')
+    pd.DataFrame({
+        'small': [1, -2, 3],
+        'large': [70000, 1, -70000],
+        'ratio': [0.5, np.nan, 2.25],
+        'flag': [True, False, True],
+        'name': ['b', None, 'a'],
+        'empty': [None, None, None]
+    }).to_csv(path, sep=';', index=False)
+
+    write_binary_dataset(path)
+    pd.testing.assert_frame_equal(load_dataset(path), pd.read_csv(path, sep=';'))
+
+
+def test_in_place_edit_with_older_mtime_is_not_served(csv_path):
+    write_binary_dataset(csv_path)
+    stat = os.stat(csv_path)
+
+    # Same size, older modification time: only the recorded mtime differs
+    with open(csv_path) as f:
+        lines = f.readlines()
+    lines[1] = lines[1].replace('GP', 'MS', 1)
+    with open(csv_path, 'w') as f:
+        f.writelines(lines)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+
+    assert os.path.getsize(csv_path) == stat.st_size
+    assert load_dataset(csv_path)['school'].iloc[0] == 'MS'
+
+
+def test_touched_csv_is_not_served(csv_path):
+    cache_path = write_binary_dataset(csv_path)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert load_binary_dataset(cache_path, sep=';', source=csv_path) is None
+    pd.testing.assert_frame_equal(load_dataset(csv_path), pd.read_csv(csv_path, sep=';'))
+
+
+def test_cache_without_csv_signature_is_stale(csv_path):
+    cache_path = write_binary_dataset(csv_path)
+
+    # A cache written before the CSV's size and mtime were recorded
+    with np.load(cache_path) as data:
+        arrays = {name: data[name] for name in data.files if name != 'csv_signature'}
+    with open(cache_path, 'wb') as f:
+        np.savez(f, **arrays)
+
+    assert load_binary_dataset(cache_path, sep=';', source=csv_path) is None
+    pd.testing.assert_frame_equal(load_dataset(csv_path), pd.read_csv(csv_path, sep=';'))
+
+
+def test_separator_mismatch_and_corrupt_cache_fall_back_to_csv(csv_path):
+    cache_path = write_binary_dataset(csv_path)
+    assert load_binary_dataset(cache_path, sep=',') is None
+
+    with open(cache_path, 'wb') as f:
+        f.write(b'not a zip file')
+    assert binary_cache_path(csv_path) == cache_path
+    pd.testing.assert_frame_equal(load_dataset(csv_path), pd.read_csv(csv_path, sep=';'))
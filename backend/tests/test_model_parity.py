@@ -0,0 +1,180 @@
+"""
+Parity of the fast inference paths with the sklearn estimators they replace,
+on the shipped model artifacts: single rows, batches and feature dicts
+"""
+
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors
+
+from models.linear_regression import LinearRegressionModel
+from models.naive_bayes import NaiveBayesModel
+from models.knn import KNNModel
+from models.svm import SVMModel
+from models.decision_tree import DecisionTreeModel
+from models.ann import ANNModel
+
+
+# Fast paths reorder floating-point operations, so allow rounding differences
+ATOL = 1e-10
+
+CLASSIFIERS = {
+    'naive_bayes': (NaiveBayesModel, 'naive_bayes.pkl', {}),
+    'knn': (KNNModel, 'knn.pkl', {}),
+    'svm': (SVMModel, 'svm.pkl', {}),
+    'decision_tree': (DecisionTreeModel, 'decision_tree.pkl', {}),
+    'ann_classification': (ANNModel, 'ann_classification.pkl', {'task': 'classification'}),
+}
+
+REGRESSORS = {
+    'linear_regression': (LinearRegressionModel, 'linear_regression.pkl', {}),
+    'ann_regression': (ANNModel, 'ann_regression.pkl', {'task': 'regression'}),
+}
+
+
+@pytest.fixture(scope='module', params=list(CLASSIFIERS))
+def classifier(request, load_artifact):
+    factory, filename, kwargs = CLASSIFIERS[request.param]
+    return load_artifact(factory, filename, **kwargs)
+
+
+@pytest.fixture(scope='module', params=list(REGRESSORS))
+def regressor(request, load_artifact):
+    factory, filename, kwargs = REGRESSORS[request.param]
+    return load_artifact(factory, filename, **kwargs)
+
+
+def test_classifier_batch_matches_sklearn(classifier, X):
+    np.testing.assert_allclose(classifier.predict_proba(X), classifier.model.predict_proba(X), rtol=0, atol=ATOL)
+    np.testing.assert_array_equal(classifier.predict(X), classifier.model.predict(X))
+
+
+def test_classifier_single_rows_match_sklearn(classifier, X):
+    for row in X[:20]:
+        np.testing.assert_allclose(classifier.predict_proba(row), classifier.model.predict_proba(row.reshape(1, -1)),
+                                   rtol=0, atol=ATOL)
+
+
+def test_classifier_feature_dicts_match_sklearn(classifier, dataset):
+    X, feature_names = dataset
+
+    results = classifier.predict_batch([dict(zip(feature_names, row)) for row in X[:20].tolist()])
+    expected_probabilities = classifier.model.predict_proba(X[:20])
+    expected_labels = classifier.model.predict(X[:20])
+
+    for i, row in enumerate(X[:20].tolist()):
+        single = classifier.predict_single(dict(zip(feature_names, row)))
+        for result in (single, results[i]):
+            probabilities = [result['probabilities'][str(cls)] for cls in classifier.classes]
+            np.testing.assert_allclose(probabilities, expected_probabilities[i], rtol=0, atol=ATOL)
+            assert result['predicted_class'] == str(expected_labels[i])
+
+
+def test_regressor_matches_sklearn(regressor, dataset):
+    X, feature_names = dataset
+    expected = regressor.model.predict(X)
+
+    np.testing.assert_allclose(regressor.predict(X), expected, rtol=0, atol=ATOL)
+    np.testing.assert_allclose(regressor.predict(X[:1]), expected[:1], rtol=0, atol=ATOL)
+
+    single = regressor.predict_single(dict(zip(feature_names, X[0].tolist())))
+    if isinstance(single, dict):
+        single = single['predicted_grade']
+    assert single == pytest.approx(expected[0], abs=ATOL)
+
+
+def test_ann_float32_inference_stays_close(load_artifact, X):
+    model = load_artifact(ANNModel, 'ann_classification.pkl', task='classification', inference_dtype='float32')
+    np.testing.assert_allclose(model.predict_proba(X), model.model.predict_proba(X), rtol=0, atol=1e-5)
+
+
+def test_svm_decision_function_and_kernel_blocks(load_artifact, X):
+    model = load_artifact(SVMModel, 'svm.pkl')
+    expected = model.model.decision_function(X)
+    np.testing.assert_allclose(model.decision_function(X), expected, rtol=0, atol=ATOL)
+
+    # Blocks that do not divide the batch evenly
+    model.kernel_block_size = 7
+    np.testing.assert_allclose(model.decision_function(X), expected, rtol=0, atol=ATOL)
+    np.testing.assert_allclose(model.predict_proba(X), model.model.predict_proba(X), rtol=0, atol=ATOL)
+
+    labels, probabilities = model.predict_with_proba(X)
+    np.testing.assert_array_equal(labels, model.model.predict(X))
+    np.testing.assert_allclose(probabilities, model.model.predict_proba(X), rtol=0, atol=ATOL)
+
+
+@pytest.mark.parametrize('n_classes', [2, 3, 4, 5])
+@pytest.mark.parametrize('kernel', ['rbf', 'linear', 'poly', 'sigmoid'])
+def test_svm_probability_coupling_matches_libsvm(n_classes, kernel):
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(300, 15))
+    score = 2 * X[:, 0] + X[:, 1] + rng.normal(scale=0.8, size=len(X))
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+
+    model = SVMModel(kernel=kernel)
+    model.train(X, y)
+    queries = rng.normal(size=(100, 15))
+
+    np.testing.assert_allclose(model.predict_proba(queries), model.model.predict_proba(queries), rtol=0, atol=ATOL)
+    np.testing.assert_array_equal(model.predict(queries), model.model.predict(queries))
+    np.testing.assert_allclose(model.decision_function(queries), model.model.decision_function(queries),
+                               rtol=0, atol=ATOL)
+
+
+def test_knn_probabilities_do_not_depend_on_k(load_artifact, X):
+    model = load_artifact(KNNModel, 'knn.pkl')
+    expected = model.model.predict_proba(X)
+
+    for k in (1, model.model.n_neighbors, model.model.n_neighbors + 1, len(model.X_train)):
+        results = model.find_nearest_neighbors_batch(X[:20], k=k)
+        for result, probabilities in zip(results, expected[:20]):
+            labeled = [result['probabilities'][label] for label in model.class_labels]
+            np.testing.assert_allclose(labeled, probabilities, rtol=0, atol=ATOL)
+
+
+@pytest.mark.parametrize('k', [1, 5, 6, 'all'])
+def test_knn_neighbors_match_exact_search(load_artifact, X, k):
+    model = load_artifact(KNNModel, 'knn.pkl')
+    k = len(model.X_train) if k == 'all' else k
+    exact = NearestNeighbors(algorithm='brute').fit(model.X_train)
+    expected_distances, _ = exact.kneighbors(X[:20], n_neighbors=k)
+
+    # Sorted distances do not depend on how ties are ordered
+    for query, result, distances in zip(X[:20], model.find_nearest_neighbors_batch(X[:20], k=k), expected_distances):
+        assert result['k'] == k
+        np.testing.assert_allclose(result['distances'], distances, rtol=0, atol=ATOL)
+        for detail in result['neighbor_details']:
+            features = np.array([detail['features'][name] for name in model.feature_names])
+            assert np.linalg.norm(features - query) == pytest.approx(detail['distance'], abs=ATOL)
+
+    single = model.find_nearest_neighbors(X[0], k=k)
+    np.testing.assert_allclose(single['distances'], expected_distances[0], rtol=0, atol=ATOL)
+
+
+@pytest.mark.parametrize('k', [0, -1, 'n+1', True, 2.5, '3'])
+def test_knn_rejects_k_out_of_range(load_artifact, X, k):
+    model = load_artifact(KNNModel, 'knn.pkl')
+    k = len(model.X_train) + 1 if k == 'n+1' else k
+
+    with pytest.raises(ValueError):
+        model.find_nearest_neighbors(X[0], k=k)
+    with pytest.raises(ValueError):
+        model.find_nearest_neighbors_batch(X[:2], k=k)
+
+
+@pytest.mark.parametrize('value', [np.nan, np.inf])
+def test_classifier_rejects_non_finite_features(classifier, X, value):
+    bad = X[:2].copy()
+    bad[1, 0] = value
+
+    with pytest.raises(ValueError):
+        classifier.predict(bad)
+
+
+@pytest.mark.parametrize('value', [np.nan, -np.inf])
+def test_regressor_rejects_non_finite_features(regressor, X, value):
+    bad = X[:2].copy()
+    bad[1, 0] = value
+
+    with pytest.raises(ValueError):
+        regressor.predict(bad)
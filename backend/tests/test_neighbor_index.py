@@ -0,0 +1,145 @@
+"""
+RandomProjectionForest against exact neighbor search, and KNNModel on top of it
+"""
+
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors, KNeighborsClassifier
+
+import models.neighbor_index as neighbor_index
+from models.neighbor_index import RandomProjectionForest
+from models.knn import KNNModel
+
+
+@pytest.fixture(scope='module')
+def data():
+    """Continuous rows (no tied distances) and queries drawn from the same distribution"""
+    rng = np.random.RandomState(0)
+    return rng.normal(size=(3000, 15)), rng.normal(size=(200, 15))
+
+
+@pytest.fixture(scope='module')
+def exact(data):
+    return NearestNeighbors(algorithm='brute').fit(data[0])
+
+
+@pytest.mark.parametrize('k', [1, 10, 3000])
+def test_single_leaf_forest_is_exact(data, exact, k):
+    X, queries = data
+    forest = RandomProjectionForest(n_trees=2, leaf_size=len(X)).fit(X)
+
+    distances, indices = forest.kneighbors(queries, n_neighbors=k)
+    expected_distances, expected_indices = exact.kneighbors(queries, n_neighbors=k)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances, rtol=0, atol=1e-10)
+
+
+def test_default_forest_recall(data, exact):
+    X, queries = data
+    forest = RandomProjectionForest().fit(X)
+
+    _, indices = forest.kneighbors(queries, n_neighbors=10)
+    _, expected = exact.kneighbors(queries, n_neighbors=10)
+
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(indices, expected)])
+    assert recall >= 0.95
+
+
+def test_returned_distances_are_exact_and_sorted(data):
+    X, queries = data
+    forest = RandomProjectionForest(n_trees=5, leaf_size=50).fit(X)
+
+    distances, indices = forest.kneighbors(queries, n_neighbors=10)
+
+    np.testing.assert_allclose(distances, np.linalg.norm(X[indices] - queries[:, np.newaxis], axis=2),
+                               rtol=0, atol=1e-10)
+    assert (np.diff(distances, axis=1) >= 0).all()
+    assert all(len(set(row)) == 10 for row in indices)
+
+
+def test_single_rows_match_batch(data):
+    X, queries = data
+    forest = RandomProjectionForest(n_trees=5, leaf_size=50).fit(X)
+
+    distances, indices = forest.kneighbors(queries, n_neighbors=7)
+    for i in range(0, len(queries), 37):
+        row_distances, row_indices = forest.kneighbors(queries[i:i + 1], n_neighbors=7)
+        np.testing.assert_array_equal(row_indices[0], indices[i])
+        np.testing.assert_array_equal(row_distances[0], distances[i])
+
+
+def test_query_blocks_do_not_change_results(data, monkeypatch):
+    X, queries = data
+    forest = RandomProjectionForest(n_trees=5, leaf_size=50).fit(X)
+    expected = forest.kneighbors(queries, n_neighbors=10)
+
+    # A few queries per block, with a partial last block
+    monkeypatch.setattr(neighbor_index, 'CANDIDATE_BLOCK_SIZE', 7 * 5 * 50)
+    distances, indices = forest.kneighbors(queries, n_neighbors=10)
+
+    np.testing.assert_array_equal(indices, expected[1])
+    np.testing.assert_array_equal(distances, expected[0])
+
+
+def test_too_few_candidates_fall_back_to_exact_search(data, exact):
+    X, queries = data
+    forest = RandomProjectionForest(n_trees=1, leaf_size=5).fit(X)
+
+    # One leaf of at most 5 rows cannot supply 20 neighbors
+    distances, indices = forest.kneighbors(queries, n_neighbors=20)
+    expected_distances, expected_indices = exact.kneighbors(queries, n_neighbors=20)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances, rtol=0, atol=1e-10)
+
+
+def test_exact_matches_and_duplicate_rows():
+    X = np.repeat(np.arange(40, dtype=np.float64).reshape(-1, 1), 50, axis=0) * np.ones((1, 3))
+    forest = RandomProjectionForest(n_trees=3, leaf_size=20).fit(X)
+
+    distances, indices = forest.kneighbors(X[[0, 500, 1999]], n_neighbors=5)
+
+    # Each value has 50 identical rows, so the 5 nearest are exact matches
+    assert (distances == 0).all()
+    np.testing.assert_array_equal(X[indices][:, :, 0], X[[0, 500, 1999], 0][:, np.newaxis].repeat(5, axis=1))
+
+
+def test_more_neighbors_than_rows_is_rejected(data):
+    X, queries = data
+    forest = RandomProjectionForest(n_trees=2, leaf_size=100).fit(X[:50])
+
+    with pytest.raises(ValueError):
+        forest.kneighbors(queries, n_neighbors=51)
+
+
+def test_knn_model_with_single_leaf_index_matches_sklearn(data):
+    X, queries = data
+    y = (X[:, 0] + X[:, 1] > 0).astype(int) + (X[:, 2] > 1)
+
+    model = KNNModel(algorithm='rp_forest', index_params={'n_trees': 2, 'leaf_size': len(X)})
+    model.train(X, y)
+    expected = KNeighborsClassifier(algorithm='brute').fit(X, y)
+
+    np.testing.assert_allclose(model.predict_proba(queries), expected.predict_proba(queries), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(model.predict(queries[:1]), expected.predict(queries[:1]))
+
+    result = model.find_nearest_neighbors(queries[0], k=len(X))
+    np.testing.assert_allclose(result['distances'], expected.kneighbors(queries[:1], n_neighbors=len(X))[0][0],
+                               rtol=0, atol=1e-10)
+
+
+def test_knn_model_artifact_shares_the_training_matrix(data, tmp_path):
+    X, queries = data
+    y = (X[:, 0] > 0).astype(int)
+
+    model = KNNModel(algorithm='rp_forest', index_params={'n_trees': 5, 'leaf_size': 50})
+    model.train(X, y)
+    model.save_model(str(tmp_path / 'knn.pkl'))
+
+    loaded = KNNModel()
+    loaded.load_model(str(tmp_path / 'knn.pkl'))
+
+    assert loaded.model._fit_X is loaded.X_train
+    assert loaded.ann_index.X is loaded.X_train
+    np.testing.assert_array_equal(loaded.predict_proba(queries), model.predict_proba(queries))
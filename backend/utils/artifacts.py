@@ -0,0 +1,32 @@
+"""
+Atomic writes of model artifacts
+Processes that memory-map an artifact (MODEL_MMAP_MODE=r) keep reading the file
+they opened, so a new version must replace it by rename instead of being written
+over it in place
+"""
+
+import os
+import tempfile
+
+import joblib
+
+
+def dump_atomic(obj, filepath):
+    """
+    joblib.dump obj to a temporary file in the target directory, then rename it over filepath
+    Readers see either the complete old file or the complete new one, and mapped
+    readers keep the old file's data until they load again
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filepath) + '.',
+                                    suffix='.tmp')
+    
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            joblib.dump(obj, f)
+        # mkstemp creates the file private to its owner; keep the permissions of the replaced file
+        os.chmod(tmp_path, os.stat(filepath).st_mode & 0o777 if os.path.exists(filepath) else 0o644)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
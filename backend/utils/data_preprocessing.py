@@ -2,109 +2,414 @@
 Data preprocessing utilities for student performance data
 """
 
+import os
+import json
+import hashlib
+import threading
+import zipfile
 import pandas as pd
 import numpy as np
+import joblib
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 
+from utils.artifacts import dump_atomic
+from utils.feature_schema import FeatureSchema
 
-def load_dataset(filepath, sep=';'):
-    """Load dataset from CSV file"""
+
+# Process-wide dataset cache, keyed by file path
+# Entries are reloaded only when the file's mtime or size changes
+_dataset_cache = {}
+_dataset_cache_lock = threading.Lock()
+_dataset_cache_stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+
+# Precomputed statistics artifacts, keyed by dataset path
+# Entries are rechecked only when the dataset or the artifact file changes
+_dataset_stats = {}
+
+# Features used by every model, in model column order
+FEATURE_COLUMNS = ['age', 'Medu', 'Fedu', 'traveltime', 'studytime', 
+                   'failures', 'famrel', 'freetime', 'goout', 'Dalc', 'Walc',
+                   'health', 'absences', 'G1', 'G2']
+
+# Compact dtypes for the student dataset
+# Grades (0-20), Likert scales (1-5), education levels and counts fit in int8;
+# absences use uint8 for headroom. String columns become categoricals.
+STUDENT_SCHEMA = {
+    'age': 'int8', 'Medu': 'int8', 'Fedu': 'int8', 'traveltime': 'int8',
+    'studytime': 'int8', 'failures': 'int8', 'famrel': 'int8', 'freetime': 'int8',
+    'goout': 'int8', 'Dalc': 'int8', 'Walc': 'int8', 'health': 'int8',
+    'absences': 'uint8', 'G1': 'int8', 'G2': 'int8', 'G3': 'int8',
+    'school': 'category', 'sex': 'category', 'address': 'category',
+    'famsize': 'category', 'Pstatus': 'category', 'Mjob': 'category',
+    'Fjob': 'category', 'reason': 'category', 'guardian': 'category',
+    'schoolsup': 'category', 'famsup': 'category', 'paid': 'category',
+    'activities': 'category', 'nursery': 'category', 'higher': 'category',
+    'internet': 'category', 'romantic': 'category'
+}
+
+# Performance labels in LabelEncoder order: At-Risk=0, Average=1, Good=2
+PERFORMANCE_LABEL_DTYPE = pd.CategoricalDtype(['At-Risk', 'Average', 'Good'])
+
+# Fitted StudentPreprocessor, saved next to the model artifacts
+PREPROCESSOR_FILE = 'preprocessor.pkl'
+
+# Dataset statistics written next to the model artifacts, keyed by the dataset's content hash
+DATASET_STATS_FILE = 'dataset_stats.json'
+
+# G3 bin edges between the performance labels (see categorize_performance)
+PERFORMANCE_BINS = [10, 15]
+
+# Typed binary copy of a CSV dataset, stored next to it (see write_binary_dataset)
+BINARY_CACHE_SUFFIX = '.columns.npz'
+
+
+def load_dataset(filepath, sep=';', compact=False):
+    """
+    Load dataset from CSV file
+    When the typed binary cache was written from the CSV as it is now (same size
+    and modification time) it is read instead, skipping text parsing and dtype
+    inference; the frame is the same either way
+    Args:
+        compact: apply STUDENT_SCHEMA (see apply_compact_schema)
+    """
+    df = None
+    
+    cache_path = binary_cache_path(filepath)
+    if os.path.exists(cache_path):
+        try:
+            df = load_binary_dataset(cache_path, sep=sep, source=filepath)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Unreadable or partial cache; the CSV is still authoritative
+            df = None
+    
+    if df is None:
+        df = pd.read_csv(filepath, sep=sep)
+    
+    return apply_compact_schema(df) if compact else df
+
+
+def apply_compact_schema(df, schema=STUDENT_SCHEMA):
+    """
+    Convert columns to the compact dtypes of a schema
+    Integer targets are applied only to integer columns whose values fit, so
+    unexpected data (missing values, out-of-range grades) keeps its wide dtype
+    instead of wrapping around. Columns not in the schema are left as they are.
+    A performance_label column becomes PERFORMANCE_LABEL_DTYPE.
+    Returns:
+        new DataFrame with the compact dtypes
+    """
+    dtypes = {}
+    
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        
+        if dtype == 'category':
+            dtypes[col] = dtype
+        elif pd.api.types.is_integer_dtype(df[col].dtype) and len(df):
+            info = np.iinfo(dtype)
+            if info.min <= df[col].min() and df[col].max() <= info.max:
+                dtypes[col] = dtype
+    
+    if 'performance_label' in df.columns:
+        dtypes['performance_label'] = PERFORMANCE_LABEL_DTYPE
+    
+    return df.astype(dtypes)
+
+
+def memory_usage_report(before, after):
+    """
+    Compare the memory footprint of a frame before and after a dtype change
+    Returns:
+        dict with total bytes before and after, the reduction factor, and the
+        dtype and bytes of every column
+    """
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False)
+    total_before = int(before_bytes.sum())
+    total_after = int(after_bytes.sum())
+    
+    return {
+        'bytes_before': total_before,
+        'bytes_after': total_after,
+        'reduction': total_before / total_after if total_after else 0.0,
+        'columns': {
+            col: {
+                'dtype_before': str(before[col].dtype),
+                'dtype_after': str(after[col].dtype),
+                'bytes_before': int(before_bytes[col]),
+                'bytes_after': int(after_bytes[col])
+            }
+            for col in after.columns
+        }
+    }
+
+
+def binary_cache_path(filepath):
+    """Path of the binary cache for a CSV dataset"""
+    return os.path.splitext(filepath)[0] + BINARY_CACHE_SUFFIX
+
+
+def _csv_signature(filepath):
+    """Size and modification time of a CSV, recorded in its binary cache"""
+    stat = os.stat(filepath)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def dataset_content_hash(filepath, block_size=1 << 20):
+    """SHA-256 of a dataset file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _smallest_int_dtype(values):
+    """Smallest signed integer dtype that holds every value"""
+    if not len(values):
+        return np.int8
+    
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return np.int64
+
+
+def write_binary_dataset(filepath, sep=';'):
+    """
+    Convert a CSV dataset to its typed binary columnar cache
+    Integer columns are stored in blocks by the smallest type that holds them
+    (int8 for the grades, scales and counts), and string columns as one block of
+    codes into sorted per-column dictionaries of their distinct values. The CSV's
+    content hash, size, modification time and dtypes are stored alongside so the
+    cache can be verified and loads back to the same frame.
+    Returns:
+        path of the cache file
+    """
+    # Taken before reading so an edit during conversion leaves the cache stale
+    signature = _csv_signature(filepath)
     df = pd.read_csv(filepath, sep=sep)
-    return df
+    
+    # Integer columns are grouped into one block per storage type
+    int_blocks, string_columns, other_columns = {}, [], []
+    for i, dtype in enumerate(df.dtypes):
+        if pd.api.types.is_integer_dtype(dtype):
+            storage = np.dtype(_smallest_int_dtype(df.iloc[:, i].to_numpy())).name
+            int_blocks.setdefault(storage, []).append(i)
+        elif pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+            other_columns.append(i)
+        else:
+            string_columns.append(i)
+    
+    codes, categories, category_counts = [], [], []
+    for i in string_columns:
+        # Missing values get code -1
+        column_codes, column_categories = pd.factorize(df.iloc[:, i], sort=True)
+        codes.append(column_codes)
+        categories.extend(column_categories)
+        category_counts.append(len(column_categories))
+    codes = np.stack(codes) if codes else np.empty((0, len(df)), dtype=np.int64)
+    
+    arrays = {
+        'columns': np.array(df.columns, dtype=str),
+        'dtypes': np.array([str(dtype) for dtype in df.dtypes], dtype=str),
+        'content_hash': np.array(dataset_content_hash(filepath)),
+        'csv_signature': signature,
+        'sep': np.array(sep),
+        'int_storage': np.array(list(int_blocks), dtype=str),
+        'string_columns': np.array(string_columns, dtype=np.int64),
+        'string_codes': codes.astype(_smallest_int_dtype(np.array([-1, max(category_counts, default=0)]))),
+        'categories': np.array(categories, dtype=str),
+        'category_counts': np.array(category_counts, dtype=np.int64)
+    }
+    for storage, block in int_blocks.items():
+        # One row per column so each column loads back as a contiguous slice
+        arrays[f'{storage}_columns'] = np.array(block, dtype=np.int64)
+        arrays[f'{storage}_values'] = np.stack([df.iloc[:, i].to_numpy() for i in block]).astype(storage)
+    for i in other_columns:
+        arrays[f'values_{i}'] = df.iloc[:, i].to_numpy()
+    
+    # Write then rename so readers never see a partial file
+    path = binary_cache_path(filepath)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(path + '.tmp', path)
+    
+    return path
 
 
-def add_performance_label(df):
+def load_binary_dataset(cache_path, sep=';', source=None):
     """
-    Add performance_label column based on G3 (final grade)
+    Load a dataset from its binary cache, restoring the CSV's dtypes
+    Args:
+        source: path of the CSV; if given, the cache is only used when the CSV's
+                size and modification time still match the ones recorded in it
+    Returns:
+        DataFrame, or None if the cache was written for a different separator
+        or no longer matches source
+    """
+    with np.load(cache_path, allow_pickle=False) as data:
+        if str(data['sep']) != sep:
+            return None
+        
+        # Caches written before the signature was recorded count as stale
+        if source is not None and (
+                'csv_signature' not in data.files
+                or not np.array_equal(data['csv_signature'], _csv_signature(source))):
+            return None
+        
+        columns = data['columns'].tolist()
+        
+        # Resolve each distinct dtype name once rather than per column
+        resolved = {name: pd.api.types.pandas_dtype(name) for name in set(data['dtypes'].tolist())}
+        dtypes = [resolved[name] for name in data['dtypes'].tolist()]
+        values = [None] * len(columns)
+        
+        for storage in data['int_storage'].tolist():
+            block = data[f'{storage}_values']
+            for row, i in enumerate(data[f'{storage}_columns'].tolist()):
+                values[i] = block[row].astype(dtypes[i])
+        
+        string_codes = data['string_codes']
+        categories = data['categories'].astype(object)
+        offsets = np.concatenate([[0], np.cumsum(data['category_counts'])])
+        for row, i in enumerate(data['string_columns'].tolist()):
+            # Code -1 (missing) picks the appended None
+            lookup = np.append(categories[offsets[row]:offsets[row + 1]], None)
+            values[i] = pd.array(lookup.take(string_codes[row]), dtype=dtypes[i])
+        
+        for i, dtype in enumerate(dtypes):
+            if values[i] is None:
+                values[i] = data[f'values_{i}'].astype(dtype)
+    
+    return pd.DataFrame(dict(zip(columns, values)), copy=False)
+
+
+def read_binary_dataset_hash(cache_path):
+    """Content hash of the CSV a binary cache was written from"""
+    with np.load(cache_path, allow_pickle=False) as data:
+        return str(data['content_hash'])
+
+
+def iter_dataset_chunks(filepath, chunk_size=100000, columns=None, sep=';'):
+    """
+    Stream a dataset CSV as DataFrames of at most chunk_size rows
+    Unlike load_dataset only one chunk is parsed and held in memory at a time
+    Args:
+        columns: columns to parse (default: all); the others are skipped while reading
+    Returns:
+        pandas TextFileReader, iterable and usable as a context manager
+    """
+    if columns is not None:
+        header = pd.read_csv(filepath, sep=sep, nrows=0).columns
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise ValueError(f"Dataset is missing columns: {', '.join(missing)}")
+    
+    return pd.read_csv(filepath, sep=sep, usecols=columns, chunksize=chunk_size)
+
+
+def categorize_performance(grade):
+    """
+    Map a final grade to its performance label
     Custom EduInsight categorization:
     - G3 >= 15: Good
     - G3 >= 10: Average
     - G3 < 10: At-Risk
     """
-    def categorize_performance(grade):
-        if grade >= 15:
-            return "Good"
-        elif grade >= 10:
-            return "Average"
-        else:
-            return "At-Risk"
-    
-    df['performance_label'] = df['G3'].apply(categorize_performance)
+    if grade >= 15:
+        return "Good"
+    elif grade >= 10:
+        return "Average"
+    else:
+        return "At-Risk"
+
+
+def performance_codes(grades):
+    """
+    Vectorized performance label codes for G3 grades
+    Same thresholds as categorize_performance; codes follow PERFORMANCE_LABEL_DTYPE
+    (At-Risk=0, Average=1, Good=2). Missing grades get code -1.
+    """
+    grades = np.asarray(grades, dtype=np.float64)
+    codes = np.digitize(grades, PERFORMANCE_BINS)
+    codes[np.isnan(grades)] = -1
+    return codes
+
+
+def add_performance_label(df):
+    """
+    Add performance_label column based on G3 (final grade)
+    Binned in one vectorized pass; see categorize_performance for the thresholds
+    """
+    df['performance_label'] = pd.Categorical.from_codes(performance_codes(df['G3']),
+                                                        dtype=PERFORMANCE_LABEL_DTYPE)
     return df
 
 
-def preprocess_data(df, add_label=True):
+def preprocess_data(df, add_label=True, inplace=False):
     """
     Preprocess the dataset
     - Add performance label
     - Handle missing values
-    - Encode categorical variables
-    - Scale numerical features
+    Args:
+        inplace: modify df instead of a copy
     """
-    # Make a copy
-    df_processed = df.copy()
+    df_processed = df if inplace else df.copy()
     
     # Add performance label if requested
     if add_label:
-        df_processed = add_performance_label(df_processed)
+        add_performance_label(df_processed)
     
     # Handle missing values
-    df_processed.fillna(df_processed.mean(numeric_only=True), inplace=True)
+    StudentPreprocessor().fit(df_processed).fill_missing(df_processed)
     
     return df_processed
 
 
-def encode_categorical_features(df):
+def encode_categorical_features(df, preprocessor=None, inplace=False):
     """
     Encode categorical variables for ML models
+    Args:
+        preprocessor: fitted StudentPreprocessor whose vocabularies are used
+                      (default: fit one on df)
+        inplace: modify df instead of a copy
+    Returns:
+        encoded DataFrame and a LabelEncoder per encoded column
     """
-    df_encoded = df.copy()
-    
-    # Identify categorical columns
-    categorical_cols = df_encoded.select_dtypes(include=['object']).columns
+    if preprocessor is None:
+        preprocessor = StudentPreprocessor().fit(df)
     
-    # Create label encoders for each categorical column
-    encoders = {}
-    for col in categorical_cols:
-        if col != 'performance_label':  # Don't encode the target label yet
-            le = LabelEncoder()
-            df_encoded[col] = le.fit_transform(df_encoded[col].astype(str))
-            encoders[col] = le
+    df_encoded = preprocessor.encode_categoricals(df if inplace else df.copy())
     
-    return df_encoded, encoders
+    return df_encoded, preprocessor.label_encoders()
 
 
-def prepare_features(df):
+def prepare_features(df, preprocessor=None):
     """
     Prepare features for regression (predicting G3)
     Returns X (features) and y (target G3)
     """
-    # Important features for prediction
-    feature_cols = ['age', 'Medu', 'Fedu', 'traveltime', 'studytime', 
-                    'failures', 'famrel', 'freetime', 'goout', 'Dalc', 'Walc',
-                    'health', 'absences', 'G1', 'G2']
+    preprocessor = preprocessor or StudentPreprocessor()
     
     # Keep only rows where all features are present
-    df_clean = df[feature_cols + ['G3']].dropna()
-    
-    X = df_clean[feature_cols].values
-    y = df_clean['G3'].values
+    X, keep = preprocessor.features(df, require=['G3'])
+    y = df['G3'].to_numpy()[keep]
     
     return X, y
 
 
-def prepare_features_for_models(df):
+def prepare_features_for_models(df, preprocessor=None):
     """
     Prepare features specifically for model training
     Returns encoded numerical dataframe
     """
-    df_prep = df.copy()
-    
-    # Encode categorical features
-    df_encoded, encoders = encode_categorical_features(df_prep)
-    
-    return df_encoded, encoders
+    # Encode categorical features (one copy of the frame)
+    return encode_categorical_features(df, preprocessor=preprocessor)
 
 
 def get_features_and_target(df, target_column='G3'):
@@ -121,50 +426,225 @@ def get_features_and_target(df, target_column='G3'):
     return X, y
 
 
-def load_and_preprocess_data(filepath, test_size=0.2, random_state=42):
-    """
-    Complete pipeline: load, preprocess, and split data
-    Returns: X_train, X_test, y_train, y_test, feature_names, label_encoder
-    """
-    # Load dataset
-    df = load_dataset(filepath, sep=';')
+class StudentPreprocessor:
+    def __init__(self, feature_names=FEATURE_COLUMNS):
+        """
+        Preprocessing pipeline for student records
+        Fitted once, saved with the model artifacts, and used to encode training
+        frames, batch files and API requests the same way
+        Args:
+            feature_names: model feature columns, in model column order
+        """
+        self.feature_names = list(feature_names)
+        self.schema = FeatureSchema(self.feature_names)
+        self.label_classes = list(PERFORMANCE_LABEL_DTYPE.categories)
+        self.fill_values = {}
+        self.categories = {}
+        self.is_fitted = False
+    
+    def fit(self, df):
+        """Learn the fill value of each numeric column and the vocabulary of each categorical one"""
+        self.fill_values = {}
+        self.categories = {}
+        
+        for col, dtype in df.dtypes.items():
+            if col == 'performance_label':
+                continue
+            if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype):
+                # Sorted, like LabelEncoder
+                self.categories[col] = sorted(df[col].dropna().unique().tolist())
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                self.fill_values[col] = float(df[col].mean())
+        
+        self.is_fitted = True
+        return self
+    
+    def transform(self, df, inplace=False, add_label=True):
+        """
+        Fill missing values, encode categorical columns as integer codes and
+        add the performance label, one column at a time
+        Args:
+            inplace: modify df instead of a copy
+            add_label: add performance_label when df has G3
+        """
+        if not self.is_fitted:
+            raise Exception("Preprocessor not fitted yet")
+        
+        if not inplace:
+            df = df.copy()
+        
+        self.fill_missing(df)
+        self.encode_categoricals(df)
+        if add_label and 'G3' in df.columns:
+            add_performance_label(df)
+        
+        return df
+    
+    def fit_transform(self, df, inplace=False, add_label=True):
+        """Fit on df and transform it"""
+        return self.fit(df).transform(df, inplace=inplace, add_label=add_label)
+    
+    def fill_missing(self, df):
+        """Replace missing numeric values with the fitted means, in place; only columns with gaps are touched"""
+        for col, value in self.fill_values.items():
+            if col in df.columns and df[col].isna().any():
+                df[col] = df[col].fillna(value)
+        return df
     
-    # Add performance label
-    df = add_performance_label(df)
+    def encode_categoricals(self, df):
+        """
+        Replace categorical columns with their codes in the fitted vocabulary, in place
+        Values outside the vocabulary and missing values get code -1
+        """
+        for col, categories in self.categories.items():
+            if col in df.columns:
+                df[col] = pd.Categorical(df[col], categories=categories).codes
+        return df
     
-    # Select important features
-    feature_cols = ['age', 'Medu', 'Fedu', 'traveltime', 'studytime', 
-                    'failures', 'famrel', 'freetime', 'goout', 'Dalc', 'Walc',
-                    'health', 'absences', 'G1', 'G2']
+    def label_encoders(self):
+        """LabelEncoders equivalent to the fitted vocabularies, without refitting on data"""
+        encoders = {}
+        for col, categories in self.categories.items():
+            encoder = LabelEncoder()
+            encoder.classes_ = np.array(categories)
+            encoders[col] = encoder
+        return encoders
     
-    # Keep only rows where all features and target are present
-    df_clean = df[feature_cols + ['performance_label']].dropna()
+    @property
+    def label_encoder(self):
+        """LabelEncoder for the performance label (At-Risk=0, Average=1, Good=2)"""
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(self.label_classes, dtype=object)
+        return encoder
     
-    # Prepare X and y
-    X = df_clean[feature_cols].values
-    y = df_clean['performance_label'].values
+    def labels(self, grades):
+        """Performance label codes for G3 grades"""
+        return performance_codes(grades)
     
-    # Encode labels
-    label_encoder = LabelEncoder()
-    y_encoded = label_encoder.fit_transform(y)
+    def features(self, df, dtype=None, require=(), coerce=False):
+        """
+        Build the model feature matrix column by column, without copying the frame
+        Args:
+            dtype: matrix dtype (default: common dtype of the feature columns)
+            require: other columns that must be present (and finite) for a row to be kept
+            coerce: parse non-numeric feature values, treating unparseable ones as missing
+        Returns:
+            matrix of the rows whose features (and required columns) are all present,
+            and the boolean mask of those rows
+        """
+        columns = []
+        for col in self.feature_names:
+            values = df[col]
+            if coerce and not pd.api.types.is_numeric_dtype(values.dtype):
+                values = pd.to_numeric(values, errors='coerce')
+            columns.append(values.to_numpy())
+        
+        X = np.empty((len(df), len(columns)), dtype=dtype or np.result_type(*columns))
+        for j, values in enumerate(columns):
+            X[:, j] = values
+        
+        keep = np.ones(len(df), dtype=bool)
+        for values in columns + [df[col].to_numpy() for col in require]:
+            if values.dtype.kind in 'fc':
+                keep &= np.isfinite(values)
+            elif values.dtype == object:
+                keep &= pd.notna(values)
+        
+        return (X, keep) if keep.all() else (X[keep], keep)
+    
+    def encode(self, features):
+        """Encode API request features (dicts or rows) with the shared feature schema"""
+        return self.schema.encode(features)
+    
+    def save(self, filepath):
+        """Save the fitted pipeline next to the model artifacts"""
+        dump_atomic(self, filepath)
+    
+    @staticmethod
+    def load(filepath):
+        """Load a saved pipeline"""
+        return joblib.load(filepath)
+
+
+def split_classification_data(df, test_size=0.2, random_state=42, preprocessor=None):
+    """
+    Encode performance labels and make the stratified train/test split
+    Returns: X_train, X_test, y_train, y_test, feature_names, label_encoder
+    """
+    preprocessor = preprocessor or StudentPreprocessor()
+    
+    # Keep only rows where all features and the grade are present
+    X, keep = preprocessor.features(df, require=['G3'])
+    
+    # Label codes by vectorized binning of the grade
+    y_encoded = preprocessor.labels(df['G3'].to_numpy()[keep])
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y_encoded, test_size=test_size, random_state=random_state, stratify=y_encoded
     )
     
-    return X_train, X_test, y_train, y_test, feature_cols, label_encoder
+    return X_train, X_test, y_train, y_test, list(preprocessor.feature_names), preprocessor.label_encoder
 
 
-def get_dataset_info(filepath, sep=';'):
+def load_and_preprocess_data(filepath, test_size=0.2, random_state=42):
     """
-    Get detailed information about the dataset
+    Complete pipeline: load, preprocess, and split data
+    Returns: X_train, X_test, y_train, y_test, feature_names, label_encoder
     """
-    df = pd.read_csv(filepath, sep=sep)
+    # Load dataset
+    df = load_dataset(filepath, sep=';')
+    
+    return split_classification_data(df, test_size=test_size, random_state=random_state)
+
+
+def load_training_data(filepath, test_size=0.2, random_state=42, extra_rows=None):
+    """
+    Load the dataset once and make both training splits
+    Args:
+        extra_rows: optional (X, G3) of ingested records, added to the training
+                    side of both splits so the test sets stay comparable
+    Returns:
+        dict with 'classification' and 'regression' splits, each a tuple
+        (X_train, X_test, y_train, y_test), plus feature_names, label_encoder
+        and the fitted preprocessor
+    """
+    df = load_dataset(filepath, sep=';')
+    preprocessor = StudentPreprocessor().fit(df)
     
-    # Add performance label
-    df = add_performance_label(df)
+    # Regression on the raw G3 grade, split without stratification
+    X_reg, y_reg = prepare_features(df, preprocessor)
+    X_train_reg, X_test_reg, y_train_reg, y_test_reg = train_test_split(
+        X_reg, y_reg, test_size=test_size, random_state=random_state
+    )
+    
+    # Labels are computed from G3 without adding a column, so both splits share df
+    X_train, X_test, y_train, y_test, feature_names, label_encoder = split_classification_data(
+        df, test_size=test_size, random_state=random_state, preprocessor=preprocessor
+    )
     
+    if extra_rows is not None and len(extra_rows[0]):
+        X_extra, g3_extra = extra_rows
+        labels = preprocessor.labels(g3_extra)
+        
+        X_train_reg = np.vstack([X_train_reg, X_extra])
+        y_train_reg = np.concatenate([y_train_reg, g3_extra])
+        X_train = np.vstack([X_train, X_extra])
+        y_train = np.concatenate([y_train, labels])
+    
+    return {
+        'classification': (X_train, X_test, y_train, y_test),
+        'regression': (X_train_reg, X_test_reg, y_train_reg, y_test_reg),
+        'feature_names': feature_names,
+        'label_encoder': label_encoder,
+        'preprocessor': preprocessor
+    }
+
+
+def compute_dataset_info(df):
+    """
+    Compute detailed information about a labeled dataset
+    """
     info = {
         'shape': df.shape,
         'columns': list(df.columns),
@@ -182,3 +662,217 @@ def get_dataset_info(filepath, sep=';'):
     
     return info
 
+
+def _file_signature(filepath):
+    """Return the (mtime, size) pair used to detect dataset changes"""
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_cache_entry(filepath, sep=';'):
+    """
+    Return the cache entry for a dataset file, loading it on first use
+    and reloading it when the file's mtime or size has changed
+    """
+    key = (os.path.abspath(filepath), sep)
+    signature = _file_signature(filepath)
+    
+    with _dataset_cache_lock:
+        entry = _dataset_cache.get(key)
+        if entry is not None and entry['signature'] == signature:
+            _dataset_cache_stats['hits'] += 1
+            return entry
+        
+        _dataset_cache_stats['misses'] += 1
+        if entry is not None:
+            _dataset_cache_stats['reloads'] += 1
+        
+        raw = add_performance_label(load_dataset(filepath, sep=sep))
+        df = apply_compact_schema(raw)
+        entry = {
+            'signature': signature,
+            'df': df,
+            'info': compute_dataset_info(df),
+            'memory': memory_usage_report(raw, df),
+            # Columnar store: one array per column for cheap slicing
+            # (categoricals stay as codes plus their categories)
+            'columns': {
+                col: df[col].array if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].to_numpy()
+                for col in df.columns
+            }
+        }
+        del raw
+        _dataset_cache[key] = entry
+        
+        return entry
+
+
+def get_cached_dataset(filepath, sep=';'):
+    """
+    Get the labeled dataset from the process-wide cache
+    The returned DataFrame is shared between requests and must not be modified
+    """
+    return _get_cache_entry(filepath, sep=sep)['df']
+
+
+def get_dataset_info(filepath, sep=';', stats_path=None):
+    """
+    Get detailed information about the dataset
+    Served from the statistics artifact at stats_path while its content hash matches
+    the dataset, otherwise from the process-wide cache (recomputed when the file changes)
+    """
+    if stats_path is not None:
+        info = _get_precomputed_info(filepath, stats_path, sep=sep)
+        if info is not None:
+            return info
+    
+    return _get_cache_entry(filepath, sep=sep)['info']
+
+
+def write_dataset_stats(filepath, stats_path, sep=';'):
+    """
+    Compute the dataset overview served by /api/dataset and save it as a JSON artifact
+    Args:
+        filepath: path to the student CSV
+        stats_path: file to write, usually DATASET_STATS_FILE in the models directory
+    Returns:
+        dict with the dataset's content hash, its separator and the overview
+    """
+    df = apply_compact_schema(add_performance_label(load_dataset(filepath, sep=sep)))
+    stats = {
+        'content_hash': dataset_content_hash(filepath),
+        'sep': sep,
+        'info': compute_dataset_info(df)
+    }
+    
+    # Write to a temporary file first so readers never see a partial artifact
+    tmp_path = stats_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, stats_path)
+    
+    return stats
+
+
+def load_dataset_stats(stats_path):
+    """
+    Load a statistics artifact written by write_dataset_stats
+    Returns:
+        the saved dict, or None if the file is missing or unreadable
+    """
+    try:
+        with open(stats_path) as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    return stats if isinstance(stats, dict) and 'info' in stats else None
+
+
+def _get_precomputed_info(filepath, stats_path, sep=';'):
+    """
+    Return the overview from the statistics artifact if it was computed from
+    the dataset's current content, otherwise None
+    The content hash is only recomputed when the dataset or the artifact changes
+    """
+    key = (os.path.abspath(filepath), sep)
+    try:
+        signature = (_file_signature(filepath), _file_signature(stats_path))
+    except OSError:
+        return None
+    
+    with _dataset_cache_lock:
+        entry = _dataset_stats.get(key)
+        if entry is not None and entry['signature'] == signature:
+            return entry['info']
+        
+        stats = load_dataset_stats(stats_path)
+        info = None
+        if stats is not None and stats.get('sep') == sep \
+                and stats.get('content_hash') == dataset_content_hash(filepath):
+            info = stats['info']
+        
+        _dataset_stats[key] = {'signature': signature, 'info': info}
+        
+        return info
+
+
+def get_dataset_stats_status(filepath, stats_path, sep=';'):
+    """Whether the statistics artifact matches the dataset: 'current', 'stale' or 'missing'"""
+    if not os.path.exists(stats_path):
+        return 'missing'
+    return 'current' if _get_precomputed_info(filepath, stats_path, sep=sep) is not None else 'stale'
+
+
+def get_dataset_memory_report(filepath, sep=';'):
+    """
+    Get the memory footprint of the cached dataset before and after
+    applying the compact schema (see memory_usage_report)
+    """
+    return _get_cache_entry(filepath, sep=sep)['memory']
+
+
+def get_dataset_page(filepath, offset=0, limit=20, columns=None, sep=';'):
+    """
+    Get one page of dataset records from the cached columnar store
+    Only the requested rows and columns are converted to Python values
+    Args:
+        offset: index of the first record to return
+        limit: maximum number of records to return
+        columns: list of column names to include (default: all columns)
+    """
+    store = _get_cache_entry(filepath, sep=sep)['columns']
+    
+    if offset < 0 or limit < 0:
+        raise ValueError('offset and limit must be non-negative')
+    
+    if columns is None:
+        columns = list(store.keys())
+    else:
+        unknown = [col for col in columns if col not in store]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    
+    total = len(next(iter(store.values()))) if store else 0
+    end = min(offset + limit, total)
+    
+    # Slice each column first, then zip the small slices into records
+    sliced = [store[col][offset:end].tolist() for col in columns]
+    records = [dict(zip(columns, values)) for values in zip(*sliced)]
+    
+    return {
+        'total_records': total,
+        'offset': offset,
+        'limit': limit,
+        'columns': columns,
+        'sample': records
+    }
+
+
+def get_feature_ranges(filepath, features, sep=';'):
+    """
+    Get the observed range of each feature from the cached columnar store
+    Returns:
+        dict mapping feature name to (min, max, is_integer)
+    """
+    store = _get_cache_entry(filepath, sep=sep)['columns']
+    
+    ranges = {}
+    for name in features:
+        if name in store:
+            values = store[name]
+            ranges[name] = (float(values.min()), float(values.max()),
+                            bool(np.issubdtype(values.dtype, np.integer)))
+    
+    return ranges
+
+
+def get_dataset_cache_stats():
+    """Get hit/miss counters for the dataset cache"""
+    with _dataset_cache_lock:
+        lookups = _dataset_cache_stats['hits'] + _dataset_cache_stats['misses']
+        return {
+            **_dataset_cache_stats,
+            'hit_rate': _dataset_cache_stats['hits'] / lookups if lookups else 0.0,
+            'cached_files': len(_dataset_cache)
+        }
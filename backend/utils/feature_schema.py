@@ -0,0 +1,119 @@
+"""
+Feature schema for building model input matrices
+Compiled once from a model's feature_names and reused for every request
+"""
+
+import math
+
+import numpy as np
+
+
+class FeatureSchema:
+    def __init__(self, feature_names, default=0.0, dtype=np.float64):
+        """
+        Compile the feature order into a name -> column lookup
+        Args:
+            feature_names: ordered list of feature names the model was trained on
+            default: value used for features missing from a request
+            dtype: dtype of the encoded matrix
+        """
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.columns = {name: i for i, name in enumerate(self.feature_names)}
+        self.default = default
+        self.dtype = np.dtype(dtype)
+
+    def encode(self, features):
+        """
+        Encode features into a contiguous 2-D matrix in model column order
+        Args:
+            features: dict of feature values, list of such dicts,
+                      or an array that is already encoded
+        Returns:
+            numpy array of shape (n_rows, n_features)
+        """
+        if isinstance(features, np.ndarray):
+            return self.check_array(features)
+
+        rows = [features] if isinstance(features, dict) else features
+
+        # Preallocate with defaults so missing features need no extra pass
+        X = np.full((len(rows), self.n_features), self.default, dtype=self.dtype)
+
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                raise ValueError(f"Row {i} must be an object of feature values")
+
+            for name, value in row.items():
+                X[i, self._column(name)] = self._coerce(name, value)
+
+        return X
+
+    def encode_columns(self, columns):
+        """
+        Encode column-oriented features into a contiguous 2-D matrix
+        Args:
+            columns: dict mapping feature name to a list of values
+        Returns:
+            numpy array of shape (n_rows, n_features)
+        """
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('All feature columns must have the same length')
+
+        n_rows = lengths.pop() if lengths else 0
+        X = np.full((n_rows, self.n_features), self.default, dtype=self.dtype)
+
+        for name, values in columns.items():
+            col = self._column(name)
+            try:
+                X[:, col] = [self.default if value is None else value for value in values]
+            except (TypeError, ValueError):
+                raise ValueError(f"Feature '{name}' must contain only numeric values")
+
+            if not np.isfinite(X[:, col]).all():
+                raise ValueError(f"Feature '{name}' must contain only finite values")
+
+        return X
+
+    def check_array(self, X):
+        """Validate an already-encoded matrix (shape and finite values), copying only if needed"""
+        X = np.ascontiguousarray(X, dtype=self.dtype)
+
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"Expected {self.n_features} features per row, got array of shape {X.shape}"
+            )
+
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+
+        return X
+
+    def _column(self, name):
+        """Look up the column for a feature name"""
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise ValueError(
+                f"Unknown feature '{name}'. Expected features: {', '.join(self.feature_names)}"
+            )
+
+    def _coerce(self, name, value):
+        """Convert a single feature value to the schema dtype"""
+        if value is None:
+            return self.default
+
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Feature '{name}' must be numeric, got {value!r}")
+
+        # NaN and infinity would pass through the models and cannot be returned as JSON
+        if not math.isfinite(number):
+            raise ValueError(f"Feature '{name}' must be a finite number, got {value!r}")
+
+        return number
@@ -0,0 +1,143 @@
+"""
+Ingestion of newly labeled student records
+Appends records to the ingested-records file, applies incremental model updates
+and tracks models that need a full retrain
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils.data_preprocessing import FEATURE_COLUMNS, performance_codes
+
+
+INGESTED_FILE = 'ingested.csv'
+STALE_FILE = 'stale_models.json'
+
+# Models trained on the G3 grade; the others are trained on the encoded performance label
+GRADE_TARGET_MODELS = {'linear_regression', 'ann_regression'}
+
+
+def parse_records(records, feature_names=FEATURE_COLUMNS):
+    """
+    Validate labeled records and convert them to arrays
+    Args:
+        records: list of dicts with every feature plus the final grade G3
+    Returns:
+        feature matrix in model column order and the array of G3 grades
+    """
+    if not isinstance(records, list) or not records:
+        raise ValueError("'records' must be a non-empty list of student records")
+    
+    columns = list(feature_names) + ['G3']
+    data = np.empty((len(records), len(columns)))
+    
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {i} must be an object of feature values")
+        
+        missing = [name for name in columns if record.get(name) is None]
+        if missing:
+            raise ValueError(f"Record {i} is missing: {', '.join(missing)}")
+        
+        try:
+            data[i] = [float(record[name]) for name in columns]
+        except (TypeError, ValueError):
+            raise ValueError(f"Record {i} must contain only numeric values")
+    
+    if not np.isfinite(data).all():
+        raise ValueError("Records contain NaN or infinity")
+    
+    return data[:, :-1], data[:, -1]
+
+
+def append_records(filepath, X, grades, feature_names=FEATURE_COLUMNS):
+    """Append labeled rows to the ingested-records CSV, writing the header for a new file"""
+    df = pd.DataFrame(X, columns=list(feature_names))
+    df['G3'] = grades
+    
+    write_header = not os.path.exists(filepath) or os.path.getsize(filepath) == 0
+    df.to_csv(filepath, sep=';', mode='a', header=write_header, index=False)
+
+
+def load_ingested_records(filepath, feature_names=FEATURE_COLUMNS):
+    """
+    Load every ingested row
+    Returns:
+        feature matrix and G3 grades (empty arrays if nothing was ingested)
+    """
+    if not os.path.exists(filepath):
+        return np.empty((0, len(feature_names))), np.empty(0)
+    
+    df = pd.read_csv(filepath, sep=';')
+    return df[list(feature_names)].to_numpy(dtype=np.float64), df['G3'].to_numpy(dtype=np.float64)
+
+
+def update_models(models, X, grades):
+    """
+    Apply an incremental update to every model that supports one
+    Args:
+        models: dict mapping model name to a loaded model
+        X: feature matrix of the new rows
+        grades: G3 grades of the new rows
+    Returns:
+        dict mapping model name to its status ('updated' or 'stale'), update time
+        and, for stale models, the reason
+    """
+    labels = performance_codes(grades)
+    results = {}
+    
+    for name, model in models.items():
+        y = grades if name in GRADE_TARGET_MODELS else labels
+        start = time.perf_counter()
+        
+        if not hasattr(model, 'partial_update'):
+            results[name] = {'status': 'stale', 'reason': 'no incremental update for this algorithm'}
+            continue
+        
+        try:
+            model.partial_update(X, y)
+            results[name] = {'status': 'updated', 'seconds': time.perf_counter() - start}
+        except Exception as e:
+            results[name] = {'status': 'stale', 'reason': str(e)}
+    
+    return results
+
+
+def load_stale_models(models_dir):
+    """Get the models waiting for a full retrain, with the ingested rows they have missed"""
+    path = os.path.join(models_dir, STALE_FILE)
+    if not os.path.exists(path):
+        return {}
+    
+    with open(path) as f:
+        return json.load(f)
+
+
+def mark_stale(models_dir, names, n_rows):
+    """Record that the given models have missed n_rows ingested rows"""
+    stale = load_stale_models(models_dir)
+    now = datetime.now(timezone.utc).isoformat()
+    
+    for name in names:
+        entry = stale.setdefault(name, {'since': now, 'pending_rows': 0})
+        entry['pending_rows'] += n_rows
+    
+    # Write then rename so readers never see a partial file
+    path = os.path.join(models_dir, STALE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(stale, f, indent=2)
+    os.replace(path + '.tmp', path)
+    
+    return stale
+
+
+def clear_stale_models(models_dir):
+    """Forget stale models after a full retrain"""
+    path = os.path.join(models_dir, STALE_FILE)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,53 @@
+"""
+Process memory statistics
+Used to confirm that model memory is shared between server workers
+"""
+
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def get_peak_rss_bytes():
+    """Peak resident memory of this process in bytes, or None where getrusage is unavailable"""
+    if resource is None:
+        return None
+    
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def get_process_memory():
+    """
+    Get memory usage of the current process in bytes
+    Reads /proc/self/smaps_rollup on Linux for shared/private breakdown,
+    falling back to peak RSS from getrusage elsewhere (left out on Windows)
+    """
+    stats = {'pid': os.getpid()}
+    
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+        
+        stats.update({
+            'rss_bytes': fields.get('Rss', 0),
+            'pss_bytes': fields.get('Pss', 0),
+            'shared_bytes': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+            'private_bytes': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+        })
+    except OSError:
+        max_rss = get_peak_rss_bytes()
+        if max_rss is not None:
+            stats['max_rss_bytes'] = max_rss
+    
+    return stats
@@ -0,0 +1,140 @@
+"""
+Bounded LRU cache for model predictions
+Keyed on the encoded feature vector plus the request parameters
+"""
+
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Initialize the cache
+        Args:
+            max_size: maximum number of cached results before the least recently used is evicted
+            ttl: seconds a result stays valid (None keeps results until evicted)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, calling compute() on a miss
+        Cached results are shared between callers and must not be modified
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, size = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                # Stale entry, drop it and recompute
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+
+            self.misses += 1
+
+        value = compute()
+        size = _approx_size(key) + _approx_size(value)
+        expires_at = now + self.ttl if self.ttl else None
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_size:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+        return value
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Get hit/miss, eviction and memory statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'memory_bytes': self._bytes
+            }
+
+
+def cached_prediction(method):
+    """
+    Decorator for model methods that take a features argument
+    Uses the model's `cache` attribute when set, otherwise calls through.
+    The features are encoded once with the model's schema and the encoded
+    row is passed on, so a cache miss does not encode the request again.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, features, *args, **kwargs):
+        cache = getattr(self, 'cache', None)
+        if cache is None or not self.is_trained:
+            return method(self, features, *args, **kwargs)
+
+        X = self.schema.encode(features)
+
+        # Canonicalize parameters so f(x, 5) and f(x, k=5) share an entry
+        bound = signature.bind(self, X, *args, **kwargs)
+        bound.apply_defaults()
+        params = tuple(bound.arguments.items())[2:]
+
+        key = (method.__name__, X.shape, X.tobytes(), params)
+        try:
+            hash(key)
+        except TypeError:
+            # Unhashable parameters (e.g. custom scenario dicts) are not cached
+            return method(self, X, *args, **kwargs)
+
+        return cache.get_or_compute(key, lambda: method(self, X, *args, **kwargs))
+
+    return wrapper
+
+
+def _approx_size(obj):
+    """Approximate memory footprint of a cached key or result in bytes"""
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_approx_size(item) for item in obj)
+
+    return size
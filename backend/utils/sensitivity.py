@@ -0,0 +1,77 @@
+"""
+Per-student sensitivity sweeps
+Builds one perturbation matrix that varies each feature across its observed
+range while holding the others at the student's values
+"""
+
+import numpy as np
+
+
+def sweep_values(low, high, integer, points):
+    """
+    Values to try for one feature
+    Integer features with at most `points` distinct values are swept exhaustively,
+    anything wider is sampled at `points` evenly spaced values
+    """
+    if integer and high - low + 1 <= points:
+        return np.arange(low, high + 1, dtype=np.float64)
+    
+    values = np.linspace(low, high, points)
+    return np.unique(np.round(values)) if integer else values
+
+
+def build_sweep(x, feature_names, ranges, points=11, features=None):
+    """
+    Build the perturbation matrix for one student
+    Args:
+        x: encoded feature row of shape (1, n_features)
+        feature_names: model column order
+        ranges: dict mapping feature name to (min, max, is_integer)
+        points: maximum number of values per feature
+        features: names of the features to sweep (default: all); repeats are swept once
+    Returns:
+        matrix with the unperturbed row first and one row per swept value,
+        and a dict mapping each feature to (values, row slice in the matrix)
+    """
+    features = list(dict.fromkeys(feature_names if features is None else features))
+    columns = {name: i for i, name in enumerate(feature_names)}
+    
+    unknown = [name for name in features if name not in columns or name not in ranges]
+    if unknown:
+        raise ValueError(f"Cannot sweep unknown features: {', '.join(unknown)}")
+    
+    values = {name: sweep_values(*ranges[name], points) for name in features}
+    n_rows = 1 + sum(len(v) for v in values.values())
+    
+    X = np.repeat(np.asarray(x, dtype=np.float64).reshape(1, -1), n_rows, axis=0)
+    segments = {}
+    start = 1
+    
+    for name in features:
+        stop = start + len(values[name])
+        X[start:stop, columns[name]] = values[name]
+        segments[name] = (values[name], slice(start, stop))
+        start = stop
+    
+    return X, segments
+
+
+def response_curves(segments, response):
+    """
+    Split one model's scores for the sweep matrix into per-feature curves
+    Args:
+        segments: dict from build_sweep
+        response: array of scores, one per matrix row (row 0 is the baseline)
+    Returns:
+        dict with the baseline score, the curve and impact (max - min) of each
+        feature, and the features ranked by impact
+    """
+    curves = {name: response[rows] for name, (_, rows) in segments.items()}
+    impact = {name: float(curve.max() - curve.min()) for name, curve in curves.items()}
+    
+    return {
+        'baseline': float(response[0]),
+        'curves': {name: curve.tolist() for name, curve in curves.items()},
+        'impact': impact,
+        'ranking': sorted(impact, key=impact.get, reverse=True)
+    }
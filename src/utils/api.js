@@ -15,11 +15,11 @@ console.log('API Base URL:', API_BASE_URL);
 async function apiRequest(endpoint, options = {}) {
   try {
     const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      ...options,
       headers: {
         'Content-Type': 'application/json',
         ...options.headers,
       },
-      ...options,
     });
 
     if (!response.ok) {
@@ -48,10 +48,14 @@ export async function getDatasetInfo() {
 }
 
 /**
- * Get dataset sample
+ * Get dataset sample (one page, optionally limited to some columns)
  */
-export async function getDatasetSample(limit = 20) {
-  return apiRequest(`/dataset/sample?limit=${limit}`);
+export async function getDatasetSample(limit = 20, offset = 0, columns = null) {
+  const params = new URLSearchParams({ limit, offset });
+  if (columns && columns.length) {
+    params.set('columns', columns.join(','));
+  }
+  return apiRequest(`/dataset/sample?${params.toString()}`);
 }
 
 /**
@@ -121,6 +125,48 @@ export async function predictANN(features, periods = 4) {
   });
 }
 
+/**
+ * ANN - What-if scenarios: grid of { multipliers, overrides } (feature -> list of values)
+ */
+export async function predictANNScenarios(features, grid) {
+  return apiRequest('/predict/ann/scenarios', {
+    method: 'POST',
+    body: JSON.stringify({ features, grid }),
+  });
+}
+
+/**
+ * Sensitivity - Response of each model to every feature across its observed range
+ */
+export async function predictSensitivity(features, models = null, points = 11) {
+  return apiRequest('/predict/sensitivity', {
+    method: 'POST',
+    body: JSON.stringify(models ? { features, models, points } : { features, points }),
+  });
+}
+
+/**
+ * All models - Run every model (or a chosen subset) for one student
+ */
+export async function predictAll(features, models = null) {
+  return apiRequest('/predict/all', {
+    method: 'POST',
+    body: JSON.stringify(models ? { features, models } : { features }),
+  });
+}
+
+/**
+ * Ingest - Add labeled records (15 features + G3) and update models incrementally
+ * Requires the backend's INGEST_TOKEN
+ */
+export async function ingestRecords(records, token) {
+  return apiRequest('/ingest', {
+    method: 'POST',
+    headers: { Authorization: `Bearer ${token}` },
+    body: JSON.stringify({ records }),
+  });
+}
+
 /**
  * Helper: Create features object from form data
  */
@@ -155,5 +201,9 @@ export default {
   predictSVM,
   predictDecisionTree,
   predictANN,
+  predictANNScenarios,
+  predictSensitivity,
+  predictAll,
+  ingestRecords,
   createFeaturesObject,
 };